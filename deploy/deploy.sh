@@ -67,5 +67,20 @@ sudo /opt/bitnami/apache/bin/apachectl -t
 log "Restarting Apache"
 sudo /opt/bitnami/ctlscript.sh restart apache
 
+log "Waiting for the application to finish warm-up (/healthz/ready)"
+warm=0
+for _ in $(seq 1 30); do
+  if curl -fsS -o /dev/null http://127.0.0.1/healthz/ready; then
+    warm=1
+    break
+  fi
+  sleep 1
+done
+if [[ "$warm" == 1 ]]; then
+  log "Workers are warm"
+else
+  log "⚠️ Warm-up not finished after 30s, check /healthz/ready and solar-error.log"
+fi
+
 log "✅ Deployment completed! Visit: http://3.75.185.85/"
 
@@ -0,0 +1,231 @@
+"""
+重负载接口的准入控制
+每个接口在进程内有并发上限，超出时立即返回 503；每个客户端（API 密钥或 IP）
+在同一主机所有工作进程共享的令牌桶中按请求成本扣减令牌，不足时立即返回 429。
+两种拒绝都带 Retry-After，大批量请求不会占满工作线程而拖慢普通的 /simulate/ 用户。
+"""
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from . import montecarlo
+
+try:
+    import fcntl
+except ImportError:  # Windows：令牌桶只在进程内共享
+    fcntl = None
+
+
+# 各接口（URL 名称）在每个进程内的最大并发请求数；未列出的接口不限并发
+CONCURRENCY_LIMITS = getattr(settings, 'SOLAR_CONCURRENCY_LIMITS', {
+    'api_simulate': 8,
+    'api_sensitivity': 4,
+    'api_compare': 4,
+    'api_montecarlo': 2,
+    'export_monthly': 4,
+    'export_batch': 2,
+    'api_portfolio': 1,
+})
+
+# 令牌桶：每个客户端每秒补充 RATE 个成本单位，最多积累 BURST 个
+RATE_LIMIT_RATE = getattr(settings, 'SOLAR_RATE_LIMIT_RATE', 5.0)
+RATE_LIMIT_BURST = getattr(settings, 'SOLAR_RATE_LIMIT_BURST', 100.0)
+RATE_LIMIT_FILE = getattr(settings, 'SOLAR_RATE_LIMIT_FILE', None) or \
+    os.path.join(tempfile.gettempdir(), 'solar-ratelimit.bin')
+
+# 请求成本：一次月度模拟为 1 个单位；逐时最优调度约为其 OPTIMAL_DISPATCH_COST 倍，
+# 批量接口每 BATCH_UNIT 个方案/家庭计 1 个单位
+OPTIMAL_DISPATCH_COST = 20
+BATCH_UNIT = 1000
+# 组合上传按文件大小估算家庭数（CSV 每行约 40 字节）
+PORTFOLIO_BYTES_PER_ROW = 40
+# 只解析不超过该大小的 JSON 请求体来估算成本
+_MAX_PARSED_BODY = 64 * 1024
+
+API_KEY_HEADER = 'HTTP_X_API_KEY'
+# 已登记的 API 密钥；只有这些密钥有独立的令牌桶，其余密钥按来源 IP 计
+API_KEYS = frozenset(getattr(settings, 'SOLAR_API_KEYS', ()))
+
+
+class TokenBucketTable:
+    """
+    存放在 mmap 文件中的令牌桶表
+
+    固定 slots 个槽位，每个槽位为 (客户端哈希, 令牌数, 更新时间)；按哈希开放寻址，
+    表满时覆盖探测范围内最久未使用的槽位。文件用 fcntl 加锁，同一主机的所有进程共享。
+    """
+
+    SLOT = struct.Struct('<Qdd')
+    PROBES = 8
+
+    def __init__(self, path, rate, burst, slots=4096):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.slots = slots
+        self._lock = threading.Lock()
+        size = slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size != size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def take(self, client, cost, now=None):
+        """
+        为 client 扣减 cost 个令牌
+
+        返回 0 表示放行；否则返回需要等待的秒数（本次不扣减）。
+        cost 超过桶容量时按桶容量计，大请求会耗尽令牌但不会永远被拒绝。
+        """
+        now = time.time() if now is None else now
+        cost = min(float(cost), self.burst)
+        key = int.from_bytes(hashlib.blake2b(client.encode(), digest_size=8).digest(), 'little') | 1
+        with self._locked():
+            offset, tokens = self._find(key, now)
+            if tokens >= cost:
+                self.SLOT.pack_into(self._map, offset, key, tokens - cost, now)
+                return 0.0
+            self.SLOT.pack_into(self._map, offset, key, tokens, now)
+            return (cost - tokens) / self.rate
+
+    def _find(self, key, now):
+        """返回 (槽位偏移, 补充后的令牌数)；新客户端以满桶开始"""
+        oldest = None
+        for probe in range(self.PROBES):
+            offset = (key + probe) % self.slots * self.SLOT.size
+            stored, tokens, updated = self.SLOT.unpack_from(self._map, offset)
+            if stored == key:
+                elapsed = max(now - updated, 0.0)
+                return offset, min(self.burst, tokens + elapsed * self.rate)
+            if stored == 0:
+                return offset, self.burst
+            if oldest is None or updated < oldest[1]:
+                oldest = (offset, updated)
+        return oldest[0], self.burst
+
+
+def _json_body(request):
+    if request.method != 'POST' or len(request.body) > _MAX_PARSED_BODY:
+        return {}
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _dispatch_weight(data):
+    return OPTIMAL_DISPATCH_COST if data.get('battery_dispatch') == 'optimal' else 1
+
+
+def _compare_cost(data):
+    # 对比的每个方案计一次模拟（最优调度按其倍数），至少 1 个单位
+    base = data.get('base') if isinstance(data.get('base'), dict) else {}
+    configs = data.get('configs') if isinstance(data.get('configs'), list) else []
+    return max(1, sum(_dispatch_weight(dict(base, **config)) for config in configs
+                      if isinstance(config, dict)))
+
+
+def _int_param(data, name, default):
+    try:
+        return max(int(data.get(name, default)), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def _content_length(request):
+    try:
+        return int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return 0
+
+
+# 各接口的请求成本（URL 名称 -> 函数）；未列出的接口不受令牌桶限制
+REQUEST_COSTS = {
+    'simulate': lambda request: _dispatch_weight(request.POST),
+    'api_simulate': lambda request: _dispatch_weight(
+        request.GET if request.method == 'GET' else _json_body(request)),
+    # 龙卷风图为 1 + 2P 个方案的一次批量计算
+    'api_sensitivity': lambda request: 2 * _dispatch_weight(_json_body(request)),
+    # 实时预览总是按贪心调度计算
+    'api_live': lambda request: 1,
+    'export_monthly': lambda request: _dispatch_weight(request.GET),
+    'api_compare': lambda request: _compare_cost(_json_body(request)),
+    # 每 BATCH_UNIT 个蒙特卡洛样本计 1 个单位
+    'api_montecarlo': lambda request: 1 + _int_param(request.GET, 'samples', montecarlo.DEFAULT_SAMPLES) / BATCH_UNIT,
+    # 每个方案是请求体中的一个 JSON 对象
+    'export_batch': lambda request: 1 + request.body.count(b'{') / BATCH_UNIT,
+    'api_portfolio': lambda request:
+        1 + _content_length(request) / PORTFOLIO_BYTES_PER_ROW / BATCH_UNIT,
+}
+
+
+def client_id(request):
+    """
+    令牌桶按 API 密钥（X-Api-Key）区分客户端，未提供或未登记的密钥按来源 IP
+
+    只接受 SOLAR_API_KEYS 中的密钥，否则每次换一个随机密钥就能得到一个满的令牌桶。
+    """
+    api_key = request.META.get(API_KEY_HEADER)
+    if api_key and api_key in API_KEYS:
+        return 'key:' + api_key
+    return 'ip:' + request.META.get('REMOTE_ADDR', '')
+
+
+def _rejection(status, error, retry_after):
+    response = JsonResponse({'success': False, 'error': error}, status=status)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class AdmissionControlMiddleware:
+    """按 URL 名称对重负载接口做并发限制与成本加权的限流"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.semaphores = {name: threading.BoundedSemaphore(limit)
+                           for name, limit in CONCURRENCY_LIMITS.items()}
+        self.buckets = TokenBucketTable(RATE_LIMIT_FILE, RATE_LIMIT_RATE, RATE_LIMIT_BURST)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        release = getattr(request, '_admission_release', None)
+        if release is not None:
+            # 流式响应在迭代结束后才真正完成，关闭响应时再释放并发名额
+            response._resource_closers.append(release)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = request.resolver_match.url_name if request.resolver_match else None
+        cost_of = REQUEST_COSTS.get(name)
+        if cost_of is not None:
+            wait = self.buckets.take(client_id(request), cost_of(request))
+            if wait > 0:
+                return _rejection(429, '请求过于频繁，请稍后重试', wait)
+
+        semaphore = self.semaphores.get(name)
+        if semaphore is not None:
+            if not semaphore.acquire(blocking=False):
+                return _rejection(503, '服务器繁忙，请稍后重试', 1)
+            request._admission_release = semaphore.release
+        return None
@@ -6,4 +6,9 @@ class SolarAppConfig(AppConfig):
     name = 'solar_app'
     verbose_name = '太阳能模拟应用'
 
+    def ready(self):
+        # WSGI 工作进程启动时在后台预热，首批用户不再承担冷启动开销
+        from . import warmup
 
+        if warmup.enabled():
+            warmup.start()
@@ -0,0 +1,180 @@
+"""
+离线批量模拟（manage.py simulate_batch）
+从 JSONL/CSV 文件或标准输入分块读取参数（字段与表单相同），每块整体向量化校验，
+用批量计算器求解并按输入顺序输出 JSONL、CSV 或紧凑二进制结果。
+每块写完后更新检查点（已处理行数与输出文件长度），中断后可从检查点继续。
+"""
+import json
+import os
+from collections import namedtuple
+from itertools import islice
+
+import numpy as np
+
+from . import exports, schema, tariffs
+from .forms import SolarSimulationForm
+from .portfolio import RESULT_FIELDS, iter_records
+from .solar_calculator import SolarCalculator
+
+
+DEFAULT_CHUNK_SIZE = 10000
+OUTPUT_FORMATS = ('jsonl', 'csv', 'bin')
+
+INPUT_FIELDS = tuple(SolarSimulationForm.base_fields)
+# 输入中缺少或为空的字段取表单初始值，参数文件只需给出与默认方案不同的字段
+FIELD_DEFAULTS = {name: field.initial for name, field in SolarSimulationForm.base_fields.items()}
+
+# 一块的计算结果：values 形状 (行数, len(RESULT_FIELDS))，无效行为 NaN；
+# errors 为 [(块内行号, {字段: [错误信息]}), ...]
+ChunkResult = namedtuple('ChunkResult', 'values valid errors')
+
+
+def _with_defaults(record):
+    return dict(FIELD_DEFAULTS, **{name: value for name, value in record.items()
+                                  if value is not None and value != ''})
+
+
+def read_chunks(stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE, skip=0):
+    """分块读取输入记录，产生 (首行行号, 记录列表)；skip 为从检查点继续时跳过的行数"""
+    records = iter_records(stream, 'ndjson' if fmt == 'jsonl' else fmt)
+    start = skip
+    for _ in islice(records, skip):
+        pass
+    while True:
+        block = list(islice(records, chunk_size))
+        if not block:
+            return
+        yield start, block
+        start += len(block)
+
+
+def _row_errors(record):
+    _, errors = schema.validate(record)
+    return {field: [error['message'] for error in messages]
+            for field, messages in errors.get_json_data().items()}
+
+
+def _price_tariff_groups(flows, costs, columns, names, valid):
+    """非固定电价的行按电价类型分组计价；电价随平均电价线性变化，同组共用一个价格矩阵"""
+    for name in set(names[valid].tolist()) - {tariffs.FlatTariff.name}:
+        rows = np.flatnonzero(valid & (names == name))
+        reference = tariffs.get_tariff(name, columns['grid_price'][rows[0]],
+                                       columns['feed_in_price'][rows[0]])
+        group = reference.evaluate(
+            {key: values[rows] for key, values in flows.items()},
+            grid_price_shift=columns['grid_price'][rows] - columns['grid_price'][rows[0]],
+            feed_in_price=columns['feed_in_price'][rows],
+        )
+        for field in SolarCalculator.COST_FIELDS:
+            costs[field][rows] = group[field]
+
+
+def simulate_records(records):
+    """
+    校验并计算一块记录（可在工作进程中执行）
+
+    固定电价的行一次向量化计价，其余电价按类型分组计价；只有选择最优调度且有电池的行逐行求解。
+    """
+    records = [_with_defaults(record) for record in records]
+    raw = {name: [record.get(name) for record in records] for name in INPUT_FIELDS}
+    checked = schema.validate_columns(raw)
+    valid = checked.valid
+    columns = schema.calculation_columns(checked.cleaned)
+
+    calculator = SolarCalculator()
+    flows = calculator.energy_flows(columns)
+    costs = {key: np.array(values) for key, values in calculator.evaluate_costs(
+        flows, columns['grid_price'], columns['feed_in_price']).items()}
+    names = np.array([name or tariffs.FlatTariff.name for name in checked.cleaned['tariff'].tolist()],
+                     dtype=object)
+    _price_tariff_groups(flows, costs, columns, names, valid)
+
+    values = np.column_stack([costs[field] for field in SolarCalculator.COST_FIELDS] +
+                             [flows[field].sum(axis=1) for field in SolarCalculator.FLOW_FIELDS])
+    optimal = valid & (checked.cleaned['battery_dispatch'] == SolarCalculator.DISPATCH_OPTIMAL) & \
+        (columns['battery_capacity_kwh'] > 0)
+    for row in np.flatnonzero(optimal):
+        params, _ = schema.validate(records[row])
+        result = calculator.calculate(params)
+        values[row] = [getattr(result, field) for field in SolarCalculator.COST_FIELDS] + \
+            [float(result.flow(field).sum()) for field in SolarCalculator.FLOW_FIELDS]
+
+    values[~valid] = np.nan
+    errors = [(int(row), _row_errors(records[row])) for row in np.flatnonzero(~valid)]
+    return ChunkResult(values, valid, errors)
+
+
+class OutputWriter:
+    """按输入顺序写出每块结果；每个输入行对应一个输出行，无效行的数值为空（NaN）"""
+
+    def __init__(self, stream, fmt, header=True):
+        """stream: 二进制输出流；header: 是否写表头（从检查点继续时为 False）"""
+        self.stream = stream
+        self.fmt = fmt
+        self.header = header
+
+    def write(self, start, result):
+        if self.fmt == 'jsonl':
+            errors = dict(result.errors)
+            lines = []
+            for offset, (ok, row) in enumerate(zip(result.valid.tolist(), result.values.tolist())):
+                record = {'row': start + offset, 'valid': ok}
+                if ok:
+                    record.update(zip(RESULT_FIELDS, row))
+                else:
+                    record['errors'] = errors[offset]
+                lines.append(json.dumps(record, ensure_ascii=False) + '\n')
+            self._write(''.join(lines))
+            return
+
+        if self.fmt == 'csv':
+            parts = exports.iter_csv(('row',) + RESULT_FIELDS, result.values,
+                                     labels=range(start, start + len(result.values)))
+        else:
+            parts = exports.iter_binary(RESULT_FIELDS, iter([result.values]))
+        if not self.header:
+            next(parts)
+        self.header = False
+        for part in parts:
+            self._write(part)
+
+    def _write(self, data):
+        # 输出流以二进制模式打开，三种格式共用
+        self.stream.write(data.encode() if isinstance(data, str) else data)
+
+
+class Checkpoint:
+    """
+    检查点文件（JSON）：输入文件标识、已处理行数与对应的输出文件长度
+
+    每块写出并刷新输出后原子地替换检查点；继续时截断输出中检查点之后的部分，
+    跳过已处理的输入行。
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def identify(input_path):
+        stat = os.stat(input_path)
+        return {'input': os.path.abspath(input_path), 'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns}
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as stream:
+                return json.load(stream)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state):
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as stream:
+            json.dump(state, stream)
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,144 @@
+"""
+页面、片段与计算结果缓存工具
+首页按语言缓存整页HTML，结果页按参数哈希和语言缓存表格与图表片段。
+缓存键包含模板和翻译文件 (locale/*/django.mo) 的修改指纹，部署后自动失效。
+计算结果按参数哈希缓存，session 中只需保存输入和结果缓存键；
+未命中时经 pipeline 分阶段计算，只改电价时复用已有的能量流；同一参数的并发请求经 singleflight 合并为一次计算。
+GET 模拟API 的 ETag 由参数哈希与计算引擎版本得出，供浏览器与 Apache mod_cache 条件请求。
+"""
+import hashlib
+import json
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils import translation
+
+from . import pipeline, singleflight, tariffs
+from .solar_calculator import ENGINE_VERSION
+
+
+# 整页缓存时使用的CSRF令牌占位符，输出前替换为当前请求的令牌
+CSRF_PLACEHOLDER = 'CSRFTOKENPLACEHOLDER0000'
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'SOLAR_PAGE_CACHE_TIMEOUT', 60 * 60)
+RESULT_CACHE_TIMEOUT = getattr(settings, 'SOLAR_RESULT_CACHE_TIMEOUT', 24 * 60 * 60)
+# GET 模拟API 响应允许浏览器与 Apache mod_cache 缓存的秒数
+API_CACHE_MAX_AGE = getattr(settings, 'SOLAR_API_CACHE_MAX_AGE', 60 * 60)
+
+_TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates'
+
+_template_version = None
+
+
+def _watched_files():
+    """参与缓存失效判断的文件：应用模板、已编译的翻译目录和静态文件清单"""
+    files = list(_TEMPLATE_DIR.rglob('*.html'))
+    for locale_dir in settings.LOCALE_PATHS:
+        files.extend(Path(locale_dir).glob('*/LC_MESSAGES/django.mo'))
+    # 页面中引用的是带哈希的静态文件名，collectstatic 更新清单后同样需要失效
+    manifest = Path(settings.STATIC_ROOT) / 'staticfiles.json'
+    if manifest.exists():
+        files.append(manifest)
+    return sorted(files)
+
+
+def template_version():
+    """
+    模板与翻译文件的修改指纹
+
+    生产环境每个进程只计算一次（部署会重启进程）；DEBUG 模式下每次重新计算，
+    便于开发时修改模板立即生效。
+    """
+    global _template_version
+    if _template_version is None or settings.DEBUG:
+        digest = hashlib.sha1()
+        for path in _watched_files():
+            stat = path.stat()
+            digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+        _template_version = digest.hexdigest()[:12]
+    return _template_version
+
+
+def params_hash(params):
+    """计算参数字典的稳定哈希，用作结果相关缓存的键"""
+    canonical = json.dumps(params, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def page_path(request, query_params=()):
+    """请求路径加上影响页面内容的查询参数（按参数名排序）；其余查询参数不参与整页缓存"""
+    query = urlencode(sorted((name, value) for name in set(query_params)
+                             for value in request.GET.getlist(name)))
+    return f'{request.path}?{query}' if query else request.path
+
+
+def render_cached_page(request, name, template_name, context, query_params=()):
+    """
+    渲染并按语言缓存整页HTML
+
+    页面中的CSRF令牌以占位符形式缓存，返回前替换为当前请求的令牌，
+    因此缓存内容可以在所有访客之间共享。
+    缓存键只包含路径与 query_params 中列出的查询参数，任意附加的查询字符串不会产生新的缓存项；
+    页面中引用当前地址之处（语言切换后的跳转）同样使用该规范化路径。
+    """
+    token = get_token(request)
+    path = page_path(request, query_params)
+    path_hash = hashlib.sha1(path.encode()).hexdigest()[:12]
+    key = 'page:{}:{}:{}:{}'.format(name, translation.get_language(), path_hash, template_version())
+
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(template_name,
+                                dict(context, csrf_token=CSRF_PLACEHOLDER, page_path=path), request)
+        cache.set(key, html, PAGE_CACHE_TIMEOUT)
+
+    return HttpResponse(html.replace(CSRF_PLACEHOLDER, token))
+
+
+def result_digest(params):
+    """
+    计算结果的版本摘要
+
+    由参数哈希与引擎版本得出；动态电价另含价格文件的修改时间，文件更新或部署新引擎后自动失效。
+    结果缓存、结果页片段缓存、single-flight 与 ETag 共用。
+    """
+    source = tariffs.tariff_source(params.get('tariff'))
+    return hashlib.sha1(f'{ENGINE_VERSION}:{params_hash(params)}:{source}'.encode()).hexdigest()
+
+
+def result_cache_key(params):
+    """计算结果在缓存中的键"""
+    return 'result:' + result_digest(params)
+
+
+def result_etag(params):
+    """计算结果的强 ETag"""
+    return f'"{result_digest(params)}"'
+
+
+def cached_calculation(params):
+    """
+    按参数哈希（含引擎版本与电价数据版本）缓存的计算
+
+    返回 (结果缓存键, results.SimulationResult)；月度与经济数值以一块连续数组序列化。
+    未命中时同一参数的并发请求（进程内与同一主机的各工作进程）只计算一次并共享结果。
+    """
+    key = result_cache_key(params)
+    results = cache.get(key)
+    if results is None:
+        results = singleflight.group.do(key, lambda: _calculate_and_cache(key, params))
+    return key, results
+
+
+def _calculate_and_cache(key, params):
+    # 等待其他进程释放锁期间，共享缓存后端中可能已有结果
+    results = cache.get(key)
+    if results is None:
+        results = pipeline.calculate(params)
+        cache.set(key, results, RESULT_CACHE_TIMEOUT)
+    return results
@@ -0,0 +1,98 @@
+"""
+多方案并排对比
+用户给出一组配置（不同光伏容量、有无储能、不同电价类型），能量流阶段对全部配置只做一次
+向量化的批量计算（季节用电曲线与辐照度只构建一次），计价阶段按电价类型分组批量计价，
+结果为按字段列出各方案取值的紧凑对比数据。
+"""
+import numpy as np
+from django.conf import settings
+
+from . import pipeline
+from .results import COST_FIELDS, SimulationResult
+
+
+# 一次对比的最大方案数
+MAX_CONFIGS = getattr(settings, 'SOLAR_COMPARE_MAX_CONFIGS', 5)
+
+# 对比数据中给出年度合计的能量流字段 (kWh)
+ANNUAL_FIELDS = (
+    'generation', 'self_use_no_batt', 'export_no_batt', 'grid_no_batt',
+    'self_use_with_batt', 'export_with_batt', 'grid_with_batt',
+)
+
+# 对比数据中原样列出的输入参数
+CONFIG_FIELDS = (
+    'pv_capacity_kwp', 'battery_capacity_kwh', 'annual_consumption_kwh',
+    'grid_price', 'feed_in_price', 'tariff', 'battery_dispatch',
+)
+
+
+def _take(arrays, index):
+    return {key: values[index] for key, values in arrays.items()}
+
+
+def compare(configs, calculator=None):
+    """
+    计算多个方案，返回与 configs 一一对应的 SimulationResult 列表
+
+    configs: calculation_params 格式的参数字典列表
+    各方案的结果与 SolarCalculator.calculate 相同；能量流只有一次批量计算，
+    同一电价的方案一次计价，只有最优调度的方案逐个求解。
+    """
+    calculator = calculator or pipeline.default_pipeline.calculator
+    columns = {key: np.array([params[key] for params in configs], dtype=float)
+               for key in calculator.ENERGY_KEYS}
+    columns.update({key: np.array([params.get(key) for params in configs], dtype=object)
+                    for key in calculator.LOAD_KEYS})
+    flows = calculator.energy_flows(columns)
+
+    results = [None] * len(configs)
+    groups = {}
+    for index, params in enumerate(configs):
+        name, tariff = calculator.resolve_tariff(params)
+        if calculator.uses_optimal_dispatch(params):
+            _, config_flows, costs = calculator.optimal_dispatch(
+                params, tariff, _take(flows, slice(index, index + 1)))
+            results[index] = calculator.build_results(config_flows, costs, params)
+        else:
+            # 固定电价按逐方案的电价向量化计价，其余电价按电价对象分组
+            groups.setdefault(name if tariff is None else tariff, []).append(index)
+
+    for tariff, indices in groups.items():
+        group_flows = _take(flows, np.array(indices))
+        if isinstance(tariff, str):
+            costs = calculator.evaluate_costs(
+                group_flows, *(np.array([configs[index][key] for index in indices], dtype=float)
+                               for key in ('grid_price', 'feed_in_price')))
+        else:
+            costs = tariff.evaluate(group_flows)
+        for row, index in enumerate(indices):
+            results[index] = SimulationResult.from_arrays(
+                group_flows, costs, row,
+                tariff=configs[index]['tariff'],
+                battery_dispatch=configs[index]['battery_dispatch'],
+            )
+    return results
+
+
+def payback_years(params, result):
+    """电池投资回收期（年）；储能方案没有额外节省时为 None"""
+    extra_savings = result.savings_with_batt - result.savings_no_batt
+    return params['battery_cost'] / extra_savings if extra_savings > 0 else None
+
+
+def comparison_payload(configs, results, labels):
+    """
+    紧凑的对比数据：每个字段为按方案顺序排列的列表
+
+    configs 中的输入参数、年度经济指标、电池回收期与主要能量流的年度合计。
+    """
+    return {
+        'labels': list(labels),
+        'configs': {field: [params.get(field) for params in configs] for field in CONFIG_FIELDS},
+        'costs': {field: [getattr(result, field) for result in results] for field in COST_FIELDS},
+        'payback_years': [payback_years(params, result)
+                          for params, result in zip(configs, results)],
+        'annual': {field: [float(result.flow(field).sum()) for result in results]
+                   for field in ANNUAL_FIELDS},
+    }
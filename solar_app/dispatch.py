@@ -0,0 +1,175 @@
+"""
+电价感知的电池最优调度
+在离散化的荷电状态 (SoC) 网格上做动态规划，逐时决定电池充放电，使年度电费最小。
+全年按天分解：每天从 DAY_START_HOUR 开始、电池为空，
+365 天、所有 SoC 状态和所有方案在 NumPy 中一次性向量化求解，只需 24 步递推。
+"""
+import numpy as np
+
+from .solar_geometry import DAYS_IN_MONTH, HOUR_OF_DAY, HOURS_PER_DAY, HOURS_PER_YEAR, MONTH_OF_HOUR
+from .tariffs import HOUR_WINDOW, TIME_WINDOWS
+
+
+DAYS_PER_YEAR = HOURS_PER_YEAR // HOURS_PER_DAY
+
+# SoC 网格的档数（含空、满两端）
+DEFAULT_SOC_LEVELS = 21
+# 每小时最大充/放电量占容量的比例
+DEFAULT_C_RATE = 0.5
+# 往返效率；默认与月度模型一致取 100%
+DEFAULT_EFFICIENCY = 1.0
+# 每个调度日的起始钟点：此时早晚负荷已消耗完电池、光伏尚未开始充电，
+# 夜间低价充电与次日早高峰放电仍在同一天内
+DAY_START_HOUR = 9
+
+# 每个时段包含的小时数（三个时段各 8 小时）
+_WINDOW_HOURS = np.bincount(HOUR_WINDOW, minlength=len(TIME_WINDOWS))
+
+
+def hourly_load(consumption_by_window):
+    """
+    将分时段月用电量 (..., 12, 3) 均匀分配到各时段的每个小时，返回形状 (..., 8760)
+    """
+    consumption_by_window = np.asarray(consumption_by_window, dtype=float)
+    window = HOUR_WINDOW[HOUR_OF_DAY]
+    per_hour = DAYS_IN_MONTH[MONTH_OF_HOUR] * _WINDOW_HOURS[window]
+    return consumption_by_window[..., MONTH_OF_HOUR, window] / per_hour
+
+
+def _to_days(values, n):
+    """(n, 8760) -> (n, 天数, 24)，每天从 DAY_START_HOUR 开始（年末与年初首尾相接）"""
+    return np.roll(values, -DAY_START_HOUR, axis=-1).reshape(n, DAYS_PER_YEAR, HOURS_PER_DAY)
+
+
+def _to_hours(values, n):
+    """_to_days 的逆变换"""
+    return np.roll(values.reshape(n, HOURS_PER_YEAR), DAY_START_HOUR, axis=-1)
+
+
+def _interpolate(values, position):
+    """
+    在等间距 SoC 网格上对价值函数线性插值
+
+    values: 形状 (..., S)；position: 以档位为单位的连续位置，形状 (..., K)，返回 (..., K)
+    """
+    low = np.clip(np.floor(position).astype(np.intp), 0, values.shape[-1] - 2)
+    lower = np.take_along_axis(values, low, axis=-1)
+    upper = np.take_along_axis(values, low + 1, axis=-1)
+    return lower + (upper - lower) * (position - low)
+
+
+def optimal_dispatch(generation, load, import_prices, feed_in_price, battery_capacity_kwh,
+                     soc_levels=DEFAULT_SOC_LEVELS, c_rate=DEFAULT_C_RATE,
+                     efficiency=DEFAULT_EFFICIENCY):
+    """
+    求解电费最小的电池调度
+
+    generation, load: 形状 (n, 8760) 的逐时发电量与用电量 (kWh)
+    import_prices: 逐时购电价格 (€/kWh)，形状 (8760,) 或 (n, 8760)
+    feed_in_price: 上网电价，标量或形状 (n,)
+    battery_capacity_kwh: 电池容量，标量或形状 (n,)
+
+    每小时的候选动作为：移动到 SoC 网格上功率允许的任一档位，
+    或"自发自用"——按当小时的光伏余量/缺口连续充放电（落在网格之间时对价值函数线性插值），
+    因此网格较粗时也不会浪费零散的光伏余电。
+
+    返回字典（逐时数组形状均为 (n, 8760)）：
+        - soc: 每小时结束时的电池电量 (kWh)
+        - battery: 电池侧能量变化，正为充电、负为放电 (kWh)
+        - grid_import / grid_export: 购电量与上网电量 (kWh)
+        - cost: 年度电费 (€)，形状 (n,)
+    允许低价时段从电网充电；放电超过负荷的部分按上网电价送入电网。
+    """
+    generation = np.atleast_2d(np.asarray(generation, dtype=float))
+    n = len(generation)
+    load = np.broadcast_to(np.asarray(load, dtype=float), generation.shape)
+    import_prices = np.broadcast_to(np.asarray(import_prices, dtype=float), generation.shape)
+    feed_in = np.broadcast_to(np.asarray(feed_in_price, dtype=float), (n,))
+    capacity = np.broadcast_to(np.asarray(battery_capacity_kwh, dtype=float), (n,))
+
+    net = _to_days(load - generation, n)
+    prices = _to_days(import_prices, n)
+    one_way = np.sqrt(efficiency)
+    step_kwh = capacity / (soc_levels - 1)
+    rate_kwh = capacity * c_rate
+    levels = np.arange(soc_levels) * step_kwh[:, np.newaxis]  # (n, S)
+
+    def per_scenario(values, like):
+        """把形状 (n,) 的方案参数扩展到可与 like 广播的形状"""
+        return values.reshape((n,) + (1,) * (np.ndim(like) - 1))
+
+    def hour_cost(net_hour, price, battery):
+        """电池侧能量变化为 battery 时当小时的电费（购电计价、上网按上网电价抵扣）"""
+        flow = net_hour + np.where(battery > 0, battery / one_way, battery * one_way)
+        # 购电部分按 price 计价、上网部分按上网电价抵扣
+        feed_in_price = per_scenario(feed_in, flow)
+        return np.maximum(flow, 0) * (price - feed_in_price) + flow * feed_in_price
+
+    def self_consumption(soc, net_hour):
+        """按当小时的光伏余量充电、按缺口放电，返回电池侧能量变化"""
+        room = per_scenario(capacity, soc) - soc
+        rate = per_scenario(rate_kwh, soc)
+        charge = np.minimum(np.maximum(-net_hour, 0) * one_way, room)
+        discharge = np.minimum(np.maximum(net_hour, 0) / one_way, soc)
+        return np.minimum(charge, rate) - np.minimum(discharge, rate)
+
+    def value_at(values, soc):
+        """价值函数在连续电量 soc（形状 (n, 天数, K)）处的插值"""
+        step = per_scenario(step_kwh, soc)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            position = np.where(step > 0, soc / step, 0.0)
+        return _interpolate(values, position)
+
+    # 网格档位之间的转移 s -> s'（电池侧能量）及功率限制
+    moves = (levels[:, np.newaxis, :] - levels[:, :, np.newaxis])[:, np.newaxis]  # (n, 1, S, S)
+    penalty = np.where(np.abs(moves) <= per_scenario(rate_kwh, moves) + 1e-9, 0.0, np.inf)
+    soc_grid = levels[:, np.newaxis, :]  # (n, 1, S)
+
+    # 逆向递推：values[h][..., s] 为第 h 小时开始时电量处于档位 s、到当天结束的最小电费
+    values = np.zeros((HOURS_PER_DAY + 1, n, DAYS_PER_YEAR, soc_levels))
+    for hour in reversed(range(HOURS_PER_DAY)):
+        net_hour = net[:, :, hour, np.newaxis]
+        price = prices[:, :, hour, np.newaxis]
+        after = values[hour + 1]
+
+        cost = hour_cost(net_hour[..., np.newaxis], price[..., np.newaxis], moves)
+        best = (cost + penalty + after[:, :, np.newaxis, :]).min(axis=-1)
+
+        battery = self_consumption(soc_grid, net_hour)
+        follow = hour_cost(net_hour, price, battery) + value_at(after, soc_grid + battery)
+        values[hour] = np.minimum(best, follow)
+
+    # 正向模拟：每天从空电池出发，在实际（连续）电量上重新选择最优动作
+    soc = np.zeros((n, DAYS_PER_YEAR))
+    battery = np.empty((n, DAYS_PER_YEAR, HOURS_PER_DAY))
+    for hour in range(HOURS_PER_DAY):
+        net_hour = net[:, :, hour]
+        price = prices[:, :, hour]
+        after = values[hour + 1]
+
+        targets = levels[:, np.newaxis, :] - soc[..., np.newaxis]  # (n, D, S)
+        total = hour_cost(net_hour[..., np.newaxis], price[..., np.newaxis], targets) + after
+        total[np.abs(targets) > per_scenario(rate_kwh, targets) + 1e-9] = np.inf
+        choice = total.argmin(axis=-1)[..., np.newaxis]
+        best = np.take_along_axis(total, choice, axis=-1)[..., 0]
+        grid_move = np.take_along_axis(targets, choice, axis=-1)[..., 0]
+
+        follow_move = self_consumption(soc, net_hour)
+        follow = hour_cost(net_hour, price, follow_move) + \
+            value_at(after, (soc + follow_move)[..., np.newaxis])[..., 0]
+
+        battery[:, :, hour] = np.where(follow <= best, follow_move, grid_move)
+        soc = np.clip(soc + battery[:, :, hour], 0, capacity[:, np.newaxis])
+
+    flow = net + np.where(battery > 0, battery / one_way, battery * one_way)
+    grid_import = np.maximum(flow, 0)
+    grid_export = np.maximum(-flow, 0)
+    cost = (grid_import * prices).sum(axis=(1, 2)) - grid_export.sum(axis=(1, 2)) * feed_in
+
+    return {
+        'soc': _to_hours(np.cumsum(battery, axis=-1), n),
+        'battery': _to_hours(battery, n),
+        'grid_import': _to_hours(grid_import, n),
+        'grid_export': _to_hours(grid_export, n),
+        'cost': cost,
+    }
@@ -0,0 +1,86 @@
+"""
+模拟结果导出
+直接从计算引擎的数组生成 CSV（分块生成器，供 StreamingHttpResponse 使用）、
+.npz 压缩包或带简短文件头的 float32 紧凑二进制格式，不经过 pandas 或逐行字典。
+"""
+import io
+import struct
+
+import numpy as np
+
+
+CSV_CHUNK_ROWS = 4096
+
+# 紧凑二进制格式：
+#   magic(4s) 版本(uint16) 字段数(uint16) 行数(uint32) 字段名长度(uint32)
+#   字段名（UTF-8，逗号分隔） + 行优先的 little-endian float32 数据
+BINARY_MAGIC = b'SOLR'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sHHII')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'npz': 'application/octet-stream',
+    'bin': 'application/octet-stream',
+}
+
+
+def iter_csv(header, matrix, labels=None, fmt='%.4f', chunk_rows=CSV_CHUNK_ROWS):
+    """
+    按块生成CSV文本
+
+    header: 列名序列（若提供 labels，第一列为标签列）
+    matrix: 形状 (行数, 列数) 的数值数组，或逐块产生此类数组的可迭代对象
+    labels: 可选的行标签序列，写在每行最前面
+    """
+    yield ','.join(header) + '\n'
+
+    blocks = [matrix] if isinstance(matrix, np.ndarray) else matrix
+    row = 0
+    for block in blocks:
+        block = np.atleast_2d(block)
+        for start in range(0, len(block), chunk_rows):
+            chunk = block[start:start + chunk_rows]
+            buf = io.StringIO()
+            np.savetxt(buf, chunk, fmt=fmt, delimiter=',')
+            lines = buf.getvalue()
+            if labels is not None:
+                lines = ''.join(f'{label},{line}\n' for label, line in
+                                zip(labels[row:row + len(chunk)], lines.splitlines()))
+            row += len(chunk)
+            yield lines
+
+
+def to_npz(arrays):
+    """将命名数组打包为压缩的 .npz 字节串"""
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+
+def iter_binary(fields, matrix):
+    """
+    按块生成紧凑二进制数据：文件头 + float32 行数据
+
+    matrix 可以是单个数组，也可以是逐块产生数组的可迭代对象；
+    后者行数事先未知时文件头中的行数记为 0，读取方按文件长度推算。
+    """
+    names = ','.join(fields).encode()
+    if isinstance(matrix, np.ndarray):
+        n_rows, blocks = len(matrix), [matrix]
+    else:
+        n_rows, blocks = 0, matrix
+    yield BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(fields), n_rows, len(names)) + names
+    for block in blocks:
+        yield np.ascontiguousarray(block, dtype='<f4').tobytes()
+
+
+def read_binary(data):
+    """解析 iter_binary 生成的数据，返回 (字段名列表, 形状 (行数, 字段数) 的 float32 数组)"""
+    magic, version, n_fields, _n_rows, name_len = BINARY_HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError('不支持的二进制导出格式')
+    offset = BINARY_HEADER.size
+    fields = data[offset:offset + name_len].decode().split(',')
+    values = np.frombuffer(data, dtype='<f4', offset=offset + name_len)
+    return fields, values.reshape(-1, n_fields)
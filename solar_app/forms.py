@@ -5,6 +5,65 @@ Django Forms for Solar Simulation App
 from django import forms
 from django.utils.translation import gettext_lazy as _
 
+from . import load_profiles, tariffs
+from .solar_calculator import SolarCalculator
+
+
+TARIFF_CHOICES = [
+    (tariffs.FlatTariff.name, _('固定电价')),
+    (tariffs.TimeOfUseTariff.name, _('分时电价（夜间低谷 / 早晚高峰）')),
+    (tariffs.HourlyTariff.name, _('动态电价（逐时价格）')),
+]
+
+DISPATCH_CHOICES = [
+    (SolarCalculator.DISPATCH_GREEDY, _('简单策略（光伏余电充电，早晚与夜间放电）')),
+    (SolarCalculator.DISPATCH_OPTIMAL, _('最优调度（按电价逐时优化充放电）')),
+]
+
+# 电动汽车充电时段，与 tariffs.TIME_WINDOWS 对应
+EV_CHARGING_CHOICES = [
+    ('night', _('夜间（22-06时）')),
+    ('morn_even', _('早晚（06-09时 & 17-22时）')),
+    ('midday', _('白天（09-17时）')),
+]
+
+# 日间用电分布的三个百分比字段，总和必须为100
+PCT_FIELDS = ('pct_night', 'pct_morning_evening', 'pct_midday')
+PCT_TOTAL_CODE = 'pct_total'
+
+
+def pct_total_error(total_pct):
+    """百分比总和不为100时的表单级错误"""
+    return forms.ValidationError(f'日间用电百分比必须总和为100%！当前总和为{total_pct}%',
+                                 code=PCT_TOTAL_CODE)
+
+
+def calculation_params(data):
+    """将已验证的字段值转换为计算模块所需的参数格式"""
+    return {
+        'pv_capacity_kwp': data['pv_capacity_kwp'],
+        'battery_capacity_kwh': data['battery_capacity_kwh'],
+        'annual_consumption_kwh': data['annual_consumption_kwh'],
+        'cons_fraction_night': data['pct_night'] / 100.0,
+        'cons_fraction_morn_even': data['pct_morning_evening'] / 100.0,
+        'cons_fraction_midday': data['pct_midday'] / 100.0,
+        'grid_price': data['grid_price'],
+        'feed_in_price': data['feed_in_price'],
+        'tariff': data.get('tariff') or tariffs.FlatTariff.name,
+        'battery_dispatch': data.get('battery_dispatch') or SolarCalculator.DISPATCH_GREEDY,
+        # 附加负荷（见 load_profiles）；未填写时不附加
+        'heat_pump_kwh': data.get('heat_pump_kwh') or 0.0,
+        'ev_annual_km': data.get('ev_annual_km') or 0,
+        'ev_charging_window': data.get('ev_charging_window') or
+        load_profiles.PARAM_DEFAULTS['ev_charging_window'],
+        'home_office_days': data.get('home_office_days') or 0,
+        # 也保存成本信息用于后续扩展
+        'pv_cost': data['pv_cost'],
+        'inverter_cost': data['inverter_cost'],
+        'battery_cost': data['battery_cost'],
+        'inverter_power_kw': data['inverter_power_kw'],
+    }
+
 
 class SolarSimulationForm(forms.Form):
     """太阳能模拟参数表单"""
@@ -77,6 +136,15 @@ class SolarSimulationForm(forms.Form):
         })
     )
     
+    battery_dispatch = forms.ChoiceField(
+        label=_('电池调度策略'),
+        choices=DISPATCH_CHOICES,
+        initial=SolarCalculator.DISPATCH_GREEDY,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        help_text=_('最优调度在分时或动态电价下可利用低价时段从电网充电')
+    )
+    
     # 电价
     grid_price = forms.FloatField(
         label=_('电网电价 [€/kWh]'),
@@ -98,6 +166,15 @@ class SolarSimulationForm(forms.Form):
         })
     )
     
+    tariff = forms.ChoiceField(
+        label=_('电价类型'),
+        choices=TARIFF_CHOICES,
+        initial=tariffs.FlatTariff.name,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        help_text=_('分时与动态电价以上方电网电价为全年平均水平')
+    )
+    
     # 用电模式
     annual_consumption_kwh = forms.IntegerField(
         label=_('年度家庭用电量 [kWh]'),
@@ -148,19 +225,69 @@ class SolarSimulationForm(forms.Form):
         })
     )
     
+    # 附加负荷（可选）
+    heat_pump_kwh = forms.FloatField(
+        label=_('热泵年用电量 [kWh]'),
+        initial=0.0,
+        min_value=0.0,
+        required=False,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'step': '100'
+        }),
+        help_text=_('按月度采暖度日数分配，冬季用电多。0 = 无热泵')
+    )
+    
+    ev_annual_km = forms.IntegerField(
+        label=_('电动汽车年行驶里程 [km]'),
+        initial=0,
+        min_value=0,
+        required=False,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'step': '1000'
+        }),
+        help_text=_('按 0.2 kWh/km（含充电损耗）计算。0 = 无电动汽车')
+    )
+    
+    ev_charging_window = forms.ChoiceField(
+        label=_('电动汽车充电时段'),
+        choices=EV_CHARGING_CHOICES,
+        initial=load_profiles.PARAM_DEFAULTS['ev_charging_window'],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    
+    home_office_days = forms.IntegerField(
+        label=_('居家办公 [天/周]'),
+        initial=0,
+        min_value=0,
+        max_value=7,
+        required=False,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '0',
+            'max': '7'
+        }),
+        help_text=_('每个居家办公日白天约多用 1.5 kWh')
+    )
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 未配置逐时电价文件时不提供动态电价选项
+        available = tariffs.available_tariffs()
+        self.fields['tariff'].choices = [
+            choice for choice in TARIFF_CHOICES if choice[0] in available
+        ]
+    
     def clean(self):
         """表单级别的验证"""
         cleaned_data = super().clean()
-        pct_night = cleaned_data.get('pct_night', 0)
-        pct_morning_evening = cleaned_data.get('pct_morning_evening', 0)
-        pct_midday = cleaned_data.get('pct_midday', 0)
         
         # 验证日间用电百分比总和为100%
-        total_pct = pct_night + pct_morning_evening + pct_midday
+        total_pct = sum(cleaned_data.get(name, 0) for name in PCT_FIELDS)
         if total_pct != 100:
-            raise forms.ValidationError(
-                f'日间用电百分比必须总和为100%！当前总和为{total_pct}%'
-            )
+            raise pct_total_error(total_pct)
         
         return cleaned_data
     
@@ -168,20 +295,5 @@ class SolarSimulationForm(forms.Form):
         """将表单数据转换为计算模块所需的参数格式"""
         if not self.is_valid():
             return None
-            
-        data = self.cleaned_data
-        return {
-            'pv_capacity_kwp': data['pv_capacity_kwp'],
-            'battery_capacity_kwh': data['battery_capacity_kwh'],
-            'annual_consumption_kwh': data['annual_consumption_kwh'],
-            'cons_fraction_night': data['pct_night'] / 100.0,
-            'cons_fraction_morn_even': data['pct_morning_evening'] / 100.0,
-            'cons_fraction_midday': data['pct_midday'] / 100.0,
-            'grid_price': data['grid_price'],
-            'feed_in_price': data['feed_in_price'],
-            # 也保存成本信息用于后续扩展
-            'pv_cost': data['pv_cost'],
-            'inverter_cost': data['inverter_cost'],
-            'battery_cost': data['battery_cost'],
-            'inverter_power_kw': data['inverter_power_kw'],
-        }
+
+        return calculation_params(self.cleaned_data)
@@ -0,0 +1,22 @@
+"""
+展示层使用的中文标签
+计算引擎与结果对象只使用 ASCII 字段名；图表、表格中的名称在这里集中定义，
+Django 视图中再经 gettext 翻译，Streamlit 应用直接使用。
+"""
+
+MONTH_NAMES = [
+    "1月", "2月", "3月", "4月", "5月", "6月",
+    "7月", "8月", "9月", "10月", "11月", "12月"
+]
+
+# 月度能量流字段 -> 显示名称
+FLOW_LABELS = {
+    'generation': "发电量",
+    'consumption': "用电量",
+    'self_use_no_batt': "自用电量(无储能)",
+    'export_no_batt': "上网电量(无储能)",
+    'grid_no_batt': "购电量(无储能)",
+    'self_use_with_batt': "自用电量(有储能)",
+    'export_with_batt': "上网电量(有储能)",
+    'grid_with_batt': "购电量(有储能)",
+}
@@ -0,0 +1,132 @@
+"""
+可组合的附加负荷：热泵、电动汽车充电与居家办公
+每种负荷由一条归一化的基础曲线（12个月 × 3个时段，全年之和为1）与年用电量决定。
+基础曲线只在首次使用时构建并缓存，一个家庭的附加负荷就是各基础曲线按年用电量的加权和；
+整批方案的权重组成一个矩阵，与基础曲线做一次矩阵乘法即可得到全部附加负荷，
+再与家庭基础负荷一起进入 SolarCalculator.simulate_batch。
+"""
+import functools
+
+import numpy as np
+
+from .solar_geometry import DAYS_IN_MONTH
+from .tariffs import TIME_WINDOWS
+
+
+# 附加负荷的计算参数及缺省值（缺省时不附加负荷）
+PARAM_DEFAULTS = {
+    'heat_pump_kwh': 0.0,
+    'ev_annual_km': 0.0,
+    'ev_charging_window': 'night',
+    'home_office_days': 0.0,
+}
+PARAM_KEYS = tuple(PARAM_DEFAULTS)
+
+# 德国月度采暖度日数 (K·d，室温 20 °C / 采暖界限 15 °C，多年平均)
+HEATING_DEGREE_DAYS = np.array([
+    580, 500, 450, 300, 150, 40,
+    15, 20, 110, 300, 450, 550,
+], dtype=float)
+# 热泵电耗中生活热水的比例，全年按天数均匀分布
+HEAT_PUMP_HOT_WATER_SHARE = 0.15
+# 热泵电耗在 夜间 / 早晚 / 中午 三个时段的分配：夜间与早晚气温低、供暖需求高
+HEAT_PUMP_WINDOW_SHARES = np.array([0.38, 0.37, 0.25])
+
+# 电动汽车每公里电耗 (kWh/km，含充电损耗)
+EV_KWH_PER_KM = 0.2
+# 电动汽车电耗的月度系数：冬季空调与电池低温使能耗升高
+EV_MONTHLY_FACTORS = np.array([
+    1.2, 1.15, 1.05, 1.0, 0.95, 0.9,
+    0.9, 0.9, 0.95, 1.0, 1.1, 1.2,
+])
+
+# 居家办公每天的额外用电 (kWh：电脑、显示器、照明、午餐) 与每年的工作周数
+HOME_OFFICE_KWH_PER_DAY = 1.5
+HOME_OFFICE_WEEKS = 46
+# 居家办公用电集中在白天，少量在早晚
+HOME_OFFICE_WINDOW_SHARES = np.array([0.0, 0.2, 0.8])
+
+# 基础曲线的顺序：热泵、三个充电时段的电动汽车、居家办公
+BASIS_NAMES = ('heat_pump',) + tuple(f'ev_{window}' for window in TIME_WINDOWS) + ('home_office',)
+_EV_OFFSET = 1
+_WINDOW_INDEX = {window: index for index, window in enumerate(TIME_WINDOWS)}
+
+
+def _curve(monthly, window_shares):
+    """月度权重 × 时段比例，归一化为全年之和为1"""
+    return np.outer(monthly / monthly.sum(), window_shares / window_shares.sum())
+
+
+@functools.lru_cache(maxsize=None)
+def basis_curves():
+    """全部基础曲线，形状 (len(BASIS_NAMES), 12, 3)，每条全年之和为1；结果只读并在进程内缓存"""
+    heating = HEATING_DEGREE_DAYS / HEATING_DEGREE_DAYS.sum()
+    hot_water = DAYS_IN_MONTH / DAYS_IN_MONTH.sum()
+    heat_pump = (1 - HEAT_PUMP_HOT_WATER_SHARE) * heating + HEAT_PUMP_HOT_WATER_SHARE * hot_water
+
+    curves = [_curve(heat_pump, HEAT_PUMP_WINDOW_SHARES)]
+    for index in range(len(TIME_WINDOWS)):
+        curves.append(_curve(DAYS_IN_MONTH * EV_MONTHLY_FACTORS,
+                             np.eye(len(TIME_WINDOWS))[index]))
+    curves.append(_curve(DAYS_IN_MONTH.astype(float), HOME_OFFICE_WINDOW_SHARES))
+
+    curves = np.stack(curves)
+    curves.flags.writeable = False
+    return curves
+
+
+def _column(params, key):
+    value = params.get(key)
+    if value is None:
+        value = PARAM_DEFAULTS[key]
+    return np.atleast_1d(np.asarray(value, dtype=float))
+
+
+def _window_index(params):
+    windows = params.get('ev_charging_window')
+    windows = np.atleast_1d(np.asarray(PARAM_DEFAULTS['ev_charging_window']
+                                       if windows is None else windows, dtype=object))
+    return np.array([_WINDOW_INDEX[window or PARAM_DEFAULTS['ev_charging_window']]
+                     for window in windows.tolist()])
+
+
+def has_addons(params):
+    """params 中是否有非零的附加负荷"""
+    return any(np.any(_column(params, key)) for key in ('heat_pump_kwh', 'ev_annual_km',
+                                                          'home_office_days'))
+
+
+def weights(params):
+    """
+    各基础曲线的权重（年用电量 kWh），形状 (n, len(BASIS_NAMES))
+
+    params: 标量或形状 (n,) 数组的参数字典，缺少的附加负荷参数取 PARAM_DEFAULTS
+    """
+    heat_pump = _column(params, 'heat_pump_kwh')
+    ev = _column(params, 'ev_annual_km') * EV_KWH_PER_KM
+    home_office = _column(params, 'home_office_days') * HOME_OFFICE_WEEKS * HOME_OFFICE_KWH_PER_DAY
+    window = _window_index(params)
+    n = np.broadcast_shapes(heat_pump.shape, ev.shape, home_office.shape, window.shape)[0]
+
+    result = np.zeros((n, len(BASIS_NAMES)))
+    result[:, 0] = heat_pump
+    result[np.arange(n), _EV_OFFSET + np.broadcast_to(window, (n,))] = np.broadcast_to(ev, (n,))
+    result[:, -1] = home_office
+    return result
+
+
+def annual_kwh(params):
+    """附加负荷的年用电量合计 (kWh)，形状 (n,)"""
+    return weights(params).sum(axis=1)
+
+
+def addon_load(params):
+    """
+    附加负荷的分时段月用电量 (kWh)，形状 (n, 12, 3)；没有附加负荷时返回 None
+
+    结果为 weights(params) 与 basis_curves() 的加权和，可直接作为 simulate_batch 的 extra_load。
+    """
+    if not has_addons(params):
+        return None
+    curves = basis_curves()
+    return (weights(params) @ curves.reshape(len(curves), -1)).reshape(-1, *curves.shape[1:])
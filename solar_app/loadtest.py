@@ -0,0 +1,354 @@
+"""
+负载测试工具（manage.py loadtest）
+以可配置的并发度发送接近真实使用的请求组合：首页、表单模拟、语言切换后的结果页、JSON API
+和批量导出；可以在进程内直接调用 WSGI 应用，也可以请求本地运行的服务器。
+结果按接口给出吞吐量与 p50/p95/p99 延迟，便于比较不同部署与不同提交。
+"""
+import http.client
+import io
+import json
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+
+# 默认的请求组合（接口 -> 权重）
+DEFAULT_MIX = {'index': 30, 'simulate': 25, 'language': 10, 'api': 30, 'batch': 5}
+DEFAULT_BATCH_SIZE = 100
+
+LANGUAGES = ('en', 'de', 'zh-hans')
+LANGUAGE_COOKIE = 'django_language'
+
+# 被准入控制拒绝的状态码单独统计，不计为错误
+REJECTED_STATUSES = (429, 503)
+
+Sample = namedtuple('Sample', 'endpoint status latency')
+
+_CSRF_INPUT = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def parse_mix(text):
+    """解析 "index=3,api=5" 形式的请求组合"""
+    mix = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f'未知的接口: {name}（可选 {", ".join(DEFAULT_MIX)}）')
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError('请求组合为空')
+    return mix
+
+
+class WSGITransport:
+    """在进程内直接调用 WSGI 应用，包含完整的中间件链"""
+
+    target = 'wsgi'
+
+    def __init__(self, application):
+        self.application = application
+
+    def request(self, method, path, body=b'', headers=None, remote_addr='127.0.0.1'):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'REMOTE_ADDR': remote_addr,
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in (headers or {}).items():
+            key = name.upper().replace('-', '_')
+            environ[key if key == 'CONTENT_TYPE' else 'HTTP_' + key] = value
+
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = response_headers
+
+        result = self.application(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], started['headers'], content
+
+
+class HTTPTransport:
+    """请求本地运行的服务器；每个线程保持一条长连接"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        if parts.scheme != 'http':
+            raise ValueError('只支持 http:// 地址')
+        self.target = base_url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, body=b'', headers=None, remote_addr=None):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=60)
+        try:
+            connection.request(method, self.prefix + path, body=body or None,
+                               headers=headers or {})
+            response = connection.getresponse()
+            return response.status, response.getheaders(), response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            raise
+
+
+class Session:
+    """一个模拟用户：保存 Cookie 与 CSRF 令牌"""
+
+    def __init__(self, transport, index, clients, api_keys=()):
+        self.transport = transport
+        self.cookies = {}
+        self.csrf_token = ''
+        self.remote_addr = f'10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}'
+        self.clients = clients
+        self.api_keys = api_keys
+
+    def request(self, method, path, body=b'', headers=None, remote_addr=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        status, response_headers, content = self.transport.request(
+            method, path, body, headers, remote_addr=remote_addr or self.remote_addr)
+        for name, value in response_headers:
+            if name.lower() == 'set-cookie':
+                cookie, _, _ = value.partition(';')
+                key, _, cookie_value = cookie.partition('=')
+                self.cookies[key.strip()] = cookie_value.strip().strip('"')
+        return status, content
+
+    def start(self):
+        """像浏览器一样先打开首页，取得 CSRF Cookie 与表单令牌"""
+        status, content = self.request('GET', '/')
+        match = _CSRF_INPUT.search(content)
+        if status != 200 or match is None:
+            raise RuntimeError(f'无法从首页获取CSRF令牌（状态码 {status}）')
+        self.csrf_token = match.group(1).decode()
+
+
+def random_inputs(rng):
+    """一组随机但合理的表单输入（百分比总和为100）"""
+    night = rng.randrange(10, 50, 5)
+    morning_evening = rng.randrange(20, 90 - night, 5)
+    return {
+        'pv_capacity_kwp': rng.choice([3.0, 4.5, 5.0, 6.5, 8.0, 10.0]),
+        'pv_cost': 9000,
+        'inverter_power_kw': 5.0,
+        'inverter_cost': 1500,
+        'battery_capacity_kwh': rng.choice([0.0, 5.0, 10.0, 15.0]),
+        'battery_cost': 6000,
+        'grid_price': rng.choice([0.25, 0.30, 0.35, 0.40]),
+        'feed_in_price': rng.choice([0.01, 0.08]),
+        'annual_consumption_kwh': rng.randrange(2000, 8001, 100),
+        'pct_night': night,
+        'pct_morning_evening': morning_evening,
+        'pct_midday': 100 - night - morning_evening,
+    }
+
+
+def _api_request(session, rng, path, body):
+    """
+    以随机一个模拟客户端的身份发送 API 请求
+
+    进程内调用时各客户端使用不同的来源地址；请求外部服务器时来源地址不可控，
+    可轮流使用服务器 SOLAR_API_KEYS 中登记的密钥（api_keys）区分客户端。
+    """
+    client = rng.randrange(session.clients)
+    headers = {'Content-Type': 'application/json'}
+    if session.api_keys:
+        headers['X-Api-Key'] = session.api_keys[client % len(session.api_keys)]
+    address = f'172.{16 + client // 65536 % 16}.{client // 256 % 256}.{client % 256}'
+    return session.request('POST', path, body, headers, remote_addr=address)
+
+
+def _index(session, rng, options):
+    return session.request('GET', '/', headers={'Accept-Language': rng.choice(LANGUAGES)})
+
+
+def _simulate(session, rng, options):
+    body = urlencode(dict(random_inputs(rng), csrfmiddlewaretoken=session.csrf_token)).encode()
+    return session.request('POST', '/simulate/', body, {
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'X-CSRFToken': session.csrf_token,
+    })
+
+
+def _language(session, rng, options):
+    # 切换语言后重新打开结果页：由 session 中保存的上一次输入恢复
+    session.cookies[LANGUAGE_COOKIE] = rng.choice(LANGUAGES)
+    return session.request('GET', '/simulate/')
+
+
+def _api(session, rng, options):
+    body = json.dumps(random_inputs(rng)).encode()
+    return _api_request(session, rng, '/api/simulate/', body)
+
+
+def _batch(session, rng, options):
+    scenarios = [random_inputs(rng) for _ in range(options['batch_size'])]
+    body = json.dumps({'scenarios': scenarios}).encode()
+    return _api_request(session, rng, '/export/batch.csv', body)
+
+
+REQUESTS = {
+    'index': _index,
+    'simulate': _simulate,
+    'language': _language,
+    'api': _api,
+    'batch': _batch,
+}
+
+
+def _worker(transport, index, options, deadline, budget, samples, errors):
+    rng = random.Random(options['seed'] + index)
+    names = list(options['mix'])
+    weights = [options['mix'][name] for name in names]
+    session = Session(transport, index, options['clients'], options['api_keys'])
+    try:
+        session.start()
+    except Exception as exc:
+        errors.append(f'worker {index}: {exc}')
+        return
+
+    warmup_until = time.perf_counter() + options['warmup']
+    while time.perf_counter() < deadline and budget():
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            status, _ = REQUESTS[name](session, rng, options)
+        except Exception as exc:
+            status = 0
+            errors.append(f'{name}: {exc}')
+        finished = time.perf_counter()
+        if started >= warmup_until:
+            samples.append(Sample(name, status, finished - started))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=Path(__file__).resolve().parent.parent,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _summary(samples, elapsed):
+    latencies = np.array([sample.latency for sample in samples]) * 1000
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample.status)] = statuses.get(str(sample.status), 0) + 1
+    rejected = sum(1 for sample in samples if sample.status in REJECTED_STATUSES)
+    failed = sum(1 for sample in samples
+                 if sample.status not in REJECTED_STATUSES and not 200 <= sample.status < 400)
+    summary = {
+        'requests': len(samples),
+        'errors': failed,
+        'rejected': rejected,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed > 0 else None,
+        'status': dict(sorted(statuses.items())),
+    }
+    if len(latencies):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary['latency_ms'] = {
+            'p50': round(float(p50), 2),
+            'p95': round(float(p95), 2),
+            'p99': round(float(p99), 2),
+            'mean': round(float(latencies.mean()), 2),
+            'max': round(float(latencies.max()), 2),
+        }
+    return summary
+
+
+def run(transport, concurrency=4, duration=10.0, requests=None, mix=None, warmup=0.0,
+        batch_size=DEFAULT_BATCH_SIZE, clients=1000, api_keys=(), seed=0):
+    """
+    执行负载测试并返回 JSON 可序列化的报告
+
+    duration: 持续秒数（含预热）；requests: 可选的请求总数上限（先到者为准）
+    warmup: 开始后这段时间内的请求不计入统计
+    clients: API 请求随机使用的模拟客户端数量，模拟多个独立客户端经过限流
+    api_keys: 服务器已登记的 API 密钥，请求外部服务器时用于区分客户端
+    """
+    options = {
+        'mix': mix or DEFAULT_MIX,
+        'warmup': warmup,
+        'batch_size': batch_size,
+        'clients': max(1, clients),
+        'api_keys': list(api_keys),
+        'seed': seed,
+    }
+    samples = []
+    errors = []
+    counter = iter(range(requests)) if requests else None
+    lock = threading.Lock()
+
+    def budget():
+        if counter is None:
+            return True
+        with lock:
+            return next(counter, None) is not None
+
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    deadline = started + duration
+    threads = [threading.Thread(target=_worker, daemon=True,
+                                args=(transport, index, options, deadline, budget, samples, errors))
+               for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = max(time.perf_counter() - started - warmup, 0.0)
+
+    report = {
+        'target': transport.target,
+        'commit': _git_commit(),
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'concurrency': concurrency,
+        'duration_seconds': round(elapsed, 3),
+        'warmup_seconds': warmup,
+        'mix': options['mix'],
+        'batch_size': batch_size,
+    }
+    report.update(_summary(samples, elapsed))
+    report['endpoints'] = {
+        name: _summary([sample for sample in samples if sample.endpoint == name], elapsed)
+        for name in options['mix']
+    }
+    report['error_samples'] = errors[:10]
+    return report
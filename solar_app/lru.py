@@ -0,0 +1,36 @@
+"""
+进程内LRU缓存
+晴空曲线、分阶段计算的各阶段结果与区域地图瓦片等进程内缓存共用
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """线程安全的简单LRU缓存"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
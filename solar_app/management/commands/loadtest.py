@@ -0,0 +1,68 @@
+"""
+manage.py loadtest - 负载测试，输出各接口的吞吐量与延迟分位数
+"""
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from solar_app import loadtest
+
+
+class Command(BaseCommand):
+    help = ('以可配置的并发度对应用施加接近真实的请求组合，'
+            '输出吞吐量与各接口 p50/p95/p99 延迟（JSON）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='本地服务器地址（如 http://127.0.0.1:8000）；'
+                                          '省略时在进程内直接调用 WSGI 应用')
+        parser.add_argument('--concurrency', type=int, default=4, help='并发用户数（线程数）')
+        parser.add_argument('--duration', type=float, default=10.0, help='持续秒数（含预热）')
+        parser.add_argument('--requests', type=int, help='请求总数上限（与持续时间先到者为准）')
+        parser.add_argument('--warmup', type=float, default=1.0, help='预热秒数，不计入统计')
+        parser.add_argument('--mix', help='请求组合，如 "index=30,simulate=25,language=10,api=30,batch=5"')
+        parser.add_argument('--batch-size', type=int, default=loadtest.DEFAULT_BATCH_SIZE,
+                            help='批量导出请求中的方案数')
+        parser.add_argument('--clients', type=int, default=1000,
+                            help='API 请求随机使用的模拟客户端数量（进程内按来源地址区分，用于限流）')
+        parser.add_argument('--api-key', action='append', default=[], dest='api_keys',
+                            help='服务器 SOLAR_API_KEYS 中登记的密钥，API 请求轮流使用；可重复')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='报告输出路径（省略则写到标准输出）')
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['mix']) if options['mix'] else None
+            if options['url']:
+                transport = loadtest.HTTPTransport(options['url'])
+            else:
+                from django.core.wsgi import get_wsgi_application
+
+                transport = loadtest.WSGITransport(get_wsgi_application())
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options['concurrency'] < 1:
+            raise CommandError('并发数必须至少为 1')
+        if options['warmup'] >= options['duration']:
+            raise CommandError('预热时间必须短于持续时间')
+
+        report = loadtest.run(
+            transport,
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            requests=options['requests'],
+            mix=mix,
+            warmup=options['warmup'],
+            batch_size=options['batch_size'],
+            clients=options['clients'],
+            api_keys=options['api_keys'],
+            seed=options['seed'],
+        )
+        text = json.dumps(report, ensure_ascii=False, indent=2) + '\n'
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(text)
+        else:
+            sys.stdout.write(text)
+        if report['requests'] == 0:
+            raise CommandError('没有完成任何请求：' + '; '.join(report['error_samples']))
@@ -0,0 +1,55 @@
+"""
+manage.py portfolio - 批量模拟家庭组合
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from solar_app.portfolio import (
+    DEFAULT_CHUNK_SIZE, PortfolioAggregate, PortfolioError,
+    iter_results_csv, read_chunks, run_portfolio,
+)
+
+
+class Command(BaseCommand):
+    help = '从 CSV/NDJSON 文件批量模拟家庭组合，输出每户结果与组合汇总'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='输入文件路径（.csv 或 .ndjson/.jsonl）')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='输入格式，默认按扩展名判断')
+        parser.add_argument('--output', help='每户结果的 CSV 输出路径（省略则只输出汇总）')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=1, help='进程数')
+
+    def handle(self, *args, **options):
+        path = Path(options['input'])
+        if not path.exists():
+            raise CommandError(f'输入文件不存在: {path}')
+        fmt = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'ndjson')
+
+        aggregate = PortfolioAggregate()
+        started = time.perf_counter()
+        output = open(options['output'], 'w', encoding='utf-8', newline='') \
+            if options['output'] else None
+        try:
+            with open(path, encoding='utf-8', newline='') as stream:
+                results = run_portfolio(read_chunks(stream, fmt, options['chunk_size']),
+                                        workers=options['workers'], aggregate=aggregate)
+                if output is None:
+                    for _ in results:
+                        pass
+                else:
+                    output.writelines(iter_results_csv(results))
+        except PortfolioError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if output is not None:
+                output.close()
+
+        summary = aggregate.as_dict()
+        summary['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+        sys.stdout.write(json.dumps(summary, ensure_ascii=False, indent=2) + '\n')
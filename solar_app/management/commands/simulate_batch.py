@@ -0,0 +1,142 @@
+"""
+manage.py simulate_batch - 离线批量模拟
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from solar_app.batch import (
+    DEFAULT_CHUNK_SIZE, OUTPUT_FORMATS, Checkpoint, OutputWriter, read_chunks, simulate_records,
+)
+from solar_app.portfolio import PortfolioError, ordered_map
+
+# 报告中列出的无效行示例数
+ERROR_SAMPLES = 10
+
+
+def _format_from_suffix(path, choices, default):
+    suffix = Path(path).suffix.lower().lstrip('.')
+    suffix = {'ndjson': 'jsonl', 'json': 'jsonl'}.get(suffix, suffix)
+    return suffix if suffix in choices else default
+
+
+class Command(BaseCommand):
+    help = ('离线批量模拟：从 JSONL/CSV 文件或标准输入读取参数（字段同表单），'
+            '分块校验并用向量化计算器求解，按输入顺序输出每行的年度结果')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-', help='输入文件路径，"-" 为标准输入')
+        parser.add_argument('--input-format', choices=['jsonl', 'csv'],
+                            help='输入格式，默认按扩展名判断（标准输入为 jsonl）')
+        parser.add_argument('--output', default='-', help='输出文件路径，"-" 为标准输出')
+        parser.add_argument('--format', choices=OUTPUT_FORMATS,
+                            help='输出格式，默认按扩展名判断（否则为 jsonl）')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=1, help='进程数')
+        parser.add_argument('--checkpoint', help='检查点文件路径，默认为 <输出文件>.checkpoint')
+        parser.add_argument('--resume', action='store_true', help='从检查点继续上一次中断的运行')
+
+    def handle(self, *args, **options):
+        source, target = options['input'], options['output']
+        input_format = options['input_format'] or \
+            ('jsonl' if source == '-' else _format_from_suffix(source, ('jsonl', 'csv'), 'jsonl'))
+        output_format = options['format'] or _format_from_suffix(target, OUTPUT_FORMATS, 'jsonl')
+        if options['chunk_size'] < 1:
+            raise CommandError('块大小必须至少为 1')
+        if source != '-' and not os.path.exists(source):
+            raise CommandError(f'输入文件不存在: {source}')
+
+        checkpoint = None
+        if target != '-':
+            checkpoint = Checkpoint(options['checkpoint'] or f'{target}.checkpoint')
+        elif options['checkpoint'] or options['resume']:
+            raise CommandError('输出到标准输出时不支持检查点')
+        state = self._resume_state(checkpoint, source, input_format, output_format, options)
+
+        input_stream = sys.stdin if source == '-' else open(source, encoding='utf-8', newline='')
+        if target == '-':
+            output = sys.stdout.buffer
+        else:
+            output = open(target, 'r+b' if state['rows'] else 'wb')
+            output.truncate(state['output_bytes'])
+            output.seek(state['output_bytes'])
+        writer = OutputWriter(output, output_format, header=not state['rows'])
+
+        started = time.perf_counter()
+        rows = chunks = 0
+        error_samples = []
+        try:
+            blocks = read_chunks(input_stream, input_format, options['chunk_size'], skip=state['rows'])
+            for (start, records), result in ordered_map(simulate_records, blocks, options['workers'],
+                                                        argument=lambda block: block[1]):
+                writer.write(start, result)
+                output.flush()
+                rows += len(records)
+                chunks += 1
+                invalid = len(result.errors)
+                state['rows'] += len(records)
+                state['invalid'] += invalid
+                error_samples.extend({'row': start + offset, 'errors': errors}
+                                     for offset, errors in result.errors[:ERROR_SAMPLES])
+                del error_samples[ERROR_SAMPLES:]
+                if checkpoint is not None:
+                    os.fsync(output.fileno())
+                    state['output_bytes'] = output.tell()
+                    checkpoint.save(state)
+        except PortfolioError as exc:
+            raise CommandError(f'{exc}（已处理 {state["rows"]} 行，可用 --resume 继续）')
+        finally:
+            if input_stream is not sys.stdin:
+                input_stream.close()
+            if output is not sys.stdout.buffer:
+                output.close()
+        if checkpoint is not None:
+            checkpoint.remove()
+
+        elapsed = time.perf_counter() - started
+        report = {
+            'input': source,
+            'output': target,
+            'format': output_format,
+            'workers': options['workers'],
+            'chunk_size': options['chunk_size'],
+            'resumed_from_row': state['resumed_from'],
+            'rows': rows,
+            'total_rows': state['rows'],
+            'invalid_rows': state['invalid'],
+            'chunks': chunks,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(rows / elapsed, 1) if elapsed > 0 else None,
+            'error_samples': error_samples,
+        }
+        # 结果写到标准输出时，报告写到标准错误
+        report_stream = sys.stderr if target == '-' else sys.stdout
+        report_stream.write(json.dumps(report, ensure_ascii=False, indent=2) + '\n')
+
+    def _resume_state(self, checkpoint, source, input_format, output_format, options):
+        """新运行的初始状态，或 --resume 时经过核对的检查点状态"""
+        state = {
+            'input': Checkpoint.identify(source) if source != '-' else None,
+            'input_format': input_format,
+            'format': output_format,
+            'rows': 0,
+            'invalid': 0,
+            'output_bytes': 0,
+        }
+        if not options['resume']:
+            state['resumed_from'] = 0
+            return state
+        if source == '-':
+            raise CommandError('从标准输入读取时无法继续上一次的运行')
+        saved = checkpoint.load()
+        if saved is None:
+            raise CommandError(f'检查点不存在: {checkpoint.path}')
+        for key in ('input', 'input_format', 'format'):
+            if saved.get(key) != state[key]:
+                raise CommandError(f'检查点与本次运行不一致（{key}），输入或输出格式已改变')
+        saved['resumed_from'] = saved['rows']
+        return saved
@@ -0,0 +1,106 @@
+"""
+蒙特卡洛不确定性分析
+对光伏年发电量、家庭年用电量与平均电价做随机抽样，分块批量计算全部样本，
+每块完成后给出进度与当前的节省金额、电池回收期分位数（P10/P50/P90），
+调用方（SSE 接口）可以边算边推送逐渐收敛的结果，并在客户端取消时停止迭代。
+"""
+import numpy as np
+from django.conf import settings
+
+from . import tariffs
+from .solar_calculator import SolarCalculator
+
+
+DEFAULT_SAMPLES = getattr(settings, 'SOLAR_MONTE_CARLO_SAMPLES', 50000)
+MAX_SAMPLES = getattr(settings, 'SOLAR_MONTE_CARLO_MAX_SAMPLES', 500000)
+CHUNK_SIZE = 5000
+# 每次运行最多推送的进度次数；样本较多时按比例增大块大小，限制重复计算分位数的开销
+MAX_UPDATES = 20
+
+# 各不确定因素的相对标准差（正态分布，均值为输入值）：
+# 光伏年发电量的年际波动、家庭用电量的估计误差、未来平均电价的变化
+SPREADS = {
+    'yield': 0.06,
+    'consumption': 0.10,
+    'grid_price': 0.15,
+}
+
+QUANTILES = (0.1, 0.5, 0.9)
+
+
+def sample_inputs(params, samples, seed=None, spreads=SPREADS):
+    """
+    抽取 samples 组输入，返回以 PARAM_KEYS 为键、形状 (samples,) 的列式参数
+
+    发电量与容量成正比，年发电量的波动以光伏容量的缩放表示；电池容量与用电比例不变。
+    附加负荷参数原样保留为标量。
+    """
+    rng = np.random.default_rng(seed)
+
+    def draw(key):
+        return np.maximum(rng.normal(1.0, spreads[key], samples), 0.0)
+
+    columns = {key: np.full(samples, float(params[key])) for key in SolarCalculator.PARAM_KEYS}
+    columns['pv_capacity_kwp'] = columns['pv_capacity_kwp'] * draw('yield')
+    columns['annual_consumption_kwh'] = columns['annual_consumption_kwh'] * draw('consumption')
+    columns['grid_price'] = columns['grid_price'] * draw('grid_price')
+    # 附加负荷（见 load_profiles）不参与抽样，所有样本相同
+    columns.update({key: params.get(key) for key in SolarCalculator.LOAD_KEYS})
+    return columns
+
+
+def _quantiles(values):
+    finite = values[np.isfinite(values)]
+    if len(finite) < len(values) / 2:
+        # 超过一半的样本电池无法回收，中位数及以上的分位数没有意义
+        return None
+    stats = dict(zip((f'p{int(q * 100)}' for q in QUANTILES),
+                     np.quantile(values, QUANTILES).tolist()))
+    return {key: value if np.isfinite(value) else None for key, value in stats.items()}
+
+
+def summary(savings_no_batt, savings_with_batt, battery_cost):
+    """已完成样本的分位数与平均值"""
+    extra = savings_with_batt - savings_no_batt
+    with np.errstate(divide='ignore'):
+        payback = np.where(extra > 0, battery_cost / np.where(extra > 0, extra, 1.0), np.inf)
+    return {
+        'savings_no_batt': dict(_quantiles(savings_no_batt), mean=float(savings_no_batt.mean())),
+        'savings_with_batt': dict(_quantiles(savings_with_batt),
+                                  mean=float(savings_with_batt.mean())),
+        'payback_years': _quantiles(payback) if battery_cost is not None else None,
+    }
+
+
+def run(params, samples=DEFAULT_SAMPLES, seed=None, calculator=None, chunk_size=CHUNK_SIZE):
+    """
+    分块运行蒙特卡洛分析，每块完成后产生一次部分结果
+
+    产生的字典包含 done、total、percent 以及已完成样本的 summary()；最后一次 done == total。
+    电价类型按 params['tariff'] 计价（平均电价的抽样以价格平移表示）；
+    有储能方案使用按月贪心策略，逐样本的最优调度代价过高。
+    """
+    calculator = calculator or SolarCalculator()
+    samples = int(min(max(samples, 1), MAX_SAMPLES))
+    chunk_size = max(chunk_size, -(-samples // MAX_UPDATES))
+    columns = sample_inputs(params, samples, seed)
+    tariff = calculator.resolve_tariff(params)[1] or \
+        tariffs.FlatTariff(params['grid_price'], params['feed_in_price'])
+
+    def pricing(flows, chunk):
+        return tariff.evaluate(flows, grid_price_shift=chunk['grid_price'] - params['grid_price'])
+
+    savings_no_batt = np.empty(samples)
+    savings_with_batt = np.empty(samples)
+    start = 0
+    for progress in calculator.iter_batch(columns, chunk_size, pricing):
+        savings_no_batt[start:progress.done] = progress.costs['savings_no_batt']
+        savings_with_batt[start:progress.done] = progress.costs['savings_with_batt']
+        start = progress.done
+        yield dict(
+            done=progress.done,
+            total=progress.total,
+            percent=round(100.0 * progress.done / progress.total, 1),
+            **summary(savings_no_batt[:start], savings_with_batt[:start],
+                      params.get('battery_cost')),
+        )
@@ -0,0 +1,114 @@
+"""
+分阶段增量计算
+计算被拆成能量流阶段（只依赖容量与用电参数）、计价阶段（电价、电价类型、调度策略）
+和梯度阶段（在能量流上前向传播导数）。
+每个阶段按自身输入参数在进程内缓存，参数变化时只重算受影响的阶段：
+只调整电价时直接复用已有的能量流，不再重新模拟。
+"""
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from . import sensitivity, tariffs
+from .solar_calculator import SolarCalculator
+from .lru import LRUCache
+
+
+DEFAULT_MAXSIZE = 256
+# 计价相关阶段的额外输入：电价依赖的外部数据版本（动态电价文件的修改时间，见 tariffs.tariff_source），
+# 价格文件更新后这些阶段重算
+TARIFF_SOURCE = 'tariff_source'
+
+# name: 阶段名；inputs: 该阶段直接读取的参数；upstream: 依赖的上游阶段
+Stage = namedtuple('Stage', ['name', 'inputs', 'upstream', 'compute'])
+
+
+def _freeze(value):
+    """将阶段输出中的数组设为只读，防止调用方修改缓存中的共享结果"""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+    elif isinstance(value, tuple):
+        for item in value:
+            _freeze(item)
+    return value
+
+
+class StagedCalculator:
+    """
+    依赖感知的分阶段缓存
+
+    每个阶段的缓存键 = 本阶段输入参数的取值 + 上游阶段的缓存键，
+    因此上游输入变化会使下游失效，而只影响下游的参数不会触发上游重算。
+    """
+
+    def __init__(self, calculator=None, maxsize=DEFAULT_MAXSIZE):
+        self.calculator = calculator or SolarCalculator()
+        calc = self.calculator
+        self.stages = (
+            Stage('flows', SolarCalculator.ENERGY_KEYS + SolarCalculator.LOAD_KEYS, (),
+                  lambda params: calc.energy_flows(params)),
+            Stage('priced', SolarCalculator.PRICING_KEYS + (TARIFF_SOURCE,), ('flows',),
+                  lambda params, flows: calc.pricing_stage(flows, params)),
+            # 梯度只需能量流阶段的分支信息，与计价阶段并列
+            Stage('sensitivities', SolarCalculator.PRICING_KEYS + ('battery_cost', TARIFF_SOURCE),
+                  ('flows',),
+                  lambda params, flows: sensitivity.savings_gradients(
+                      calc, params, flows, calc.resolve_tariff(params)[1],
+                      with_battery=not calc.uses_optimal_dispatch(params))),
+        )
+        self._caches = {stage.name: LRUCache(maxsize) for stage in self.stages}
+        self._stats = {stage.name: {'hits': 0, 'misses': 0} for stage in self.stages}
+        self._lock = threading.Lock()
+
+    def run(self, params):
+        """按依赖顺序执行各阶段，返回 {阶段名: 输出}"""
+        keys, outputs = {}, {}
+        inputs = dict(params, **{TARIFF_SOURCE: tariffs.tariff_source(params.get('tariff'))})
+        for stage in self.stages:
+            key = tuple(inputs.get(name) for name in stage.inputs) + \
+                tuple(keys[name] for name in stage.upstream)
+            keys[stage.name] = key
+
+            cache = self._caches[stage.name]
+            value = cache.get(key)
+            with self._lock:
+                self._stats[stage.name]['hits' if value is not None else 'misses'] += 1
+            if value is None:
+                value = _freeze(stage.compute(params, *(outputs[name] for name in stage.upstream)))
+                cache.put(key, value)
+            outputs[stage.name] = value
+        return outputs
+
+    def calculate(self, params):
+        """
+        与 SolarCalculator.calculate 结果相同，但复用未受影响阶段的缓存，
+        并附带节省金额与回收期对各参数的梯度 (.sensitivities，见 sensitivity.savings_gradients)
+        """
+        outputs = self.run(params)
+        results = self.calculator.build_results(*outputs['priced'], params)
+        # 缓存中的梯度在请求之间共享，返回副本
+        results.sensitivities = {name: dict(values) if values else values
+                                 for name, values in outputs['sensitivities'].items()}
+        return results
+
+    def stats(self):
+        """各阶段的缓存命中/未命中次数"""
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._stats.items()}
+
+    def clear(self):
+        for cache in self._caches.values():
+            cache.clear()
+
+
+# 进程内共享的默认实例（Django 视图与 Streamlit 应用共用）
+default_pipeline = StagedCalculator()
+
+
+def calculate(params):
+    """使用默认的分阶段缓存执行计算"""
+    return default_pipeline.calculate(params)
@@ -0,0 +1,287 @@
+"""
+组合模式：批量模拟大量家庭
+分块读取 CSV 或 NDJSON 输入，按块分发到进程池中用向量化计算器求解，
+逐块输出每户结果并维护流式汇总统计，内存占用与组合规模无关。
+"""
+import csv
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import exports, load_profiles, schema
+from .forms import SolarSimulationForm
+from .solar_calculator import SolarCalculator
+
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# 每 kWp 光伏大约需要的屋顶面积 (m²)，输入只给屋顶面积时用于换算装机容量
+ROOF_M2_PER_KWP = 5.0
+
+# 输入列 -> 缺省值（取自表单初始值）；百分比列与表单一致使用 0-100
+_INITIAL = {name: field.initial for name, field in SolarSimulationForm.base_fields.items()}
+INPUT_DEFAULTS = {
+    'pv_capacity_kwp': None,
+    'battery_capacity_kwh': 0.0,
+    'annual_consumption_kwh': None,
+    'pct_night': _INITIAL['pct_night'],
+    'pct_morning_evening': _INITIAL['pct_morning_evening'],
+    'pct_midday': _INITIAL['pct_midday'],
+    'grid_price': _INITIAL['grid_price'],
+    'feed_in_price': _INITIAL['feed_in_price'],
+    # 附加负荷（见 load_profiles）
+    'heat_pump_kwh': 0.0,
+    'ev_annual_km': 0.0,
+    'home_office_days': 0.0,
+}
+# 电动汽车充电时段为文本列
+EV_WINDOW_DEFAULT = load_profiles.PARAM_DEFAULTS['ev_charging_window']
+
+# 每户输出字段：经济指标 + 各能量流的年度合计
+RESULT_FIELDS = SolarCalculator.COST_FIELDS + SolarCalculator.FLOW_FIELDS
+
+
+class PortfolioError(ValueError):
+    """输入文件格式错误"""
+
+
+def iter_records(stream, fmt):
+    """逐条读取 CSV（字典）或 NDJSON（JSON 对象）记录"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'ndjson':
+        for line_no, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    raise PortfolioError(f'第 {line_no} 行不是有效的JSON')
+    else:
+        raise PortfolioError(f'不支持的输入格式: {fmt}')
+
+
+def _to_float(value, default):
+    if value is None or value == '':
+        return np.nan if default is None else default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _columns(records, offset=0):
+    """
+    将一块记录转换为列式数组
+
+    offset: 该块第一条记录在整个输入中的序号；没有户号列的记录以输入中的序号（从0开始）为户号
+    """
+    ids = []
+    windows = []
+    values = {name: [] for name in INPUT_DEFAULTS}
+    for index, record in enumerate(records, offset):
+        ids.append(str(record.get('household_id') or record.get('id') or index))
+        pv = record.get('pv_capacity_kwp')
+        if (pv is None or pv == '') and record.get('roof_area_m2') not in (None, ''):
+            pv = _to_float(record['roof_area_m2'], None) / ROOF_M2_PER_KWP
+        values['pv_capacity_kwp'].append(_to_float(pv, None))
+        for name, default in INPUT_DEFAULTS.items():
+            if name != 'pv_capacity_kwp':
+                values[name].append(_to_float(record.get(name), default))
+        windows.append(record.get('ev_charging_window') or EV_WINDOW_DEFAULT)
+    columns = {name: np.array(column, dtype=float) for name, column in values.items()}
+    columns['ev_charging_window'] = np.array(windows, dtype=object)
+    return ids, columns
+
+
+def read_chunks(stream, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    分块读取组合输入
+
+    每块产生 (户号列表, 列式数组字典)；任何时刻只保留一块数据在内存中。
+    必需列：annual_consumption_kwh，以及 pv_capacity_kwp 或 roof_area_m2；
+    可选的附加负荷列：heat_pump_kwh、ev_annual_km、ev_charging_window、home_office_days。
+    """
+    block = []
+    offset = 0
+    for record in iter_records(stream, fmt):
+        block.append(record)
+        if len(block) >= chunk_size:
+            yield _columns(block, offset)
+            offset += len(block)
+            block = []
+    if block:
+        yield _columns(block, offset)
+
+
+def valid_rows(columns):
+    """按表单规则逐行检查输入列（见 schema.validate_columns）：必填、整数、范围与百分比总和为100"""
+    fields = tuple(INPUT_DEFAULTS) + ('ev_charging_window',)
+    return schema.validate_columns(columns, fields=fields).valid
+
+
+def simulate_chunk(columns):
+    """
+    计算一块家庭数据（在工作进程中执行）
+
+    返回 (有效行掩码, 形状 (有效行数, len(RESULT_FIELDS)) 的结果矩阵)
+    """
+    mask = valid_rows(columns)
+    params = {
+        'pv_capacity_kwp': columns['pv_capacity_kwp'][mask],
+        'battery_capacity_kwh': columns['battery_capacity_kwh'][mask],
+        'annual_consumption_kwh': columns['annual_consumption_kwh'][mask],
+        'cons_fraction_night': columns['pct_night'][mask] / 100.0,
+        'cons_fraction_morn_even': columns['pct_morning_evening'][mask] / 100.0,
+        'cons_fraction_midday': columns['pct_midday'][mask] / 100.0,
+        'grid_price': columns['grid_price'][mask],
+        'feed_in_price': columns['feed_in_price'][mask],
+    }
+    params.update({key: columns[key][mask] for key in SolarCalculator.LOAD_KEYS})
+    flows, costs = SolarCalculator().calculate_batch(params)
+    matrix = np.column_stack([costs[field] for field in SolarCalculator.COST_FIELDS] +
+                             [flows[field].sum(axis=1) for field in SolarCalculator.FLOW_FIELDS])
+    return mask, matrix
+
+
+class StreamingHistogram:
+    """固定分箱的流式直方图，用于在常数内存下估计分位数"""
+
+    def __init__(self, low, high, bins):
+        self.edges = np.linspace(low, high, bins + 1)
+        # 首尾两个额外分箱记录越界值
+        self.counts = np.zeros(bins + 2, dtype=np.int64)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        if len(values) == 0:
+            return
+        index = np.searchsorted(self.edges, values, side='right')
+        self.counts += np.bincount(index, minlength=len(self.counts))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def quantile(self, q):
+        total = self.counts.sum()
+        if total == 0:
+            return None
+        target = q * total
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, target))
+        if index == 0:
+            return self.min
+        if index == len(self.counts) - 1:
+            return self.max
+        # 分箱内线性插值
+        left, right = self.edges[index - 1], self.edges[index]
+        before = cumulative[index - 1]
+        fraction = (target - before) / self.counts[index]
+        return float(left + (right - left) * fraction)
+
+
+class PortfolioAggregate:
+    """组合级的流式汇总：总量、平均值与节省金额分布"""
+
+    SUM_FIELDS = ('generation', 'consumption', 'self_use_no_batt', 'self_use_with_batt',
+                  'export_no_batt', 'export_with_batt', 'savings_no_batt', 'savings_with_batt')
+    QUANTILES = (0.1, 0.5, 0.9)
+
+    def __init__(self):
+        self.households = 0
+        self.invalid = 0
+        self.totals = dict.fromkeys(self.SUM_FIELDS, 0.0)
+        self.distributions = {
+            'savings_no_batt': StreamingHistogram(-1000, 10000, 1100),
+            'savings_with_batt': StreamingHistogram(-1000, 10000, 1100),
+        }
+
+    def update(self, mask, matrix):
+        self.households += int(mask.sum())
+        self.invalid += int((~mask).sum())
+        for field in self.SUM_FIELDS:
+            self.totals[field] += float(matrix[:, RESULT_FIELDS.index(field)].sum())
+        for field, histogram in self.distributions.items():
+            histogram.add(matrix[:, RESULT_FIELDS.index(field)])
+
+    def as_dict(self):
+        n = max(self.households, 1)
+        return {
+            'households': self.households,
+            'invalid_rows': self.invalid,
+            'totals': self.totals,
+            'means': {field: value / n for field, value in self.totals.items()},
+            'distributions': {
+                field: {
+                    'min': histogram.min if self.households else None,
+                    'max': histogram.max if self.households else None,
+                    **{f'p{int(q * 100)}': histogram.quantile(q) for q in self.QUANTILES},
+                }
+                for field, histogram in self.distributions.items()
+            },
+        }
+
+
+def run_portfolio(chunks, workers=1, aggregate=None, progress=None):
+    """
+    运行组合模拟
+
+    chunks: read_chunks 产生的块
+    workers: 进程数；为1时在当前进程内计算
+    aggregate: PortfolioAggregate 实例，逐块更新
+    progress: 可选回调 progress(已处理行数)
+
+    按输入顺序逐块产生 (有效户号列表, 结果矩阵)。
+    同时在途的块数不超过 2 × workers，因此内存占用与输入规模无关。
+    """
+    processed = 0
+
+    def finish(ids, mask, matrix):
+        nonlocal processed
+        if aggregate is not None:
+            aggregate.update(mask, matrix)
+        processed += len(mask)
+        if progress is not None:
+            progress(processed)
+        return [household for household, ok in zip(ids, mask) if ok], matrix
+
+    for (ids, _), (mask, matrix) in ordered_map(simulate_chunk, chunks, workers,
+                                                 argument=lambda chunk: chunk[1]):
+        yield finish(ids, mask, matrix)
+
+
+def ordered_map(function, items, workers=1, argument=None):
+    """
+    按输入顺序产生 (item, function(argument(item)))
+
+    workers 大于1时在进程池中计算；同时在途的任务不超过 2 × workers，
+    因此 items 可以是按需读取的生成器，内存占用与输入规模无关。
+    """
+    argument = argument or (lambda item: item)
+    if workers <= 1:
+        for item in items:
+            yield item, function(argument(item))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append((item, pool.submit(function, argument(item))))
+            if len(pending) >= 2 * workers:
+                done, future = pending.popleft()
+                yield done, future.result()
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result()
+
+
+def iter_results_csv(results):
+    """将 run_portfolio 的逐块输出转换为单个CSV文本流（只写一次表头）"""
+    header = True
+    for ids, matrix in results:
+        parts = exports.iter_csv(('household_id',) + RESULT_FIELDS, matrix, labels=ids)
+        if not header:
+            next(parts)
+        header = False
+        yield from parts
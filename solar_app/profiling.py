@@ -0,0 +1,315 @@
+"""
+生产环境的按需性能剖析
+对模拟接口按比例抽样，在 cProfile、调用栈采样器或 tracemalloc 下运行；另可对任何接口中超过延迟阈值的
+请求保留调用栈采样（采样器开销很小，请求结束后再决定是否保存）。结果写入磁盘上的有界环形缓冲，
+管理员通过 /profiles/ 下载，无需重新部署即可诊断线上热点。
+默认关闭：未配置抽样比例与延迟阈值时中间件不加载。
+"""
+import cProfile
+import marshal
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+
+
+# 抽样请求的剖析方式：'cprofile'（函数级调用统计）、'sampler'（调用栈采样）或 'tracemalloc'（内存分配增量）
+MODE = getattr(settings, 'SOLAR_PROFILE_MODE', 'cprofile')
+# 抽样比例（0-1）；超过延迟阈值（毫秒）的请求另以调用栈采样保存，None 表示不按阈值保存
+SAMPLE_RATE = getattr(settings, 'SOLAR_PROFILE_SAMPLE_RATE', 0.0)
+SLOW_MS = getattr(settings, 'SOLAR_PROFILE_SLOW_MS', None)
+# 参与按比例抽样的接口（URL 名称）；按延迟阈值的剖析适用于所有接口
+URL_NAMES = getattr(settings, 'SOLAR_PROFILE_URL_NAMES', ('simulate', 'api_simulate'))
+
+PROFILE_DIR = getattr(settings, 'SOLAR_PROFILE_DIR', None) or \
+    os.path.join(tempfile.gettempdir(), 'solar-profiles')
+# 环形缓冲保留的剖析文件数
+KEEP = getattr(settings, 'SOLAR_PROFILE_KEEP', 50)
+
+SAMPLE_INTERVAL = 0.005
+TRACEMALLOC_FRAMES = 10
+TRACEMALLOC_TOP = 40
+
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def _fold(frame):
+    """折叠栈格式的一行：从最外层到最内层，以分号分隔"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """
+    调用栈采样器
+
+    一个后台线程每隔 interval 秒读取已登记线程的当前调用栈并计数；没有登记的线程时退出。
+    结果为折叠栈格式（flamegraph.pl、speedscope 可直接读取）。
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._targets[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='solar-profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        """停止采样并返回 {折叠栈: 样本数}"""
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                for thread_id, counts in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counts[_fold(frame)] += 1
+
+
+_sampler = StackSampler()
+
+
+class SamplerProfile:
+    kind = 'sampler'
+    extension = 'folded'
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        _sampler.start(self._thread_id)
+        return True
+
+    def stop(self):
+        counts = _sampler.stop(self._thread_id)
+        return ''.join(f'{stack} {count}\n' for stack, count in counts.most_common()).encode()
+
+
+class CProfileProfile:
+    """cProfile 剖析；同一时间只剖析一个请求，结果与 pstats.dump_stats 的文件格式相同"""
+
+    kind = 'cprofile'
+    extension = 'prof'
+    _busy = threading.Lock()
+
+    def start(self):
+        if not self._busy.acquire(blocking=False):
+            return False
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return True
+
+    def stop(self):
+        self._profile.disable()
+        self._busy.release()
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
+
+
+class TracemallocProfile:
+    """
+    请求前后的内存分配快照差异（按代码行，从大到小）
+
+    tracemalloc 统计整个进程，同时进行的其他请求的分配也会计入；同一时间只剖析一个请求。
+    """
+
+    kind = 'tracemalloc'
+    extension = 'txt'
+    _busy = threading.Lock()
+
+    def start(self):
+        if not self._busy.acquire(blocking=False):
+            return False
+        self._was_tracing = tracemalloc.is_tracing()
+        if not self._was_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._before = tracemalloc.take_snapshot()
+        return True
+
+    def stop(self):
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if not self._was_tracing:
+            tracemalloc.stop()
+        self._busy.release()
+
+        stats = after.compare_to(self._before, 'lineno')
+        lines = [
+            f'# total size diff: {sum(stat.size_diff for stat in stats) / 1024:.1f} KiB, '
+            f'count diff: {sum(stat.count_diff for stat in stats)}, '
+            f'peak traced: {peak / 1024:.1f} KiB',
+        ]
+        lines.extend(str(stat) for stat in stats[:TRACEMALLOC_TOP])
+        return ('\n'.join(lines) + '\n').encode()
+
+
+PROFILERS = {cls.kind: cls for cls in (CProfileProfile, SamplerProfile, TracemallocProfile)}
+_EXTENSIONS = {cls.extension for cls in PROFILERS.values()}
+
+
+class ProfileStore:
+    """
+    磁盘上的有界环形缓冲
+
+    每次剖析一个文件，文件名为 {时间戳}-{进程号}-{接口}-{耗时}ms-{方式}.{扩展名}；
+    写入后删除超出 keep 个的最旧文件，同一目录可由多个工作进程共享。
+    """
+
+    NAME = re.compile(r'^(?P<stamp>\d+)-(?P<pid>\d+)-(?P<view>\w+)-(?P<ms>\d+)ms-'
+                      r'(?P<kind>[a-z]+)\.(?P<extension>[a-z]+)$')
+
+    def __init__(self, directory=PROFILE_DIR, keep=KEEP):
+        self.directory = Path(directory)
+        self.keep = keep
+
+    def write(self, view, milliseconds, profiler, data):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = (f'{time.time_ns()}-{os.getpid()}-{view}-{int(milliseconds)}ms-'
+                f'{profiler.kind}.{profiler.extension}')
+        temporary = self.directory / f'.{name}.tmp'
+        temporary.write_bytes(data)
+        os.replace(temporary, self.directory / name)
+        self._prune()
+        return name
+
+    def _names(self):
+        if not self.directory.is_dir():
+            return []
+        return sorted(name for name in os.listdir(self.directory) if self.NAME.match(name))
+
+    def _prune(self):
+        names = self._names()
+        for name in names[:max(len(names) - self.keep, 0)]:
+            try:
+                os.unlink(self.directory / name)
+            except FileNotFoundError:  # 其他进程已删除
+                pass
+
+    def entries(self):
+        """全部剖析文件的信息，最新的在前"""
+        entries = []
+        for name in reversed(self._names()):
+            match = self.NAME.match(name)
+            entries.append({
+                'name': name,
+                'time': int(match['stamp']) / 1e9,
+                'pid': int(match['pid']),
+                'view': match['view'],
+                'duration_ms': int(match['ms']),
+                'kind': match['kind'],
+            })
+        return entries
+
+    def path(self, name):
+        """剖析文件的路径；名称不合法或文件不存在时返回 None"""
+        match = self.NAME.match(name)
+        if match is None or match['extension'] not in _EXTENSIONS:
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+
+store = ProfileStore()
+
+
+class _ProfiledStream:
+    """流式响应体的包装：迭代结束或响应关闭（客户端断开）时停止剖析，只停止一次"""
+
+    def __init__(self, content, finish):
+        self._content = iter(content)
+        self._finish = finish
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._content)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        finish, self._finish = self._finish, None
+        if finish is not None:
+            finish()
+
+
+class ProfilingMiddleware:
+    """
+    按比例抽样剖析 URL_NAMES 中的接口，按延迟阈值剖析所有接口
+
+    剖析在 process_view 中包住视图函数本身，应放在 MIDDLEWARE 的最后。
+    抽样请求按 MODE 剖析并总是保存；其余请求在设置了 SLOW_MS 时以调用栈采样运行，
+    只保存超过阈值的请求。cProfile 与 tracemalloc 同一时间只剖析一个请求，忙时退回调用栈采样。
+    流式响应（导出、组合模式、蒙特卡洛）的主要耗时在生成响应体时，剖析持续到响应体输出完毕。
+    """
+
+    def __init__(self, get_response):
+        if MODE not in PROFILERS:
+            raise ImproperlyConfigured(f'SOLAR_PROFILE_MODE 必须是 {", ".join(PROFILERS)} 之一')
+        if not SAMPLE_RATE and SLOW_MS is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = request.resolver_match.url_name if request.resolver_match else None
+
+        profiler, threshold = None, SLOW_MS
+        if name in URL_NAMES and random.random() < SAMPLE_RATE:
+            profiler, threshold = PROFILERS[MODE](), None
+            if not profiler.start():
+                profiler, threshold = None, SLOW_MS
+        if profiler is None:
+            if SLOW_MS is None:
+                return None
+            profiler = SamplerProfile()
+            profiler.start()
+
+        started = time.perf_counter()
+
+        def finish():
+            data = profiler.stop()
+            milliseconds = (time.perf_counter() - started) * 1000
+            # 短于采样间隔的请求没有调用栈样本，不保存空文件
+            if data and (threshold is None or milliseconds >= threshold):
+                store.write(name or view_func.__name__, milliseconds, profiler, data)
+
+        try:
+            response = view_func(request, *view_args, **view_kwargs)
+        except BaseException:
+            finish()
+            raise
+        if getattr(response, 'streaming', False):
+            response.streaming_content = _ProfiledStream(response.streaming_content, finish)
+        else:
+            finish()
+        return response
@@ -0,0 +1,118 @@
+"""
+紧凑的模拟结果表示
+单个方案的月度能量流与年度经济指标保存在一块连续的 float64 数组中，字段名为固定的 ASCII 名称。
+模板、JSON 与 DataFrame 所需的形式由适配方法按需生成；本地化标签属于展示层（见 labels.py）。
+"""
+from collections import namedtuple
+
+import numpy as np
+
+
+MONTHS = 12
+
+# 月度能量流字段 (kWh)
+FLOW_FIELDS = (
+    'generation', 'consumption',
+    'self_use_no_batt', 'export_no_batt', 'grid_no_batt',
+    'self_use_with_batt', 'export_with_batt', 'grid_with_batt',
+)
+
+# 年度经济指标字段 (€)
+COST_FIELDS = (
+    'baseline_cost', 'cost_no_batt', 'cost_with_batt',
+    'savings_no_batt', 'savings_with_batt',
+)
+
+# 数据块布局：前 len(FLOW_FIELDS) × 12 个数为行优先的月度能量流，其后为经济指标
+_FLOW_SIZE = len(FLOW_FIELDS) * MONTHS
+_FLOW_INDEX = {field: index for index, field in enumerate(FLOW_FIELDS)}
+BLOCK_SIZE = _FLOW_SIZE + len(COST_FIELDS)
+
+# 模板中逐月展示的一行：label 为月份标签，其余为各能量流字段
+MonthRow = namedtuple('MonthRow', ('label',) + FLOW_FIELDS)
+
+
+def _restore(data, tariff, battery_dispatch, sensitivities):
+    return SimulationResult(np.frombuffer(data, dtype='<f8'), tariff, battery_dispatch,
+                            sensitivities)
+
+
+class SimulationResult:
+    """单个方案的模拟结果"""
+
+    __slots__ = ('values', 'tariff', 'battery_dispatch', 'sensitivities')
+
+    def __init__(self, values, tariff, battery_dispatch, sensitivities=None):
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        if values.shape != (BLOCK_SIZE,):
+            raise ValueError(f'结果数据块需要 {BLOCK_SIZE} 个数值，实际为 {values.size}')
+        values.flags.writeable = False
+        self.values = values
+        self.tariff = tariff
+        self.battery_dispatch = battery_dispatch
+        self.sensitivities = sensitivities
+
+    @classmethod
+    def from_arrays(cls, flows, costs, index=0, **kwargs):
+        """从计算引擎的批量数组（形状 (n, 12) 与 (n,)）中取出第 index 个方案"""
+        values = np.empty(BLOCK_SIZE)
+        monthly = values[:_FLOW_SIZE].reshape(len(FLOW_FIELDS), MONTHS)
+        for row, field in enumerate(FLOW_FIELDS):
+            monthly[row] = flows[field][index]
+        for offset, field in enumerate(COST_FIELDS):
+            values[_FLOW_SIZE + offset] = costs[field][index]
+        return cls(values, **kwargs)
+
+    @property
+    def monthly(self):
+        """月度能量流，形状 (len(FLOW_FIELDS), 12) 的只读视图"""
+        return self.values[:_FLOW_SIZE].reshape(len(FLOW_FIELDS), MONTHS)
+
+    def flow(self, field):
+        """某个能量流字段的 12 个月数值（只读视图）"""
+        return self.monthly[_FLOW_INDEX[field]]
+
+    def rows(self, labels=None):
+        """逐月的 MonthRow 列表，供模板表格使用；labels 为月份标签，默认 1-12"""
+        labels = labels or range(1, MONTHS + 1)
+        return [MonthRow(label, *values) for label, values in zip(labels, self.monthly.T.tolist())]
+
+    def as_json(self):
+        """可直接 JSON 序列化的字典：月度能量流按字段给出 12 个月的列表"""
+        data = {'monthly': dict(zip(FLOW_FIELDS, self.monthly.tolist()))}
+        data.update(zip(COST_FIELDS, self.values[_FLOW_SIZE:].tolist()))
+        data['tariff'] = self.tariff
+        data['battery_dispatch'] = self.battery_dispatch
+        if self.sensitivities is not None:
+            data['sensitivities'] = self.sensitivities
+        return data
+
+    def to_dataframe(self, labels=None, columns=None, label_column='month'):
+        """
+        月度能量流 DataFrame（按需导入 pandas）
+
+        labels: 月份标签；columns: 可选的 {字段: 显示名称}，用于展示层的本地化列名
+        """
+        import pandas as pd
+
+        df = pd.DataFrame(self.monthly.T, columns=list(FLOW_FIELDS))
+        df.insert(0, label_column, list(labels or range(1, MONTHS + 1)))
+        return df.rename(columns=columns) if columns else df
+
+    def __reduce__(self):
+        # 数据块序列化为原始字节：pickle 后约 0.9 KB；带敏感度（pipeline.calculate 的结果，
+        # 即结果缓存与 st.cache_data 中保存的对象）约 1.4 KB
+        return _restore, (self.values.tobytes(), self.tariff, self.battery_dispatch,
+                          self.sensitivities)
+
+    def __repr__(self):
+        return (f'<SimulationResult savings_no_batt={self.savings_no_batt:.2f} '
+                f'savings_with_batt={self.savings_with_batt:.2f} tariff={self.tariff}>')
+
+
+def _cost_property(offset):
+    return property(lambda self: float(self.values[_FLOW_SIZE + offset]))
+
+
+for _offset, _field in enumerate(COST_FIELDS):
+    setattr(SimulationResult, _field, _cost_property(_offset))
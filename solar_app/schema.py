@@ -0,0 +1,251 @@
+"""
+面向 API 与批量输入的轻量级参数校验
+字段类型、取值范围与选项全部取自 SolarSimulationForm 的字段定义，规则（含百分比总和为100%）
+与表单完全一致；但不构造表单实例、控件与翻译字符串，只在出错时才生成与 form.errors 相同的错误。
+单个参数字典逐字段快速转换，列式批量数据用 NumPy 一次完成整列的范围检查。
+"""
+import math
+import re
+from collections import namedtuple
+
+import numpy as np
+from django import forms
+from django.core.validators import EMPTY_VALUES
+from django.forms.forms import NON_FIELD_ERRORS
+from django.forms.utils import ErrorDict, ErrorList
+
+from . import load_profiles, tariffs
+from .forms import (
+    PCT_FIELDS, PCT_TOTAL_CODE, SolarSimulationForm, calculation_params, pct_total_error,
+)
+
+
+# 单个字段的校验规则；kind 为 'float'、'int' 或 'choice'
+FieldSpec = namedtuple('FieldSpec', 'name kind required min_value max_value choices')
+
+# 列式校验结果：cleaned 为 {字段: 形状 (n,) 的数组}（无效行的取值无意义），
+# valid 为有效行掩码，errors 为 {字段: {错误代码: 出错的行号数组}}
+BatchValidation = namedtuple('BatchValidation', 'cleaned valid errors')
+
+# 与 forms.IntegerField.re_decimal 相同：允许 "5.0" 形式的整数
+_DECIMAL = re.compile(r'\.0*\s*$')
+
+
+class _Invalid(Exception):
+    """快速路径校验失败（具体错误在出错时再由表单字段生成）"""
+
+
+def _spec(name, field):
+    if isinstance(field, forms.ChoiceField):
+        return FieldSpec(name, 'choice', field.required, None, None,
+                         frozenset(str(value) for value, _ in field.choices))
+    kind = 'int' if isinstance(field, forms.IntegerField) and \
+        not isinstance(field, forms.FloatField) else 'float'
+    return FieldSpec(name, kind, field.required, field.min_value, field.max_value, None)
+
+
+SPECS = tuple(_spec(name, field) for name, field in SolarSimulationForm.base_fields.items())
+_SPEC_BY_NAME = {spec.name: spec for spec in SPECS}
+
+
+def _is_empty(value):
+    try:
+        return value in EMPTY_VALUES
+    except TypeError:
+        return False
+
+
+def _allowed_choices(spec):
+    # 动态电价只在配置了逐时价格文件时可选（与表单 __init__ 中的过滤一致）
+    if spec.name == 'tariff':
+        return spec.choices.intersection(tariffs.available_tariffs())
+    return spec.choices
+
+
+def _clean_value(spec, value):
+    """转换并检查单个值，规则与对应表单字段的 clean() 相同；失败时抛出 _Invalid"""
+    if _is_empty(value):
+        if spec.required:
+            raise _Invalid
+        return '' if spec.kind == 'choice' else None
+
+    if spec.kind == 'choice':
+        value = str(value)
+        if value not in _allowed_choices(spec):
+            raise _Invalid
+        return value
+
+    try:
+        if spec.kind == 'int':
+            value = value if type(value) is int else int(_DECIMAL.sub('', str(value)))
+        else:
+            value = float(value)
+            if not math.isfinite(value):
+                raise _Invalid
+    except (TypeError, ValueError):
+        raise _Invalid
+    if spec.min_value is not None and value < spec.min_value:
+        raise _Invalid
+    if spec.max_value is not None and value > spec.max_value:
+        raise _Invalid
+    return value
+
+
+def _field_error(spec, value):
+    """由表单字段生成与 form.errors 相同的错误（只在出错时调用）"""
+    field = SolarSimulationForm.base_fields[spec.name]
+    if spec.kind == 'choice' and not _is_empty(value):
+        return forms.ValidationError(field.error_messages['invalid_choice'],
+                                     code='invalid_choice', params={'value': value})
+    try:
+        field.clean(value)
+    except forms.ValidationError as error:
+        return error
+    return None
+
+
+def _error_dict(data, failed, total_pct):
+    errors = ErrorDict()
+    for spec in failed:
+        error = _field_error(spec, data.get(spec.name))
+        errors[spec.name] = ErrorList(error.error_list)
+    if total_pct != 100:
+        errors[NON_FIELD_ERRORS] = ErrorList(pct_total_error(total_pct).error_list)
+    return errors
+
+
+def validate(data):
+    """
+    校验单个参数字典（解析后的 JSON 对象或 QueryDict）
+
+    返回 (params, errors)：通过时 params 与 form.get_calculation_params() 相同、errors 为 None；
+    否则 params 为 None，errors 的内容与错误代码与 form.errors 相同。
+    """
+    cleaned = {}
+    failed = []
+    for spec in SPECS:
+        value = data.get(spec.name)
+        try:
+            cleaned[spec.name] = _clean_value(spec, value)
+        except _Invalid:
+            failed.append(spec)
+
+    total_pct = sum(cleaned.get(name, 0) for name in PCT_FIELDS)
+    if failed or total_pct != 100:
+        return None, _error_dict(data, failed, total_pct)
+    return calculation_params(cleaned), None
+
+
+def _as_column(raw, n):
+    """数组原样使用；列表中全部为数字时转为浮点数组，否则保留为 object 数组逐个转换"""
+    if isinstance(raw, np.ndarray):
+        return np.broadcast_to(raw, (n,)) if raw.ndim == 0 else raw
+    if not isinstance(raw, (list, tuple)):
+        return np.full(n, raw, dtype=object)
+    if all(type(value) in (int, float) for value in raw):
+        return np.array(raw, dtype=float)
+    return np.fromiter(raw, dtype=object, count=len(raw))
+
+
+def _numeric_column(spec, raw, n):
+    """将一列原始值转换为浮点数组，返回 (数值, 缺失掩码, 无法解析掩码)"""
+    column = _as_column(raw, n)
+    if column.dtype.kind == 'b' and spec.kind == 'int':
+        # 与 IntegerField 一致：布尔值不是整数
+        return np.zeros(n), np.zeros(n, dtype=bool), np.ones(n, dtype=bool)
+    if column.dtype.kind in 'iub':
+        values = column.astype(float)
+        return values, np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+    if column.dtype.kind == 'f':
+        # 列式数据中 NaN 表示缺失值
+        values = column.astype(float)
+        return values, np.isnan(values), np.isinf(values)
+
+    values = np.full(n, np.nan)
+    missing = np.zeros(n, dtype=bool)
+    invalid = np.zeros(n, dtype=bool)
+    relaxed = spec._replace(required=True, min_value=None, max_value=None)
+    for row, value in enumerate(column.tolist()):
+        if _is_empty(value):
+            missing[row] = True
+            continue
+        try:
+            values[row] = _clean_value(relaxed, value)
+        except _Invalid:
+            invalid[row] = True
+    return values, missing, invalid
+
+
+def validate_columns(columns, fields=None):
+    """
+    批量校验列式数据
+
+    columns: {表单字段名: 形状 (n,) 的数组或列表}
+    fields: 需要校验的字段名，默认为表单的全部字段；缺少的必填列视为整列缺失
+    每行的判定与表单相同：必填、数值可解析、整数字段为整数、范围，以及百分比总和为100。
+    """
+    specs = [_SPEC_BY_NAME[name] for name in (fields or _SPEC_BY_NAME)]
+    n = max((len(values) for values in columns.values()
+             if isinstance(values, (list, tuple)) or np.ndim(values)), default=0)
+    cleaned = {}
+    valid = np.ones(n, dtype=bool)
+    errors = {}
+
+    def fail(name, code, mask):
+        nonlocal valid
+        if mask.any():
+            errors.setdefault(name, {})[code] = np.flatnonzero(mask)
+            valid &= ~mask
+
+    for spec in specs:
+        raw = columns.get(spec.name)
+        if spec.kind == 'choice':
+            values = np.fromiter(raw, dtype=object, count=n) if isinstance(raw, (list, tuple)) \
+                else np.broadcast_to(np.asarray('' if raw is None else raw, dtype=object), (n,))
+            empty = np.array([_is_empty(value) for value in values.tolist()], dtype=bool)
+            strings = np.array([str(value) for value in values.tolist()], dtype=object)
+            allowed = np.isin(strings, list(_allowed_choices(spec)))
+            fail(spec.name, 'required', empty & spec.required)
+            fail(spec.name, 'invalid_choice', ~empty & ~allowed)
+            cleaned[spec.name] = np.where(empty, '', strings)
+            continue
+
+        values, missing, invalid = _numeric_column(spec, np.nan if raw is None else raw, n)
+        if spec.kind == 'int':
+            invalid |= ~missing & ~invalid & (values != np.floor(values))
+        checked = ~missing & ~invalid
+        fail(spec.name, 'required', missing & spec.required)
+        fail(spec.name, 'invalid', invalid)
+        below = checked & (values < spec.min_value) if spec.min_value is not None else \
+            np.zeros(n, dtype=bool)
+        above = checked & ~below & (values > spec.max_value) if spec.max_value is not None else \
+            np.zeros(n, dtype=bool)
+        fail(spec.name, 'min_value', below)
+        fail(spec.name, 'max_value', above)
+        # 与表单的 clean() 一致：出错的百分比字段按 0 计入总和
+        cleaned[spec.name] = np.where(checked & ~below & ~above, values, 0.0)
+
+    if all(name in cleaned for name in PCT_FIELDS):
+        total = sum(cleaned[name] for name in PCT_FIELDS)
+        fail(NON_FIELD_ERRORS, PCT_TOTAL_CODE, total != 100)
+    return BatchValidation(cleaned, valid, errors)
+
+
+def calculation_columns(cleaned):
+    """将 validate_columns 的结果转换为计算模块的列式参数（SolarCalculator.PARAM_KEYS 与 LOAD_KEYS）"""
+    return {
+        'pv_capacity_kwp': cleaned['pv_capacity_kwp'],
+        'battery_capacity_kwh': cleaned['battery_capacity_kwh'],
+        'annual_consumption_kwh': cleaned['annual_consumption_kwh'],
+        'cons_fraction_night': cleaned['pct_night'] / 100.0,
+        'cons_fraction_morn_even': cleaned['pct_morning_evening'] / 100.0,
+        'cons_fraction_midday': cleaned['pct_midday'] / 100.0,
+        'grid_price': cleaned['grid_price'],
+        'feed_in_price': cleaned['feed_in_price'],
+        'heat_pump_kwh': cleaned['heat_pump_kwh'],
+        'ev_annual_km': cleaned['ev_annual_km'],
+        'ev_charging_window': np.where(cleaned['ev_charging_window'] == '',
+                                       load_profiles.PARAM_DEFAULTS['ev_charging_window'],
+                                       cleaned['ev_charging_window']),
+        'home_office_days': cleaned['home_office_days'],
+    }
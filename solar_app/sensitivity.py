@@ -0,0 +1,244 @@
+"""
+节省金额对输入参数的敏感性
+月度模型对各输入是分段线性的，因此可以沿模拟过程前向传播导数，得到精确的梯度，
+无需对每个参数做两次有限差分。龙卷风图所需的 ±范围结果放在一次批量计算中完成。
+"""
+import numpy as np
+
+from . import tariffs
+from .solar_calculator import SolarCalculator
+
+
+PARAM_KEYS = SolarCalculator.PARAM_KEYS
+FRACTION_KEYS = ('cons_fraction_night', 'cons_fraction_morn_even', 'cons_fraction_midday')
+
+# 龙卷风图默认的相对变化范围 (±20%)
+DEFAULT_RELATIVE_RANGE = 0.2
+
+_INDEX = {key: index for index, key in enumerate(PARAM_KEYS)}
+
+
+def _column(params, key, n):
+    return np.broadcast_to(np.asarray(params[key], dtype=float), (n,))
+
+
+def _pick(mask, when_true, when_false):
+    """按掩码 (n, 12) 在两个导数数组 (n, 12, P) 之间逐元素选择"""
+    return np.where(mask[..., np.newaxis], when_true, when_false)
+
+
+def flow_gradients(calculator, params, flows):
+    """
+    月度能量流对 PARAM_KEYS 的导数
+
+    params: 计算所用的参数；flows: 同一组参数下 energy_flows 的结果（只用于确定各分段的分支）
+    返回 {字段: 形状 (n, 12, P) 的导数}，P = len(PARAM_KEYS)；
+    恰好处于分段点上时取其中一侧的导数。
+    """
+    n = len(flows['generation'])
+    size = (n, 12, len(PARAM_KEYS))
+    batt = _column(params, 'battery_capacity_kwh', n)[:, np.newaxis]
+
+    # 用电比例只作用于家庭基础负荷；附加负荷（见 load_profiles）与比例无关
+    consumption = _column(params, 'annual_consumption_kwh', n)[:, np.newaxis] * \
+        calculator.seasonal_factors
+    c_night, c_me, c_mid = np.moveaxis(flows['consumption_by_window'], -1, 0)
+    generation = flows['generation']
+
+    d_generation = np.zeros(size)
+    d_generation[..., _INDEX['pv_capacity_kwp']] = calculator.monthly_kwh_per_kwp
+    d_windows = []
+    for key, window in zip(FRACTION_KEYS, (c_night, c_me, c_mid)):
+        d_window = np.zeros(size)
+        fraction = _column(params, key, n)[:, np.newaxis]
+        d_window[..., _INDEX['annual_consumption_kwh']] = calculator.seasonal_factors * fraction
+        d_window[..., _INDEX[key]] = consumption
+        d_windows.append(d_window)
+    d_night, d_me, d_mid = d_windows
+
+    # 方案1 - 无储能
+    d_self_no_batt = _pick(generation < c_mid, d_generation, d_mid)
+    d_export_no_batt = _pick(generation > c_mid, d_generation - d_mid, 0.0)
+    d_grid_no_batt = d_mid + d_me + d_night - d_self_no_batt
+
+    # 方案2 - 有储能：充电量取 (剩余光伏, 容量 × 天数, 早晚+夜间需求) 中的最小者
+    export_no_batt = flows['export_no_batt']
+    need = c_me + c_night
+    limit = batt * calculator.DAYS_IN_MONTH
+    branch = np.argmin(np.stack([export_no_batt, limit, need]), axis=0)
+    d_limit = np.zeros(size)
+    d_limit[..., _INDEX['battery_capacity_kwh']] = calculator.DAYS_IN_MONTH
+    d_charge = np.choose(branch[..., np.newaxis], [d_export_no_batt, d_limit, d_me + d_night])
+    charge = np.minimum(np.minimum(export_no_batt, limit), need)
+
+    has_batt = np.broadcast_to(batt > 0, generation.shape)
+    d_grid_with_batt = _pick(has_batt, _pick(need - charge > 0, d_me + d_night - d_charge, 0.0),
+                             d_grid_no_batt)
+
+    # 分时段购电量（与 simulate_batch 一致：电池先覆盖早晚，再覆盖夜间）
+    from_batt_me = np.minimum(charge, c_me)
+    d_from_me = _pick(charge < c_me, d_charge, d_me)
+    d_from_night = d_charge - d_from_me
+    d_night_with_batt = _pick(c_night - (charge - from_batt_me) > 0, d_night - d_from_night, 0.0)
+    d_grid_no_batt_by_window = np.stack([d_night, d_me, d_mid - d_self_no_batt], axis=2)
+    d_grid_with_batt_by_window = np.where(
+        has_batt[..., np.newaxis, np.newaxis],
+        np.stack([d_night_with_batt, d_me - d_from_me, np.zeros(size)], axis=2),
+        d_grid_no_batt_by_window)
+
+    return {
+        'generation': d_generation,
+        'self_use_no_batt': d_self_no_batt,
+        'export_no_batt': d_export_no_batt,
+        'grid_no_batt': d_grid_no_batt,
+        'self_use_with_batt': _pick(has_batt, d_self_no_batt + d_charge, d_self_no_batt),
+        'export_with_batt': _pick(has_batt, d_export_no_batt - d_charge, d_export_no_batt),
+        'grid_with_batt': d_grid_with_batt,
+        'consumption_by_window': np.stack([d_night, d_me, d_mid], axis=2),
+        'grid_no_batt_by_window': d_grid_no_batt_by_window,
+        'grid_with_batt_by_window': d_grid_with_batt_by_window,
+    }
+
+
+def _fraction_directions(params, gradient):
+    """
+    将用电比例的偏导数换算为"保持年用电量不变"的方向导数
+
+    某时段比例增加 1 时，其余两个时段按现有比例同步减少；
+    该时段比例已为 1 时保留偏导数。
+    """
+    gradient = gradient.copy()
+    fractions = np.stack([np.broadcast_to(np.asarray(params[key], dtype=float), gradient.shape[:1])
+                          for key in FRACTION_KEYS], axis=-1)
+    partial = gradient[..., [_INDEX[key] for key in FRACTION_KEYS]]
+    for i, key in enumerate(FRACTION_KEYS):
+        rest = 1.0 - fractions[..., i]
+        others = [j for j in range(len(FRACTION_KEYS)) if j != i]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shift = sum(fractions[..., j] * partial[..., j] for j in others) / rest
+        gradient[..., _INDEX[key]] = np.where(rest > 0, partial[..., i] - shift, partial[..., i])
+    return gradient
+
+
+def savings_gradients(calculator, params, flows, tariff=None, with_battery=True):
+    """
+    年度节省金额与储能回收期对 PARAM_KEYS 的精确梯度
+
+    tariff: 计价所用的 tariffs.Tariff；省略时为 grid_price / feed_in_price 固定电价
+    with_battery: 有储能方案的能量流是否来自 simulate_batch（最优调度时为 False，不计算其梯度）
+    返回字典：
+        - savings_no_batt / savings_with_batt: {参数: 导数}
+        - payback_years: {参数: 导数}，另含 battery_cost；无法回收时为 None
+    用电比例给出的是保持年用电量不变的方向导数（见 _fraction_directions）。
+    """
+    n = len(flows['generation'])
+    if tariff is None:
+        tariff = tariffs.FlatTariff(params['grid_price'], params['feed_in_price'])
+    d_flows = flow_gradients(calculator, params, flows)
+    prices = tariff.window_prices
+    weights = tariff.grid_price_weights
+
+    def import_cost(key):
+        gradient = np.einsum('nmwp,mw->np', d_flows[key], prices)
+        gradient[:, _INDEX['grid_price']] += np.einsum('nmw,mw->n', flows[key], weights)
+        return gradient
+
+    def cost(scenario):
+        gradient = import_cost(f'grid_{scenario}_by_window') - \
+            d_flows[f'export_{scenario}'].sum(axis=1) * tariff.feed_in_price
+        gradient[:, _INDEX['feed_in_price']] -= flows[f'export_{scenario}'].sum(axis=-1)
+        return gradient
+
+    baseline = import_cost('consumption_by_window')
+    gradients = {'savings_no_batt': _fraction_directions(params, baseline - cost('no_batt'))}
+    if with_battery:
+        gradients['savings_with_batt'] = _fraction_directions(params, baseline - cost('with_batt'))
+
+    def as_dict(gradient):
+        return {key: float(gradient[0, index]) for key, index in _INDEX.items()}
+
+    result = {name: as_dict(gradient) for name, gradient in gradients.items()}
+    result.setdefault('savings_with_batt', None)
+    result['payback_years'] = None
+
+    battery_cost = params.get('battery_cost')
+    if with_battery and battery_cost is not None and n == 1:
+        costs = tariff.evaluate(flows)
+        extra = float(costs['savings_with_batt'][0] - costs['savings_no_batt'][0])
+        if extra > 0:
+            d_extra = gradients['savings_with_batt'] - gradients['savings_no_batt']
+            payback = as_dict(-battery_cost / extra ** 2 * d_extra)
+            payback['battery_cost'] = 1.0 / extra
+            result['payback_years'] = payback
+    return result
+
+
+def _payback(battery_cost, savings_no_batt, savings_with_batt):
+    extra = savings_with_batt - savings_no_batt
+    return [battery_cost / value if value > 0 else None for value in extra.tolist()]
+
+
+def tornado(calculator, params, ranges=None, relative=DEFAULT_RELATIVE_RANGE, tariff=None):
+    """
+    龙卷风图：每个参数分别取低值与高值，其余参数不变，一次批量计算全部 1 + 2P 个方案
+
+    ranges: 可选的 {参数: (低值, 高值)}；未给出的参数取当前值的 ±relative
+    用电比例变化时其余两个时段按现有比例调整，保持比例之和为 1。
+    使用按月贪心的电池策略；返回按有储能节省金额波动幅度从大到小排序的列表。
+    """
+    ranges = ranges or {}
+    if tariff is None:
+        tariff = tariffs.FlatTariff(params['grid_price'], params['feed_in_price'])
+
+    base = {key: float(params[key]) for key in PARAM_KEYS}
+    scenarios = [base]
+    bounds = []
+    for key in PARAM_KEYS:
+        low, high = ranges.get(key, (base[key] * (1 - relative), base[key] * (1 + relative)))
+        low, high = max(float(low), 0.0), max(float(high), 0.0)
+        if key in FRACTION_KEYS:
+            low, high = min(low, 1.0), min(high, 1.0)
+        bounds.append((key, low, high))
+        for value in (low, high):
+            scenario = dict(base, **{key: value})
+            if key in FRACTION_KEYS:
+                rest = 1.0 - base[key]
+                for other in FRACTION_KEYS:
+                    if other != key:
+                        scenario[other] = base[other] * (1.0 - value) / rest if rest > 0 else \
+                            (1.0 - value) / (len(FRACTION_KEYS) - 1)
+            scenarios.append(scenario)
+
+    columns = {key: np.array([scenario[key] for scenario in scenarios]) for key in PARAM_KEYS}
+    # 附加负荷在所有方案中保持不变
+    columns.update({key: params.get(key) for key in SolarCalculator.LOAD_KEYS})
+    flows = calculator.energy_flows(columns)
+    costs = tariff.evaluate(flows, grid_price_shift=columns['grid_price'] - base['grid_price'],
+                            feed_in_price=columns['feed_in_price'])
+    savings_no_batt = costs['savings_no_batt']
+    savings_with_batt = costs['savings_with_batt']
+    battery_cost = params.get('battery_cost')
+    paybacks = _payback(battery_cost, savings_no_batt, savings_with_batt) \
+        if battery_cost is not None else [None] * len(scenarios)
+
+    rows = []
+    for index, (key, low, high) in enumerate(bounds):
+        lo, hi = 1 + 2 * index, 2 + 2 * index
+        rows.append({
+            'param': key,
+            'low': low,
+            'high': high,
+            'savings_no_batt': [float(savings_no_batt[lo]), float(savings_no_batt[hi])],
+            'savings_with_batt': [float(savings_with_batt[lo]), float(savings_with_batt[hi])],
+            'payback_years': [paybacks[lo], paybacks[hi]],
+        })
+    rows.sort(key=lambda row: abs(row['savings_with_batt'][1] - row['savings_with_batt'][0]),
+              reverse=True)
+    return {
+        'base': {
+            'savings_no_batt': float(savings_no_batt[0]),
+            'savings_with_batt': float(savings_with_batt[0]),
+            'payback_years': paybacks[0],
+        },
+        'rows': rows,
+    }
@@ -0,0 +1,58 @@
+"""
+紧凑的模拟状态会话载荷
+session 中只保存表单输入（按字段顺序的数值列表）和结果缓存键，
+经版本标记、zlib 压缩和 base64 编码后写入签名 Cookie 或缓存后端，
+不再把完整的月度结果写入数据库 session。
+"""
+import base64
+import json
+import zlib
+
+from .forms import SolarSimulationForm
+
+
+SESSION_KEY = 'sim'
+STATE_VERSION = 4
+
+# 载荷中数值的顺序；新增/调整表单字段时需提升 STATE_VERSION
+STATE_FIELDS = tuple(SolarSimulationForm.base_fields)
+
+
+def dump_state(form_data, result_key):
+    """将表单数据与结果缓存键编码为紧凑字符串"""
+    payload = [[form_data.get(name) for name in STATE_FIELDS], result_key]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    packed = base64.urlsafe_b64encode(zlib.compress(raw, 9)).decode().rstrip('=')
+    return f'v{STATE_VERSION}.{packed}'
+
+
+def load_state(token):
+    """
+    解码 dump_state 生成的字符串
+
+    返回 (表单数据字典, 结果缓存键)；版本不符或内容损坏时返回 None，
+    调用方按"没有上一次模拟"处理即可。
+    """
+    if not isinstance(token, str):
+        return None
+    version, _, packed = token.partition('.')
+    if version != f'v{STATE_VERSION}':
+        return None
+    try:
+        raw = zlib.decompress(base64.urlsafe_b64decode(packed + '=' * (-len(packed) % 4)))
+        values, result_key = json.loads(raw)
+    except (ValueError, zlib.error):
+        return None
+    if len(values) != len(STATE_FIELDS):
+        return None
+    return dict(zip(STATE_FIELDS, values)), result_key
+
+
+def save_simulation(request, form, result_key):
+    """保存最近一次有效模拟的输入，便于语言切换后恢复结果页"""
+    request.session[SESSION_KEY] = dump_state(form.cleaned_data, result_key)
+
+
+def load_simulation(request):
+    """读取最近一次模拟；没有或无法解析时返回 None"""
+    return load_state(request.session.get(SESSION_KEY))
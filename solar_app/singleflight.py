@@ -0,0 +1,180 @@
+"""
+相同计算的合并执行（single-flight）
+同一参数哈希的并发请求只计算一次：进程内的后到请求等待先到请求（leader）的结果；
+跨进程时以每个键一个 fcntl 锁文件选出 leader，leader 将结果写入锁文件旁的结果文件，
+其他进程拿到锁后直接读取。所有等待都有超时，卡住的 leader 不会阻塞其他请求，
+超时后各请求自行计算。
+结果文件会被反序列化，目录必须归当前用户所有且权限为 0700，否则只在进程内合并。
+"""
+import hashlib
+import logging
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from .solar_calculator import ENGINE_VERSION
+
+try:
+    import fcntl
+except ImportError:  # Windows：只在进程内合并
+    fcntl = None
+
+
+# 等待 leader 的最长秒数；超时后自行计算
+TIMEOUT = getattr(settings, 'SOLAR_SINGLEFLIGHT_TIMEOUT', 10.0)
+DIRECTORY = getattr(settings, 'SOLAR_SINGLEFLIGHT_DIR', None) or \
+    os.path.join(tempfile.gettempdir(), 'solar-singleflight')
+# leader 写出的结果文件供其他进程读取的秒数；过期的结果与锁文件在写入时清理
+RESULT_TTL = 30.0
+# 跨进程等待锁时的轮询间隔（flock 本身不支持超时）
+POLL_INTERVAL = 0.005
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """进程内一次进行中的计算"""
+
+    def __init__(self, timeout):
+        self.done = threading.Event()
+        self.deadline = time.monotonic() + timeout
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    按键合并并发计算
+
+    do(key, compute) 返回 compute() 的结果；同一键同时只有一个调用方真正执行 compute，
+    其余调用方共享其结果（进程内直接共享对象，跨进程经结果文件）。
+    leader 出错时，进程内等待的调用方各自重试；超过 timeout 的调用不再被加入。
+    """
+
+    def __init__(self, directory=DIRECTORY, timeout=TIMEOUT, result_ttl=RESULT_TTL):
+        self.directory = directory
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._directory_ok = None
+
+    def do(self, key, compute):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None or call.deadline < time.monotonic()
+            if leader:
+                call = self._calls[key] = _Call(self.timeout)
+
+        if not leader:
+            if call.done.wait(max(call.deadline - time.monotonic(), 0)) and call.error is None:
+                return call.result
+            return compute()
+
+        try:
+            call.result = self._across_processes(key, compute)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            call.done.set()
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+    def _paths(self, key):
+        # 文件名包含计算引擎版本，部署新版本后不会读到旧版本写出的结果
+        digest = hashlib.sha1(f'{ENGINE_VERSION}:{key}'.encode()).hexdigest()
+        return (os.path.join(self.directory, f'{digest}.lock'),
+                os.path.join(self.directory, f'{digest}.result'))
+
+    def _secure_directory(self):
+        """
+        创建并检查锁文件目录：必须是当前用户所有、其他用户无权访问的真实目录
+
+        目录位于共享的临时目录时，其他本地用户可能抢先创建它并放入伪造的结果文件；
+        检查不通过时只在进程内合并并记录一次警告。
+        """
+        if self._directory_ok is None:
+            try:
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+                info = os.lstat(self.directory)
+                self._directory_ok = stat.S_ISDIR(info.st_mode) and \
+                    info.st_uid == os.getuid() and stat.S_IMODE(info.st_mode) & 0o077 == 0
+            except OSError:
+                self._directory_ok = False
+            if not self._directory_ok:
+                logger.warning('single-flight 目录 %s 不属于当前用户或权限不是 0700，'
+                               '只在进程内合并相同计算', self.directory)
+        return self._directory_ok
+
+    def _across_processes(self, key, compute):
+        if fcntl is None or not self._secure_directory():
+            return compute()
+        lock_path, result_path = self._paths(key)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            acquired = self._acquire(fd)
+            # 拿到锁（或等待超时）时，其他进程可能刚刚写出了结果
+            shared = self._read_result(result_path)
+            if shared is not None:
+                return shared
+            result = compute()
+            if acquired:
+                self._write_result(result_path, result)
+            return result
+        finally:
+            os.close(fd)  # 同时释放 flock
+
+    def _acquire(self, fd):
+        """在 timeout 内获取锁文件的排他锁；超时返回 False（调用方不再等待，自行计算）"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(POLL_INTERVAL)
+
+    def _read_result(self, path):
+        try:
+            if time.time() - os.stat(path).st_mtime > self.result_ttl:
+                return None
+            with open(path, 'rb') as stream:
+                return pickle.load(stream)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _write_result(self, path, result):
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as stream:
+            pickle.dump(result, stream, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        self._prune()
+
+    def _prune(self):
+        """删除过期的结果与锁文件（每个 RESULT_TTL 至多扫描一次目录）"""
+        now = time.time()
+        if now - self._last_prune < self.result_ttl:
+            return
+        self._last_prune = now
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.stat(path).st_mtime > self.result_ttl:
+                    # 删除仍被持有的锁文件最多使一次计算重复执行，不影响结果
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+group = SingleFlight()
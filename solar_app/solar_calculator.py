@@ -2,8 +2,19 @@
 太阳能光伏与储能系统计算模块
 从原始Streamlit应用提取的核心计算逻辑
 """
+from collections import namedtuple
+
 import numpy as np
-import pandas as pd
+
+from . import dispatch, load_profiles, results, solar_geometry, tariffs
+
+
+# 计算引擎版本：计算模型或结果格式变化时提升，使 HTTP 缓存中的旧结果（ETag）失效
+ENGINE_VERSION = '3'
+
+
+# 分块批量计算的进度：done / total 为已完成与总方案数，flows / costs 为本块的计算结果
+BatchProgress = namedtuple('BatchProgress', 'done total flows costs')
 
 
 class SolarCalculator:
@@ -21,11 +32,6 @@ class SolarCalculator:
         31, 31, 30, 31, 30, 31
     ])
     
-    MONTH_NAMES = [
-        "1月", "2月", "3月", "4月", "5月", "6月",
-        "7月", "8月", "9月", "10月", "11月", "12月"
-    ]
-    
     # 季节性用电系数 - 总和为1.0
     # 冬季月份（12-2月）→ 用电量较高（供暖、照明）
     # 夏季月份（6-8月）→ 用电量略低
@@ -33,6 +39,38 @@ class SolarCalculator:
         0.095, 0.085, 0.09, 0.08, 0.08, 0.075,
         0.075, 0.075, 0.08, 0.085, 0.095, 0.105
     ])
+
+    # 参与能量与经济计算的参数（批量接口按这些键接收列数据）
+    PARAM_KEYS = (
+        'pv_capacity_kwp', 'battery_capacity_kwh', 'annual_consumption_kwh',
+        'cons_fraction_night', 'cons_fraction_morn_even', 'cons_fraction_midday',
+        'grid_price', 'feed_in_price',
+    )
+
+    # simulate_batch 返回的月度能量流字段 (kWh)，即结果对象的字段布局
+    FLOW_FIELDS = results.FLOW_FIELDS
+
+    # simulate_batch 额外返回的分时段能量流 (kWh)，形状 (n, 12, 3)，
+    # 最后一维依次为 夜间 / 早晚 / 中午（见 tariffs.TIME_WINDOWS），供分时与动态电价计价
+    WINDOW_FIELDS = (
+        'consumption_by_window', 'grid_no_batt_by_window', 'grid_with_batt_by_window',
+    )
+
+    # 能量流阶段只依赖这些参数；其余参数（电价、电价类型、调度策略）只影响计价阶段
+    ENERGY_KEYS = PARAM_KEYS[:6]
+    # 可选的附加负荷参数（热泵、电动汽车、居家办公，见 load_profiles），同属能量流阶段；
+    # 缺省时不附加负荷
+    LOAD_KEYS = load_profiles.PARAM_KEYS
+    PRICING_KEYS = (
+        'annual_consumption_kwh', 'grid_price', 'feed_in_price', 'tariff', 'battery_dispatch',
+    )
+
+    # 电池调度策略：按月贪心（剩余光伏充电、早晚与夜间放电）或逐时最优调度
+    DISPATCH_GREEDY = 'greedy'
+    DISPATCH_OPTIMAL = 'optimal'
+
+    # 年度经济指标字段 (€)
+    COST_FIELDS = results.COST_FIELDS
     
     def __init__(self):
         # 归一化季节性系数
@@ -43,6 +81,18 @@ class SolarCalculator:
         annual_irradiance_sum = self.MONTHLY_IRRADIANCE.sum()
         self.monthly_kwh_per_kwp = 1000 * self.MONTHLY_IRRADIANCE / annual_irradiance_sum
     
+    def hourly_generation(self, pv_capacity_kwp: float,
+                          latitude: float = solar_geometry.DEFAULT_LATITUDE,
+                          longitude: float = solar_geometry.DEFAULT_LONGITUDE,
+                          year: int = solar_geometry.DEFAULT_YEAR):
+        """
+        逐时发电曲线 (kWh)，形状 (8760,)
+
+        月度发电量与 calculate 一致，月内按晴空辐照度的日变化形状分配。
+        """
+        monthly_generation = pv_capacity_kwp * self.monthly_kwh_per_kwp
+        return solar_geometry.hourly_from_monthly(monthly_generation, latitude, longitude, year)
+
     def simulate_month(self, gen_kwh: float, c_mid: float, c_me: float, 
                       c_night: float, batt_capacity: float, days: int):
         """
@@ -93,77 +143,248 @@ class SolarCalculator:
 
         return no_batt, with_batt
     
-    def calculate(self, params):
+    def simulate_batch(self, pv_capacity_kwp, battery_capacity_kwh, annual_consumption_kwh,
+                       cons_fraction_night, cons_fraction_morn_even, cons_fraction_midday,
+                       extra_load=None, kwh_per_kwp=None):
         """
-        执行完整的太阳能模拟计算
-        
-        params: 字典，包含所有输入参数
-        返回: 计算结果字典
-        """
-        # 提取参数
-        pv_capacity_kwp = params['pv_capacity_kwp']
-        battery_capacity_kwh = params['battery_capacity_kwh']
-        annual_consumption_kwh = params['annual_consumption_kwh']
-        cons_fraction_night = params['cons_fraction_night']
-        cons_fraction_morn_even = params['cons_fraction_morn_even']
-        cons_fraction_midday = params['cons_fraction_midday']
-        grid_price = params['grid_price']
-        feed_in_price = params['feed_in_price']
-        
+        向量化的月度模拟：一次计算 n 个方案 × 12 个月
+
+        参数可以是标量或形状 (n,) 的数组，按 NumPy 规则广播。
+        extra_load: 可选的附加负荷 (kWh)，形状 (12, 3) 或 (n, 12, 3)（见 load_profiles.addon_load），
+        按时段叠加在家庭基础负荷上。
+        kwh_per_kwp: 可选的每 kWp 月发电量 (kWh)，形状 (12,) 或 (n, 12)，用于按地点的辐照度计算；
+        省略时为德国平均值 monthly_kwh_per_kwp。
+        返回 FLOW_FIELDS 为键、形状 (n, 12) 的数组字典，逐元素结果与 simulate_month 相同；
+        另含 WINDOW_FIELDS 为键、形状 (n, 12, 3) 的分时段用电与购电量。
+        """
+        pv, batt, annual, f_night, f_me, f_mid = (
+            x[:, np.newaxis] for x in np.broadcast_arrays(*(
+                np.atleast_1d(np.asarray(v, dtype=float)) for v in (
+                    pv_capacity_kwp, battery_capacity_kwh, annual_consumption_kwh,
+                    cons_fraction_night, cons_fraction_morn_even, cons_fraction_midday)
+            ))
+        )
+
         # 构建月度用电和发电曲线
-        monthly_consumption = annual_consumption_kwh * self.seasonal_factors
-        monthly_generation = pv_capacity_kwp * self.monthly_kwh_per_kwp  # kWh
+        consumption = annual * self.seasonal_factors
+        generation = pv * (self.monthly_kwh_per_kwp if kwh_per_kwp is None
+                           else np.asarray(kwh_per_kwp, dtype=float))
 
         # 将月度用电量分配到三个时间窗口
-        cons_night = monthly_consumption * cons_fraction_night
-        cons_morn_even = monthly_consumption * cons_fraction_morn_even
-        cons_midday = monthly_consumption * cons_fraction_midday
-
-        # 运行12个月的模拟
-        results = []
-        for i in range(12):
-            no_batt, with_batt = self.simulate_month(
-                gen_kwh=monthly_generation[i],
-                c_mid=cons_midday[i],
-                c_me=cons_morn_even[i],
-                c_night=cons_night[i],
-                batt_capacity=battery_capacity_kwh,
-                days=self.DAYS_IN_MONTH[i]
-            )
-            results.append({
-                "月份": self.MONTH_NAMES[i],
-                "发电量": monthly_generation[i],
-                "用电量": monthly_consumption[i],
-                # 无储能
-                "自用电量_无储能": no_batt["self_use"],
-                "上网电量_无储能": no_batt["export"],
-                "购电量_无储能": no_batt["grid_purchase"],
-                # 有储能
-                "自用电量_有储能": with_batt["self_use"],
-                "上网电量_有储能": with_batt["export"],
-                "购电量_有储能": with_batt["grid_purchase"],
-            })
-
-        df = pd.DataFrame(results)
-
-        # 经济效益评估
-        baseline_cost = annual_consumption_kwh * grid_price
-
-        cost_no_batt = df["购电量_无储能"].sum() * grid_price - \
-            df["上网电量_无储能"].sum() * feed_in_price
-
-        cost_with_batt = df["购电量_有储能"].sum() * grid_price - \
-            df["上网电量_有储能"].sum() * feed_in_price
-
-        savings_no_batt = baseline_cost - cost_no_batt
-        savings_with_batt = baseline_cost - cost_with_batt
+        c_night = consumption * f_night
+        c_me = consumption * f_me
+        c_mid = consumption * f_mid
+        if extra_load is not None:
+            extra = np.asarray(extra_load, dtype=float)
+            c_night = c_night + extra[..., 0]
+            c_me = c_me + extra[..., 1]
+            c_mid = c_mid + extra[..., 2]
+            consumption = consumption + extra.sum(axis=-1)
+
+        # 方案1 - 无储能：仅中午时段重叠
+        self_use_no_batt = np.minimum(generation, c_mid)
+        export_no_batt = np.maximum(0, generation - c_mid)
+        grid_no_batt = c_mid + c_me + c_night - self_use_no_batt
+
+        # 方案2 - 有储能：剩余电量充入电池，月度可储存能量为容量 * 天数，
+        # 且不超过早晚+夜间需求
+        batt_charge = np.minimum(np.minimum(export_no_batt, batt * self.DAYS_IN_MONTH),
+                                 c_me + c_night)
+        has_batt = batt > 0
+        # 无电池时退化为无储能方案
+        self_use_with_batt = np.where(has_batt, self_use_no_batt + batt_charge, self_use_no_batt)
+        export_with_batt = np.where(has_batt, export_no_batt - batt_charge, export_no_batt)
+        grid_with_batt = np.where(has_batt, np.maximum(0, c_me + c_night - batt_charge),
+                                  grid_no_batt)
+
+        # 分时段购电量：电池先覆盖早晚负荷，剩余覆盖夜间负荷。
+        # 与月度模型一致，有储能方案不计中午时段的缺口，各时段之和等于 grid_with_batt
+        from_batt_me = np.minimum(batt_charge, c_me)
+        from_batt_night = batt_charge - from_batt_me
+        grid_no_batt_by_window = np.stack([c_night, c_me, c_mid - self_use_no_batt], axis=-1)
+        grid_with_batt_by_window = np.where(
+            has_batt[..., np.newaxis],
+            np.stack([np.maximum(0, c_night - from_batt_night), c_me - from_batt_me,
+                      np.zeros_like(c_mid)], axis=-1),
+            grid_no_batt_by_window)
 
         return {
-            'monthly_data': df.to_dict('records'),
-            'baseline_cost': baseline_cost,
+            'generation': generation,
+            'consumption': consumption,
+            'self_use_no_batt': self_use_no_batt,
+            'export_no_batt': export_no_batt,
+            'grid_no_batt': grid_no_batt,
+            'self_use_with_batt': self_use_with_batt,
+            'export_with_batt': export_with_batt,
+            'grid_with_batt': grid_with_batt,
+            'consumption_by_window': np.stack([c_night, c_me, c_mid], axis=-1),
+            'grid_no_batt_by_window': grid_no_batt_by_window,
+            'grid_with_batt_by_window': grid_with_batt_by_window,
+        }
+
+    @staticmethod
+    def evaluate_costs(flows, grid_price, feed_in_price):
+        """
+        根据月度能量流计算年度经济指标
+
+        返回 COST_FIELDS 为键、形状 (n,) 的数组字典
+        """
+        grid_price = np.asarray(grid_price, dtype=float)
+        feed_in_price = np.asarray(feed_in_price, dtype=float)
+
+        # 基准成本 - 无光伏，全部从电网购电（含附加负荷）
+        baseline_cost = flows['consumption'].sum(axis=-1) * grid_price
+
+        cost_no_batt = flows['grid_no_batt'].sum(axis=-1) * grid_price - \
+            flows['export_no_batt'].sum(axis=-1) * feed_in_price
+        cost_with_batt = flows['grid_with_batt'].sum(axis=-1) * grid_price - \
+            flows['export_with_batt'].sum(axis=-1) * feed_in_price
+
+        return {
+            'baseline_cost': np.broadcast_to(baseline_cost, cost_no_batt.shape),
             'cost_no_batt': cost_no_batt,
             'cost_with_batt': cost_with_batt,
-            'savings_no_batt': savings_no_batt,
-            'savings_with_batt': savings_with_batt,
-            'df': df  # 用于图表生成
+            'savings_no_batt': baseline_cost - cost_no_batt,
+            'savings_with_batt': baseline_cost - cost_with_batt,
         }
+
+    def energy_flows(self, params, kwh_per_kwp=None):
+        """
+        能量流阶段：只依赖 ENERGY_KEYS（容量与用电参数）与可选的 LOAD_KEYS（附加负荷）
+
+        kwh_per_kwp: 可选的按地点的每 kWp 月发电量（见 simulate_batch）
+        返回 simulate_batch 的结果（n = 1 或参数数组长度）
+        """
+        return self.simulate_batch(*(params[key] for key in self.ENERGY_KEYS),
+                                   extra_load=load_profiles.addon_load(params),
+                                   kwh_per_kwp=kwh_per_kwp)
+
+    def price_flows(self, flows, params, tariff=None):
+        """
+        计价阶段：在已有能量流上计算经济指标，只依赖 PRICING_KEYS
+
+        tariff: 可选的 tariffs.Tariff 实例；省略时按 grid_price / feed_in_price 固定电价计价
+        返回 COST_FIELDS 为键的数组字典
+        """
+        if tariff is None:
+            return self.evaluate_costs(flows, params['grid_price'], params['feed_in_price'])
+        return tariff.evaluate(flows)
+
+    @staticmethod
+    def resolve_tariff(params):
+        """返回 (电价类型名称, Tariff 实例)；固定电价返回 None，走 evaluate_costs"""
+        name = params.get('tariff') or tariffs.FlatTariff.name
+        if name == tariffs.FlatTariff.name:
+            return name, None
+        return name, tariffs.get_tariff(name, params['grid_price'], params['feed_in_price'])
+
+    def calculate_batch(self, columns, tariff=None):
+        """
+        批量计算多个方案
+
+        columns: 以 PARAM_KEYS 为键的字典，值为标量或形状 (n,) 的数组
+        tariff: 可选的 tariffs.Tariff 实例；省略时按 grid_price / feed_in_price 固定电价计价
+        返回 (月度能量流字典, 年度经济指标字典)，数组形状分别为 (n, 12) 和 (n,)
+        """
+        flows = self.energy_flows(columns)
+        return flows, self.price_flows(flows, columns, tariff)
+
+    def iter_batch(self, columns, chunk_size, pricing=None):
+        """
+        分块批量计算，每块完成后产生一个 BatchProgress
+
+        columns: 以 PARAM_KEYS 为键、形状 (n,) 的数组（标量会广播）
+        pricing: 可选的 pricing(flows, chunk) -> 经济指标字典；省略时按固定电价计价
+        调用方可逐块报告进度、更新部分汇总，或在任意一块之后停止迭代以取消剩余计算。
+        """
+        total = max((np.size(values) for values in columns.values()), default=0)
+        columns = {key: np.broadcast_to(values, (total,)) for key, values in columns.items()}
+        for start in range(0, total, chunk_size):
+            chunk = {key: values[start:start + chunk_size] for key, values in columns.items()}
+            flows = self.energy_flows(chunk)
+            costs = pricing(flows, chunk) if pricing is not None else self.price_flows(flows, chunk)
+            yield BatchProgress(min(start + chunk_size, total), total, flows, costs)
+
+    def optimal_dispatch(self, params, tariff=None, flows=None, **options):
+        """
+        电价感知的最优电池调度（单个方案，逐时动态规划，见 dispatch.optimal_dispatch）
+
+        params: 以 PARAM_KEYS 为键的标量参数
+        tariff: tariffs.Tariff 实例；省略时为 grid_price / feed_in_price 固定电价
+        flows: 可选的 energy_flows 结果，已计算过时直接复用
+        options: 传给 dispatch.optimal_dispatch 的 soc_levels / c_rate / efficiency
+        返回 (逐时调度结果, 月度能量流, 年度经济指标)；
+        月度能量流与经济指标中的有储能方案替换为最优调度的结果，无储能方案不变。
+        逐时模型有功率限制，约束比月度贪心模型更紧；最优调度的电费高于贪心调度时
+        保留贪心调度的能量流与经济指标，因此选择最优调度的结果不会比贪心差。
+        """
+        if tariff is None:
+            tariff = tariffs.FlatTariff(params['grid_price'], params['feed_in_price'])
+        if flows is None:
+            flows = self.energy_flows(params)
+        costs = self.price_flows(flows, params, tariff)
+
+        generation = self.hourly_generation(params['pv_capacity_kwp'])
+        load = dispatch.hourly_load(flows['consumption_by_window'])
+        schedule = dispatch.optimal_dispatch(generation, load, tariff.hourly_prices,
+                                             tariff.feed_in_price,
+                                             params['battery_capacity_kwh'], **options)
+        if float(schedule['cost'][0]) >= float(costs['cost_with_batt'][0]):
+            return schedule, flows, costs
+
+        def monthly(values):
+            return np.add.reduceat(values, solar_geometry.MONTH_START_HOUR, axis=-1)
+
+        window = tariffs.HOUR_WINDOW[solar_geometry.HOUR_OF_DAY]
+        index = solar_geometry.MONTH_OF_HOUR * len(tariffs.TIME_WINDOWS) + window
+        grid_by_window = np.bincount(index, weights=schedule['grid_import'][0],
+                                     minlength=12 * len(tariffs.TIME_WINDOWS))
+
+        flows = dict(flows)
+        flows['grid_with_batt'] = monthly(schedule['grid_import'])
+        flows['export_with_batt'] = monthly(schedule['grid_export'])
+        flows['self_use_with_batt'] = flows['generation'] - flows['export_with_batt']
+        flows['grid_with_batt_by_window'] = grid_by_window.reshape(1, 12, -1)
+
+        costs = dict(costs)
+        costs['cost_with_batt'] = schedule['cost']
+        costs['savings_with_batt'] = costs['baseline_cost'] - schedule['cost']
+        return schedule, flows, costs
+
+    def uses_optimal_dispatch(self, params):
+        """是否对有储能方案使用最优调度"""
+        return (params.get('battery_dispatch') == self.DISPATCH_OPTIMAL and
+                params['battery_capacity_kwh'] > 0)
+
+    def pricing_stage(self, flows, params):
+        """
+        计价阶段（含可选的最优调度）：返回 (月度能量流, 年度经济指标)
+
+        最优调度依赖电价，因此与计价属于同一阶段；能量流阶段的结果原样传入、不被修改。
+        """
+        _, tariff = self.resolve_tariff(params)
+        if self.uses_optimal_dispatch(params):
+            _, flows, costs = self.optimal_dispatch(params, tariff, flows)
+            return flows, costs
+        return flows, self.price_flows(flows, params, tariff)
+
+    def build_results(self, flows, costs, params):
+        """由能量流与经济指标组装 calculate 的结果（results.SimulationResult）"""
+        return results.SimulationResult.from_arrays(
+            flows, costs,
+            tariff=params.get('tariff') or tariffs.FlatTariff.name,
+            battery_dispatch=params.get('battery_dispatch') or self.DISPATCH_GREEDY,
+        )
+
+    def calculate(self, params):
+        """
+        执行完整的太阳能模拟计算
+        
+        params: 字典，包含所有输入参数；可选的 'tariff' 为电价类型（见 tariffs.get_tariff），
+                'battery_dispatch' 为 'optimal' 时有储能方案使用最优调度
+        返回: results.SimulationResult
+
+        需要在参数变化时复用未受影响阶段的结果，请使用 pipeline.calculate。
+        """
+        flows, costs = self.pricing_stage(self.energy_flows(params), params)
+        return self.build_results(flows, costs, params)
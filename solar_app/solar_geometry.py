@@ -0,0 +1,195 @@
+"""
+太阳几何与晴空辐照度模块
+以NumPy数组运算一次性计算全年8760小时、任意多个地点的太阳位置和晴空辐照度，
+用于把月度辐照度总量（MONTHLY_IRRADIANCE）拆分成符合日变化规律的小时曲线
+"""
+import numpy as np
+
+from .lru import LRUCache
+
+
+SOLAR_CONSTANT = 1361.0  # 太阳常数 (W/m²)
+HOURS_PER_DAY = 24
+HOURS_PER_YEAR = 8760
+
+# 德国地理中心附近，作为未指定地点时的默认值
+DEFAULT_LATITUDE = 51.0
+DEFAULT_LONGITUDE = 10.0
+DEFAULT_YEAR = 2025
+# 小时序列使用的本地标准时（CET = UTC+1，不考虑夏令时）
+DEFAULT_UTC_OFFSET = 1.0
+
+# 非闰年每月天数，由日历推导，保证与 8760 小时序列一致
+DAYS_IN_MONTH = np.diff(
+    np.arange('2001-01', '2002-02', dtype='datetime64[M]').astype('datetime64[D]')
+).astype(int)
+
+# 每个小时所属的月份索引 (0-11)，形状 (8760,)
+MONTH_OF_HOUR = np.repeat(np.arange(12), DAYS_IN_MONTH * HOURS_PER_DAY)
+# 每个月第一个小时在 8760 序列中的位置
+MONTH_START_HOUR = np.concatenate(([0], np.cumsum(DAYS_IN_MONTH * HOURS_PER_DAY)[:-1]))
+# 每个小时的钟点 (0-23)，形状 (8760,)
+HOUR_OF_DAY = np.tile(np.arange(HOURS_PER_DAY), HOURS_PER_YEAR // HOURS_PER_DAY)
+
+
+def _is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def fractional_year(year, utc_offset=DEFAULT_UTC_OFFSET):
+    """
+    返回全年8760个小时中点对应的年角 γ (弧度)，形状 (8760,)
+
+    闰年的2月29日被跳过，以便与模型使用的365天月份长度对齐，
+    但年角的分母仍取366天，保持天文位置正确。
+    """
+    days_in_year = 366 if _is_leap(year) else 365
+    day_index = np.repeat(np.arange(365), HOURS_PER_DAY)
+    if days_in_year == 366:
+        day_index = day_index + (day_index >= 59)  # 跳过2月29日
+    hour_utc = HOUR_OF_DAY + 0.5 - utc_offset
+    return 2 * np.pi / days_in_year * (day_index + (hour_utc - 12) / 24)
+
+
+def declination(gamma):
+    """太阳赤纬 (弧度)，Spencer (1971) 傅里叶级数"""
+    return (0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+            - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+            - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma))
+
+
+def equation_of_time(gamma):
+    """时差 (分钟)"""
+    return 229.18 * (0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+                     - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma))
+
+
+def hour_angle(longitude, gamma, utc_offset=DEFAULT_UTC_OFFSET):
+    """
+    太阳时角 (弧度)
+
+    longitude 形状 (n,) 或标量，gamma 形状 (8760,)，广播得到 (n, 8760)
+    """
+    longitude = np.asarray(longitude, dtype=float)[..., np.newaxis]
+    minutes_utc = (HOUR_OF_DAY + 0.5 - utc_offset) * 60
+    true_solar_time = minutes_utc + equation_of_time(gamma) + 4 * longitude
+    return np.deg2rad(true_solar_time / 4 - 180)
+
+
+def extraterrestrial_irradiance(gamma):
+    """大气层外法向辐照度 (W/m²)，考虑日地距离的年变化"""
+    return SOLAR_CONSTANT * (1.000110 + 0.034221 * np.cos(gamma) + 0.001280 * np.sin(gamma)
+                             + 0.000719 * np.cos(2 * gamma) + 0.000077 * np.sin(2 * gamma))
+
+
+def solar_position(latitudes, longitudes, year=DEFAULT_YEAR, utc_offset=DEFAULT_UTC_OFFSET):
+    """
+    一次性计算多个地点全年逐时的太阳几何量
+
+    latitudes/longitudes: 形状 (n,) 的纬度/经度（度）
+    返回字典，除 declination 为 (8760,) 外其余数组形状均为 (n, 8760)：
+        - declination 赤纬 (弧度)
+        - hour_angle 时角 (弧度)
+        - cos_zenith 天顶角余弦（夜间为负）
+        - zenith 天顶角 (度)
+        - extraterrestrial 大气层外水平面辐照度 (W/m²)
+    """
+    gamma = fractional_year(year, utc_offset)
+    delta = declination(gamma)
+    omega = hour_angle(longitudes, gamma, utc_offset)
+    phi = np.deg2rad(np.asarray(latitudes, dtype=float))[..., np.newaxis]
+
+    cos_zenith = (np.sin(phi) * np.sin(delta)
+                  + np.cos(phi) * np.cos(delta) * np.cos(omega))
+    cos_zenith = np.clip(cos_zenith, -1.0, 1.0)
+
+    return {
+        'declination': delta,
+        'hour_angle': omega,
+        'cos_zenith': cos_zenith,
+        'zenith': np.rad2deg(np.arccos(cos_zenith)),
+        'extraterrestrial': extraterrestrial_irradiance(gamma) * np.maximum(cos_zenith, 0.0),
+    }
+
+
+def clear_sky_ghi(cos_zenith):
+    """晴空水平总辐照度 (W/m²)，Haurwitz 模型；太阳在地平线下时为0"""
+    mu = np.maximum(cos_zenith, 0.0)
+    with np.errstate(divide='ignore'):
+        ghi = 1098.0 * mu * np.exp(-0.057 / mu)
+    return np.where(mu > 0, ghi, 0.0)
+
+
+_clear_sky_cache = LRUCache(maxsize=256)
+
+
+def _location_key(latitude, longitude):
+    # 0.01° (约1km) 以内的地点共享同一条曲线
+    return round(float(latitude), 2), round(float(longitude), 2)
+
+
+def clear_sky_profiles(locations, year=DEFAULT_YEAR):
+    """
+    返回多个地点的全年逐时晴空水平辐照度 (W/m²)，形状 (n, 8760)
+
+    locations: [(纬度, 经度), ...]
+    已缓存的地点直接复用，未命中的地点合并为一次数组运算后写入LRU缓存。
+    返回的数组为只读。
+    """
+    keys = [_location_key(lat, lon) for lat, lon in locations]
+    profiles = [_clear_sky_cache.get((key, year)) for key in keys]
+
+    missing = sorted({key for key, profile in zip(keys, profiles) if profile is None})
+    if missing:
+        lats, lons = np.array(missing, dtype=float).T
+        ghi = clear_sky_ghi(solar_position(lats, lons, year)['cos_zenith'])
+        computed = {}
+        for key, row in zip(missing, ghi):
+            row.flags.writeable = False
+            computed[key] = row
+            _clear_sky_cache.put((key, year), row)
+        profiles = [profile if profile is not None else computed[key]
+                    for key, profile in zip(keys, profiles)]
+
+    return np.stack(profiles) if profiles else np.empty((0, HOURS_PER_YEAR))
+
+
+def clear_sky_profile(latitude=DEFAULT_LATITUDE, longitude=DEFAULT_LONGITUDE, year=DEFAULT_YEAR):
+    """单个地点的全年逐时晴空水平辐照度 (W/m²)，形状 (8760,)"""
+    return clear_sky_profiles([(latitude, longitude)], year)[0]
+
+
+def monthly_shape(profiles):
+    """
+    将逐时曲线按月归一化：每个月内各小时的权重之和为1
+
+    profiles: 形状 (..., 8760)
+    月份内没有日照的（极夜）均匀分配，避免除零。
+    """
+    profiles = np.asarray(profiles, dtype=float)
+    totals = np.add.reduceat(profiles, MONTH_START_HOUR, axis=-1)[..., MONTH_OF_HOUR]
+    uniform = 1.0 / (DAYS_IN_MONTH * HOURS_PER_DAY)[MONTH_OF_HOUR]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(totals > 0, profiles / totals, uniform)
+
+
+def hourly_from_monthly(monthly_totals, latitude=DEFAULT_LATITUDE,
+                        longitude=DEFAULT_LONGITUDE, year=DEFAULT_YEAR):
+    """
+    按晴空曲线的日变化形状，把月度总量拆分成逐时数值
+
+    monthly_totals: 形状 (..., 12) 的月度总量（任意单位，如kWh）
+    返回形状 (..., 8760)，逐月求和后与输入一致
+    """
+    shape = monthly_shape(clear_sky_profile(latitude, longitude, year))
+    monthly_totals = np.asarray(monthly_totals, dtype=float)
+    return monthly_totals[..., MONTH_OF_HOUR] * shape
+
+
+def hourly_irradiance(monthly_irradiance, latitude=DEFAULT_LATITUDE,
+                      longitude=DEFAULT_LONGITUDE, year=DEFAULT_YEAR):
+    """
+    将月平均日辐照度 (kWh/m²/day) 转换为逐时辐照量 (kWh/m²)，形状 (..., 8760)
+    """
+    monthly_totals = np.asarray(monthly_irradiance, dtype=float) * DAYS_IN_MONTH
+    return hourly_from_monthly(monthly_totals, latitude, longitude, year)
@@ -0,0 +1,265 @@
+"""
+电价模型
+支持固定电价、分时电价（按三个用电时段）和从本地文件加载的逐时动态电价。
+每种电价都被归约为 12个月 × 3个时段 的价格矩阵，
+与计算引擎输出的分时段能量流做一次点积即可得到年度成本，切换电价无需重新模拟。
+"""
+import functools
+from pathlib import Path
+
+import numpy as np
+
+from .solar_geometry import HOUR_OF_DAY, MONTH_OF_HOUR
+
+
+# 三个用电时段，顺序与计算引擎的 *_by_window 数组最后一维一致
+TIME_WINDOWS = ('night', 'morn_even', 'midday')
+
+# 每个钟点 (0-23) 所属的时段索引：22-06 夜间，06-09 & 17-22 早晚，09-17 中午
+HOUR_WINDOW = np.array([0] * 6 + [1] * 3 + [2] * 8 + [1] * 5 + [0] * 2)
+
+# 分时电价相对于平均电价的系数（夜间低谷、早晚高峰）
+DEFAULT_TOU_FACTORS = {'night': 0.8, 'morn_even': 1.2, 'midday': 1.0}
+
+
+class TariffError(ValueError):
+    """电价数据无效"""
+
+
+class Tariff:
+    """电价基类：子类提供 12×3 的购电价格矩阵"""
+
+    name = None
+
+    def __init__(self, feed_in_price):
+        self.feed_in_price = float(feed_in_price)
+
+    @functools.cached_property
+    def window_prices(self):
+        """购电价格矩阵 (€/kWh)，形状 (12, 3)"""
+        raise NotImplementedError
+
+    @functools.cached_property
+    def hourly_prices(self):
+        """逐时购电价格 (€/kWh)，形状 (8760,)"""
+        return self.window_prices[MONTH_OF_HOUR, HOUR_WINDOW[HOUR_OF_DAY]]
+
+    @functools.cached_property
+    def grid_price_weights(self):
+        """价格矩阵随平均电价 grid_price 的变化率，形状 (12, 3)；与 grid_price 无关的电价为 0"""
+        return np.zeros((12, len(TIME_WINDOWS)))
+
+    def evaluate(self, flows, grid_price_shift=None, feed_in_price=None):
+        """
+        根据分时段能量流计算年度经济指标
+
+        flows: 计算引擎返回的字典，需包含 consumption_by_window、
+               grid_no_batt_by_window、grid_with_batt_by_window（形状 (n, 12, 3)）
+               以及 export_no_batt、export_with_batt（形状 (n, 12)）
+        grid_price_shift: 可选，形状 (n,) 的平均电价偏移，各方案价格矩阵为
+                          window_prices + 偏移 × grid_price_weights（用于批量敏感性分析）
+        feed_in_price: 可选，形状 (n,) 的逐方案上网电价，省略时使用本电价的上网电价
+        """
+        prices = self.window_prices.reshape(-1)
+        weights = self.grid_price_weights.reshape(-1)
+        n = len(flows['consumption_by_window'])
+        if feed_in_price is None:
+            feed_in_price = self.feed_in_price
+
+        def import_cost(key):
+            energy = flows[key].reshape(n, -1)
+            cost = energy @ prices
+            if grid_price_shift is not None:
+                cost = cost + grid_price_shift * (energy @ weights)
+            return cost
+
+        baseline_cost = import_cost('consumption_by_window')
+        cost_no_batt = import_cost('grid_no_batt_by_window') - \
+            flows['export_no_batt'].sum(axis=-1) * feed_in_price
+        cost_with_batt = import_cost('grid_with_batt_by_window') - \
+            flows['export_with_batt'].sum(axis=-1) * feed_in_price
+
+        return {
+            'baseline_cost': baseline_cost,
+            'cost_no_batt': cost_no_batt,
+            'cost_with_batt': cost_with_batt,
+            'savings_no_batt': baseline_cost - cost_no_batt,
+            'savings_with_batt': baseline_cost - cost_with_batt,
+        }
+
+
+class FlatTariff(Tariff):
+    """固定电价"""
+
+    name = 'flat'
+
+    def __init__(self, grid_price, feed_in_price):
+        super().__init__(feed_in_price)
+        self.grid_price = float(grid_price)
+
+    @functools.cached_property
+    def window_prices(self):
+        return np.full((12, len(TIME_WINDOWS)), self.grid_price)
+
+    @functools.cached_property
+    def grid_price_weights(self):
+        return np.ones((12, len(TIME_WINDOWS)))
+
+
+class TimeOfUseTariff(Tariff):
+    """
+    分时电价
+
+    window_prices: {时段: 价格}，时段取 TIME_WINDOWS 中的名称
+    """
+
+    name = 'tou'
+
+    def __init__(self, window_prices, feed_in_price):
+        super().__init__(feed_in_price)
+        missing = set(TIME_WINDOWS) - set(window_prices)
+        if missing:
+            raise TariffError(f'分时电价缺少时段: {", ".join(sorted(missing))}')
+        self._prices = np.array([float(window_prices[window]) for window in TIME_WINDOWS])
+
+    @classmethod
+    def from_average(cls, grid_price, feed_in_price, factors=None):
+        """以平均电价乘以各时段系数构造分时电价"""
+        factors = factors or DEFAULT_TOU_FACTORS
+        tariff = cls({window: grid_price * factors[window] for window in TIME_WINDOWS},
+                     feed_in_price)
+        tariff.grid_price_weights = np.tile([factors[window] for window in TIME_WINDOWS], (12, 1))
+        return tariff
+
+    @functools.cached_property
+    def window_prices(self):
+        return np.tile(self._prices, (12, 1))
+
+
+class HourlyTariff(Tariff):
+    """
+    逐时动态电价（如按日前现货价格浮动的电价）
+
+    prices: 形状 (8760,) 的逐时购电价格 (€/kWh)
+    模型中每个时段内的用电均匀分布，因此各月各时段的价格取该时段小时价格的平均值。
+    """
+
+    name = 'dynamic'
+
+    def __init__(self, prices, feed_in_price):
+        super().__init__(feed_in_price)
+        prices = np.asarray(prices, dtype=float)
+        if prices.shape != MONTH_OF_HOUR.shape:
+            raise TariffError(f'逐时电价需要 {len(MONTH_OF_HOUR)} 个数值，实际为 {prices.size}')
+        self.prices = prices
+
+    @classmethod
+    def from_file(cls, path, grid_price=None, feed_in_price=0.0):
+        """
+        从本地文件加载逐时电价
+
+        grid_price 不为空时平移价格曲线，使全年平均值等于 grid_price
+        （保留动态电价的波动，同时与表单中的平均电价可比）。
+        """
+        prices = load_price_vector(path)
+        if grid_price is None:
+            return cls(prices, feed_in_price)
+        tariff = cls(prices - prices.mean() + grid_price, feed_in_price)
+        tariff.grid_price_weights = np.ones((12, len(TIME_WINDOWS)))
+        return tariff
+
+    @functools.cached_property
+    def hourly_prices(self):
+        return self.prices
+
+    @functools.cached_property
+    def window_prices(self):
+        index = MONTH_OF_HOUR * len(TIME_WINDOWS) + HOUR_WINDOW[HOUR_OF_DAY]
+        sums = np.bincount(index, weights=self.prices, minlength=12 * len(TIME_WINDOWS))
+        counts = np.bincount(index, minlength=12 * len(TIME_WINDOWS))
+        return (sums / counts).reshape(12, len(TIME_WINDOWS))
+
+
+def load_price_vector(path):
+    """
+    读取逐时电价文件并按 (路径, 修改时间) 缓存，多个请求共享同一个只读数组
+
+    文件为每行一个价格的文本/CSV（可带表头；多列时取最后一列），
+    单位 €/kWh；若数值明显是 €/MWh（平均值大于 10）则自动换算。
+    """
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        raise TariffError(f'电价文件不存在: {path}')
+    return _load_price_vector(str(path), mtime)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_price_vector(path, mtime):
+    values = []
+    with open(path, encoding='utf-8') as stream:
+        for line in stream:
+            cell = line.strip().split(',')[-1].strip()
+            if not cell:
+                continue
+            try:
+                values.append(float(cell))
+            except ValueError:
+                if values:
+                    raise TariffError(f'电价文件包含无效数值: {cell}')
+                # 首行表头
+    prices = np.array(values, dtype=float)
+    if prices.size and prices.mean() > 10:
+        prices = prices / 1000.0
+    prices.flags.writeable = False
+    return prices
+
+
+def dynamic_tariff_file():
+    """逐时电价文件路径（settings.SOLAR_DYNAMIC_TARIFF_FILE），未配置或文件不存在时返回 None"""
+    from django.conf import settings
+
+    path = getattr(settings, 'SOLAR_DYNAMIC_TARIFF_FILE', None)
+    if path and Path(path).is_file():
+        return Path(path)
+    return None
+
+
+def available_tariffs():
+    """当前可选的电价类型名称"""
+    names = [FlatTariff.name, TimeOfUseTariff.name]
+    if dynamic_tariff_file() is not None:
+        names.append(HourlyTariff.name)
+    return names
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_tariff(name, grid_price, feed_in_price, source):
+    if name == FlatTariff.name:
+        return FlatTariff(grid_price, feed_in_price)
+    if name == TimeOfUseTariff.name:
+        return TimeOfUseTariff.from_average(grid_price, feed_in_price)
+    if name == HourlyTariff.name:
+        return HourlyTariff.from_file(source[0], grid_price, feed_in_price)
+    raise TariffError(f'未知的电价类型: {name}')
+
+
+def tariff_source(name):
+    """电价类型依赖的外部数据：动态电价为 (价格文件路径, 修改时间)，其余为 None"""
+    if name != HourlyTariff.name:
+        return None
+    path = dynamic_tariff_file()
+    if path is None:
+        raise TariffError('未配置逐时电价文件')
+    return str(path), path.stat().st_mtime_ns
+
+
+def get_tariff(name, grid_price, feed_in_price):
+    """
+    按名称构造电价对象
+
+    结果按 (名称, 平均电价, 上网电价, 文件修改时间) 在进程内缓存，
+    价格矩阵只计算一次并在请求之间共享。
+    """
+    return _cached_tariff(name, float(grid_price), float(feed_in_price), tariff_source(name))
@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+import numpy as np
+from django.conf import settings
+from django.test import override_settings
+
+from solar_app import admission
+
+# 视图测试的请求都来自同一地址：使用本次运行独立的令牌桶文件并放宽容量，
+# 限流既不受上一次运行的影响，也不会因测试的先后顺序拒绝请求（令牌桶本身见 test_admission）
+_RATE_LIMIT_DIR = tempfile.TemporaryDirectory()
+admission.RATE_LIMIT_FILE = os.path.join(_RATE_LIMIT_DIR.name, 'ratelimit.bin')
+admission.RATE_LIMIT_BURST = 1e9
+
+# 测试中不运行 collectstatic，渲染页面的测试改用不需要清单文件的静态文件存储
+PLAIN_STATIC = override_settings(STORAGES=dict(settings.STORAGES, staticfiles={
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}))
+
+# 结果页特有的元素
+RESULTS_MARKER = 'id="compareConfigs"'
+
+
+def random_params(rng):
+    """随机的计算器参数（用电时段比例之和为 1）"""
+    fractions = rng.dirichlet(np.ones(3))
+    return {
+        'pv_capacity_kwp': rng.uniform(0, 15),
+        'battery_capacity_kwh': rng.choice([0.0, rng.uniform(0.5, 20)]),
+        'annual_consumption_kwh': rng.uniform(1000, 9000),
+        'cons_fraction_night': fractions[0],
+        'cons_fraction_morn_even': fractions[1],
+        'cons_fraction_midday': fractions[2],
+        'grid_price': 0.3,
+        'feed_in_price': 0.08,
+    }
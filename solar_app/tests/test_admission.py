@@ -0,0 +1,79 @@
+"""令牌桶的扣减与补充，以及限流所用的客户端标识"""
+import os
+import tempfile
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from solar_app import admission
+from solar_app.admission import TokenBucketTable
+
+RATE = 5.0
+BURST = 100.0
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'ratelimit.bin')
+        self.table = TokenBucketTable(self.path, RATE, BURST, slots=64)
+
+    def test_new_client_starts_with_full_bucket(self):
+        self.assertEqual(self.table.take('ip:1', BURST, now=1000.0), 0)
+        self.assertEqual(self.table.take('ip:1', 1, now=1000.0), 1 / RATE)
+
+    def test_rejection_reports_wait_and_does_not_deduct(self):
+        self.assertEqual(self.table.take('ip:1', 90, now=1000.0), 0)
+        # 剩 10 个令牌，请求 30 个需等待 20 / RATE 秒；被拒绝的请求不扣减
+        self.assertAlmostEqual(self.table.take('ip:1', 30, now=1000.0), 20 / RATE)
+        self.assertEqual(self.table.take('ip:1', 10, now=1000.0), 0)
+
+    def test_refill_is_capped_at_burst(self):
+        self.table.take('ip:1', BURST, now=1000.0)
+        self.assertAlmostEqual(self.table.take('ip:1', 11, now=1002.0), 1 / RATE)
+        self.assertEqual(self.table.take('ip:1', 10, now=1002.0), 0)
+        # 空闲很久后最多积累 BURST 个令牌
+        self.assertEqual(self.table.take('ip:1', BURST, now=9000.0), 0)
+        self.assertGreater(self.table.take('ip:1', 1, now=9000.0), 0)
+
+    def test_cost_above_burst_is_charged_as_burst(self):
+        self.assertEqual(self.table.take('ip:1', 10 * BURST, now=1000.0), 0)
+        self.assertAlmostEqual(self.table.take('ip:1', 10 * BURST, now=1000.0), BURST / RATE)
+
+    def test_clients_are_independent(self):
+        self.table.take('ip:1', BURST, now=1000.0)
+        self.assertGreater(self.table.take('ip:1', 1, now=1000.0), 0)
+        self.assertEqual(self.table.take('ip:2', BURST, now=1000.0), 0)
+
+    def test_tables_on_the_same_file_share_buckets(self):
+        # 每个工作进程各自打开同一文件
+        other = TokenBucketTable(self.path, RATE, BURST, slots=64)
+        self.table.take('key:a', 60, now=1000.0)
+        self.assertAlmostEqual(other.take('key:a', 60, now=1000.0), 20 / RATE)
+
+    def test_full_table_evicts_least_recently_used(self):
+        table = TokenBucketTable(self.path + '.small', RATE, BURST, slots=TokenBucketTable.PROBES)
+        for index in range(TokenBucketTable.PROBES):
+            table.take(f'ip:{index}', BURST, now=1000.0 + index)
+        # 新客户端覆盖最久未使用的槽位并以满桶开始，最近的客户端仍然被限流
+        self.assertEqual(table.take('ip:new', BURST, now=1010.0), 0)
+        last = f'ip:{TokenBucketTable.PROBES - 1}'
+        self.assertGreater(table.take(last, BURST, now=1010.0), 0)
+
+
+class ClientIdTests(SimpleTestCase):
+    def request(self, **extra):
+        return RequestFactory().get('/api/simulate/', REMOTE_ADDR='10.0.0.1', **extra)
+
+    def test_registered_key(self):
+        with mock.patch.object(admission, 'API_KEYS', frozenset({'secret'})):
+            self.assertEqual(admission.client_id(self.request(HTTP_X_API_KEY='secret')), 'key:secret')
+
+    def test_unregistered_key_falls_back_to_address(self):
+        with mock.patch.object(admission, 'API_KEYS', frozenset({'secret'})):
+            for key in ('random-1', 'random-2', ''):
+                with self.subTest(key=key):
+                    self.assertEqual(admission.client_id(self.request(HTTP_X_API_KEY=key)),
+                                     'ip:10.0.0.1')
+        self.assertEqual(admission.client_id(self.request()), 'ip:10.0.0.1')
@@ -0,0 +1,52 @@
+"""GET 模拟API 的 ETag 与条件请求"""
+import os
+import tempfile
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.test import SimpleTestCase, override_settings
+
+from solar_app import caching, pipeline, schema
+from solar_app.batch import FIELD_DEFAULTS
+
+
+class SimulateApiEtagTests(SimpleTestCase):
+    def url(self, **changes):
+        return '/api/simulate/?' + urlencode(dict(FIELD_DEFAULTS, **changes))
+
+    def test_not_modified(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('public', response['Cache-Control'])
+
+        with mock.patch.object(pipeline, 'calculate') as calculate:
+            cached = self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+        calculate.assert_not_called()
+
+    def test_etag_follows_parameters(self):
+        etag = self.client.get(self.url())['ETag']
+        changed = self.client.get(self.url(pv_capacity_kwp=6.0), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_invalid_parameters(self):
+        response = self.client.get(self.url(pct_midday=20))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+        self.assertNotIn('ETag', response)
+
+    def test_price_file_update_changes_keys(self):
+        params = dict(schema.validate(FIELD_DEFAULTS)[0], tariff='dynamic')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'prices.csv')
+            with open(path, 'w') as stream:
+                stream.write('0.3\n' * 8760)
+            with override_settings(SOLAR_DYNAMIC_TARIFF_FILE=path):
+                before = caching.result_cache_key(params), caching.result_etag(params)
+                os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+                after = caching.result_cache_key(params), caching.result_etag(params)
+        self.assertNotEqual(before[0], after[0])
+        self.assertNotEqual(before[1], after[1])
@@ -0,0 +1,99 @@
+"""离线批量模拟的检查点：中断后 --resume 的输出与一次完成的运行逐字节相同"""
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from solar_app.batch import FIELD_DEFAULTS, OUTPUT_FORMATS
+from solar_app.management.commands import simulate_batch
+
+ROWS = 50
+CHUNK_SIZE = 8
+
+
+def scenarios():
+    for index in range(ROWS):
+        row = dict(FIELD_DEFAULTS, pv_capacity_kwp=2 + index % 9,
+                   battery_capacity_kwh=index % 4 * 5,
+                   tariff=('flat', 'tou')[index % 2])
+        if index % 13 == 5:
+            row['pv_capacity_kwp'] = -1  # 无效行也要原样出现在输出中
+        yield row
+
+
+INVALID_ROWS = sum(1 for row in scenarios() if row['pv_capacity_kwp'] < 0)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class ResumeTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.input = os.path.join(self.directory, 'input.jsonl')
+        with open(self.input, 'w', encoding='utf-8') as stream:
+            stream.writelines(json.dumps(row) + '\n' for row in scenarios())
+
+    def run_command(self, output, output_format, **options):
+        # 命令把报告写到 sys.stdout，输出到标准输出时使用其 buffer
+        report = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+        with redirect_stdout(report):
+            call_command('simulate_batch', self.input, output=output, format=output_format,
+                         chunk_size=CHUNK_SIZE, **options)
+        report.seek(0)
+        return json.loads(report.read())
+
+    def interrupt_after(self, chunks):
+        """让第 chunks + 1 个块的计算失败，模拟运行中途被终止"""
+        original = simulate_batch.simulate_records
+        done = []
+
+        def simulate(records):
+            if len(done) == chunks:
+                raise Interrupted
+            done.append(records)
+            return original(records)
+
+        return mock.patch.object(simulate_batch, 'simulate_records', simulate)
+
+    def read(self, path):
+        with open(path, 'rb') as stream:
+            return stream.read()
+
+    def test_resume_matches_uninterrupted_run(self):
+        for output_format in OUTPUT_FORMATS:
+            with self.subTest(format=output_format):
+                reference = os.path.join(self.directory, f'reference.{output_format}')
+                report = self.run_command(reference, output_format)
+                self.assertEqual(report['total_rows'], ROWS)
+                self.assertEqual(report['invalid_rows'], INVALID_ROWS)
+
+                target = os.path.join(self.directory, f'resumed.{output_format}')
+                with self.interrupt_after(3), self.assertRaises(Interrupted):
+                    self.run_command(target, output_format)
+                self.assertTrue(os.path.exists(f'{target}.checkpoint'))
+                # 终止时可能已写出部分未记入检查点的数据
+                with open(target, 'ab') as stream:
+                    stream.write(b'partial row')
+
+                report = self.run_command(target, output_format, resume=True)
+                self.assertEqual(report['resumed_from_row'], 3 * CHUNK_SIZE)
+                self.assertEqual(report['rows'], ROWS - 3 * CHUNK_SIZE)
+                self.assertEqual(report['invalid_rows'], INVALID_ROWS)
+                self.assertEqual(self.read(target), self.read(reference))
+                self.assertFalse(os.path.exists(f'{target}.checkpoint'))
+
+    def test_resume_rejects_changed_format(self):
+        target = os.path.join(self.directory, 'out.jsonl')
+        with self.interrupt_after(1), self.assertRaises(Interrupted):
+            self.run_command(target, 'jsonl')
+        with self.assertRaises(simulate_batch.CommandError):
+            self.run_command(target, 'csv', resume=True)
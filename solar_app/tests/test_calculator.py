@@ -0,0 +1,42 @@
+"""向量化月度模拟与逐月模拟一致"""
+import numpy as np
+from django.test import SimpleTestCase
+
+from solar_app.solar_calculator import SolarCalculator
+from solar_app.tests import random_params
+
+
+class SimulateBatchTests(SimpleTestCase):
+    def test_matches_simulate_month(self):
+        calculator = SolarCalculator()
+        rng = np.random.default_rng(26)
+        scenarios = [random_params(rng) for _ in range(40)]
+        flows = calculator.energy_flows({key: np.array([scenario[key] for scenario in scenarios])
+                                         for key in SolarCalculator.PARAM_KEYS})
+
+        for row, params in enumerate(scenarios):
+            consumption = params['annual_consumption_kwh'] * calculator.seasonal_factors
+            generation = params['pv_capacity_kwp'] * calculator.monthly_kwh_per_kwp
+            for month in range(12):
+                no_batt, with_batt = calculator.simulate_month(
+                    generation[month],
+                    consumption[month] * params['cons_fraction_midday'],
+                    consumption[month] * params['cons_fraction_morn_even'],
+                    consumption[month] * params['cons_fraction_night'],
+                    params['battery_capacity_kwh'],
+                    SolarCalculator.DAYS_IN_MONTH[month],
+                )
+                for scenario, expected in (('no_batt', no_batt), ('with_batt', with_batt)):
+                    for field, key in (('self_use', 'self_use'), ('export', 'export'),
+                                       ('grid', 'grid_purchase')):
+                        self.assertAlmostEqual(flows[f'{field}_{scenario}'][row, month],
+                                               expected[key], places=9)
+
+    def test_window_flows_sum_to_monthly(self):
+        calculator = SolarCalculator()
+        params = random_params(np.random.default_rng(3))
+        flows = calculator.energy_flows(params)
+        np.testing.assert_allclose(flows['consumption_by_window'].sum(axis=-1), flows['consumption'])
+        np.testing.assert_allclose(flows['grid_no_batt_by_window'].sum(axis=-1), flows['grid_no_batt'])
+        np.testing.assert_allclose(flows['grid_with_batt_by_window'].sum(axis=-1),
+                                   flows['grid_with_batt'])
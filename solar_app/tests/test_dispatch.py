@@ -0,0 +1,77 @@
+"""价格感知的最优储能调度"""
+import numpy as np
+from django.test import SimpleTestCase
+
+from solar_app import dispatch, tariffs
+from solar_app.solar_calculator import SolarCalculator
+from solar_app.solar_geometry import HOURS_PER_YEAR
+from solar_app.tests import random_params
+
+
+def hourly_greedy_cost(generation, load, prices, feed_in_price, capacity,
+                       c_rate=dispatch.DEFAULT_C_RATE):
+    """
+    逐时贪心调度的年度电费：光伏余电充电、缺口放电，与最优调度相同的容量、功率与按天分解约束
+    """
+    net = dispatch._to_days((load - generation)[np.newaxis], 1)[0]
+    prices = dispatch._to_days(prices[np.newaxis], 1)[0]
+    soc = np.zeros(len(net))
+    cost = 0.0
+    for hour in range(net.shape[1]):
+        surplus = np.maximum(-net[:, hour], 0)
+        deficit = np.maximum(net[:, hour], 0)
+        charge = np.minimum.reduce([surplus, capacity - soc, np.full_like(soc, capacity * c_rate)])
+        discharge = np.minimum.reduce([deficit, soc, np.full_like(soc, capacity * c_rate)])
+        soc += charge - discharge
+        cost += ((deficit - discharge) * prices[:, hour]).sum() - \
+            (surplus - charge).sum() * feed_in_price
+    return cost
+
+
+class OptimalDispatchTests(SimpleTestCase):
+    def test_never_costs_more_than_greedy(self):
+        calculator = SolarCalculator()
+        rng = np.random.default_rng(34)
+        hours = np.arange(HOURS_PER_YEAR)
+        for _ in range(4):
+            params = random_params(rng)
+            params['battery_capacity_kwh'] = rng.uniform(2, 15)
+            prices = np.clip(0.3 + 0.15 * np.sin(hours * 2 * np.pi / 24) +
+                             rng.normal(0, 0.05, hours.size), 0.01, None)
+            tariff = tariffs.HourlyTariff(prices, params['feed_in_price'])
+            flows = calculator.energy_flows(params)
+            schedule, _, costs = calculator.optimal_dispatch(params, tariff, flows)
+            optimal = float(schedule['cost'][0])
+
+            greedy_monthly = float(calculator.price_flows(flows, params, tariff)['cost_with_batt'][0])
+            greedy_hourly = hourly_greedy_cost(
+                calculator.hourly_generation(params['pv_capacity_kwp']),
+                dispatch.hourly_load(flows['consumption_by_window'])[0],
+                prices, params['feed_in_price'], params['battery_capacity_kwh'])
+            with self.subTest(params=params):
+                self.assertLessEqual(optimal, greedy_monthly + 1e-6)
+                self.assertLessEqual(optimal, greedy_hourly + 1e-6)
+                self.assertAlmostEqual(float(costs['cost_with_batt'][0]), optimal)
+
+    def test_results_never_worse_than_greedy(self):
+        # 固定与分时电价下逐时模型（功率受限）常不如月度贪心模型；最优调度的结果不能比贪心差
+        calculator = SolarCalculator()
+        rng = np.random.default_rng(30)
+        for tariff in (tariffs.FlatTariff.name, tariffs.TimeOfUseTariff.name):
+            for _ in range(10):
+                params = dict(random_params(rng), tariff=tariff,
+                              battery_capacity_kwh=rng.uniform(2, 15))
+                greedy = calculator.calculate(dict(params, battery_dispatch='greedy'))
+                optimal = calculator.calculate(dict(params, battery_dispatch='optimal'))
+                with self.subTest(tariff=tariff, params=params):
+                    self.assertLessEqual(optimal.cost_with_batt, greedy.cost_with_batt + 1e-6)
+                    self.assertGreaterEqual(optimal.savings_with_batt,
+                                            greedy.savings_with_batt - 1e-6)
+
+    def test_schedule_respects_battery_limits(self):
+        calculator = SolarCalculator()
+        params = dict(random_params(np.random.default_rng(5)), battery_capacity_kwh=8.0)
+        schedule, _, _ = calculator.optimal_dispatch(params)
+        self.assertGreaterEqual(schedule['soc'].min(), -1e-9)
+        self.assertLessEqual(schedule['soc'].max(), 8.0 + 1e-9)
+        self.assertLessEqual(np.abs(schedule['battery']).max(), 8.0 * dispatch.DEFAULT_C_RATE + 1e-9)
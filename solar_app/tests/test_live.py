@@ -0,0 +1,30 @@
+"""首页实时预览接口"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase
+
+from solar_app import admission
+from solar_app.solar_calculator import SolarCalculator
+
+
+class LivePreviewTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_optimal_dispatch_previews_greedy(self):
+        greedy = self.client.get('/api/live/', {'battery_dispatch': 'greedy'})
+        with mock.patch.object(SolarCalculator, 'optimal_dispatch') as optimal_dispatch:
+            optimal = self.client.get('/api/live/', {'battery_dispatch': 'optimal', 'tariff': 'tou'})
+        optimal_dispatch.assert_not_called()
+        self.assertEqual(optimal.status_code, 200)
+        self.assertTrue(greedy.json()['success'])
+
+    def test_costs_one_unit(self):
+        request = RequestFactory().get('/api/live/', {'battery_dispatch': 'optimal'})
+        self.assertEqual(admission.REQUEST_COSTS['api_live'](request), 1)
+
+    def test_invalid_parameters(self):
+        response = self.client.get('/api/live/', {'pct_midday': 20})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
@@ -0,0 +1,40 @@
+"""蒙特卡洛进度流（Server-Sent Events）"""
+import json
+from urllib.parse import urlencode
+
+from django.test import SimpleTestCase
+
+from solar_app.batch import FIELD_DEFAULTS
+
+
+def parse_events(body):
+    events = []
+    for message in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class MonteCarloStreamTests(SimpleTestCase):
+    def url(self, **extra):
+        return '/api/montecarlo/?' + urlencode(dict(FIELD_DEFAULTS, **extra))
+
+    def test_streams_progress_then_result(self):
+        response = self.client.get(self.url(samples=3000, seed=1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        events = parse_events(b''.join(response.streaming_content).decode())
+        self.assertEqual([name for name, _ in events[:-1]], ['progress'] * (len(events) - 1))
+        self.assertEqual(events[-1][0], 'result')
+        self.assertEqual(events[-1][1], events[-2][1])
+
+    def test_same_seed_same_result(self):
+        first, second = (parse_events(b''.join(
+            self.client.get(self.url(samples=2000, seed=7)).streaming_content).decode())[-1]
+            for _ in range(2))
+        self.assertEqual(first, second)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url(pct_midday=20)).status_code, 400)
+        self.assertEqual(self.client.get(self.url(samples='many')).status_code, 400)
@@ -0,0 +1,63 @@
+"""整页缓存中的 CSRF 令牌按访客替换"""
+import re
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, RequestFactory, SimpleTestCase
+
+from solar_app import caching
+from solar_app.batch import FIELD_DEFAULTS
+from solar_app.caching import CSRF_PLACEHOLDER
+from solar_app.tests import PLAIN_STATIC, RESULTS_MARKER
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+@PLAIN_STATIC
+class CachedPageCsrfTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def submit(self, client):
+        page = client.get('/').content.decode()
+        self.assertNotIn(CSRF_PLACEHOLDER, page)
+        token = CSRF_INPUT.search(page).group(1)
+        return client.post('/simulate/', dict(FIELD_DEFAULTS, csrfmiddlewaretoken=token))
+
+    def test_each_visitor_gets_a_valid_token(self):
+        first, second = Client(enforce_csrf_checks=True), Client(enforce_csrf_checks=True)
+        # 第二个访客命中整页缓存，页面中的令牌必须替换为其自己的令牌
+        for client in (first, second):
+            response = self.submit(client)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, RESULTS_MARKER)
+        self.assertNotEqual(first.cookies[settings.CSRF_COOKIE_NAME].value,
+                            second.cookies[settings.CSRF_COOKIE_NAME].value)
+
+    def test_rejects_missing_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.get('/')
+        self.assertEqual(client.post('/simulate/', FIELD_DEFAULTS).status_code, 403)
+
+
+@PLAIN_STATIC
+class PageCacheKeyTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_query_strings_share_one_entry(self):
+        with mock.patch.object(caching, 'render_to_string', wraps=caching.render_to_string) as render:
+            pages = [self.client.get(path).content.decode()
+                     for path in ('/', '/?x=1', '/?x=2&utm_source=mail')]
+        render.assert_called_once()
+        # 语言切换后的跳转地址不包含其他访客的查询字符串
+        for page in pages:
+            self.assertIn('name="next" type="hidden" value="/"', page)
+            self.assertNotIn('utm_source', page)
+
+    def test_allowed_parameters_are_part_of_the_key(self):
+        request = RequestFactory().get('/', {'b': '2', 'a': '1', 'junk': 'x'})
+        self.assertEqual(caching.page_path(request), '/')
+        self.assertEqual(caching.page_path(request, ('b', 'a')), '/?a=1&b=2')
+
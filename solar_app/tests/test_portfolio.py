@@ -0,0 +1,24 @@
+"""组合模式的分块读取"""
+import io
+
+from django.test import SimpleTestCase
+
+from solar_app.portfolio import read_chunks
+
+CSV = 'household_id,annual_consumption_kwh,pv_capacity_kwp\n' + ''.join(
+    f'{"h%d" % index if index % 3 == 0 else ""},{3000 + index},5\n' for index in range(7))
+
+
+class ReadChunksTests(SimpleTestCase):
+    def test_fallback_ids_follow_input_rows(self):
+        # 没有户号的行以输入中的序号为户号，跨块不重新从 0 开始
+        ids = [household for chunk_ids, _ in read_chunks(io.StringIO(CSV), 'csv', chunk_size=2)
+               for household in chunk_ids]
+        self.assertEqual(ids, ['h0', '1', '2', 'h3', '4', '5', 'h6'])
+
+    def test_chunks_keep_row_order(self):
+        chunks = list(read_chunks(io.StringIO(CSV), 'csv', chunk_size=3))
+        self.assertEqual([len(ids) for ids, _ in chunks], [3, 3, 1])
+        self.assertEqual([value for _, columns in chunks
+                          for value in columns['annual_consumption_kwh']],
+                         [3000.0 + index for index in range(7)])
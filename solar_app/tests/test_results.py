@@ -0,0 +1,30 @@
+"""紧凑结果表示的序列化"""
+import pickle
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from solar_app import pipeline, schema
+from solar_app.batch import FIELD_DEFAULTS
+from solar_app.solar_calculator import SolarCalculator
+
+
+class SimulationResultPickleTests(SimpleTestCase):
+    def setUp(self):
+        self.params = schema.validate(FIELD_DEFAULTS)[0]
+
+    def test_round_trip(self):
+        result = pipeline.calculate(self.params)
+        restored = pickle.loads(pickle.dumps(result))
+        np.testing.assert_array_equal(restored.values, result.values)
+        self.assertEqual(restored.as_json(), result.as_json())
+        self.assertFalse(restored.values.flags.writeable)
+
+    def test_size(self):
+        # 与 results.py 和 README 中给出的体积一致
+        plain = SolarCalculator().calculate(self.params)
+        self.assertIsNone(plain.sensitivities)
+        self.assertLess(len(pickle.dumps(plain)), 1000)
+        cached = pipeline.calculate(self.params)
+        self.assertIsNotNone(cached.sensitivities)
+        self.assertLess(len(pickle.dumps(cached)), 1500)
@@ -0,0 +1,75 @@
+"""schema 快速校验与 SolarSimulationForm 的规则、结果和错误代码一致"""
+from django.test import SimpleTestCase
+
+from solar_app import schema
+from solar_app.batch import FIELD_DEFAULTS
+from solar_app.forms import SolarSimulationForm
+
+
+# 相对于表单初始值的修改；覆盖必填、数值解析、整数、范围、选项与百分比总和规则
+CASES = [
+    {},
+    {'pct_midday': 20},
+    {'pv_capacity_kwp': -1},
+    {'pv_capacity_kwp': 'abc'},
+    {'annual_consumption_kwh': '4000.5'},
+    {'annual_consumption_kwh': ''},
+    {'grid_price': ''},
+    {'pct_night': 101, 'pct_morning_evening': 0, 'pct_midday': 0},
+    {'pct_night': 'x', 'pct_morning_evening': 90},
+    {'tariff': 'unknown'},
+    {'tariff': '', 'battery_dispatch': ''},
+    {'tariff': 'tou', 'battery_dispatch': 'optimal'},
+    {'ev_annual_km': 12000, 'ev_charging_window': 'midday', 'home_office_days': 3},
+    {'ev_annual_km': 12000, 'ev_charging_window': ''},
+    {'home_office_days': 8},
+    {'heat_pump_kwh': '-5'},
+]
+
+
+def as_post(case):
+    """按表单提交的形式（全部为字符串）组装一条输入"""
+    data = dict(FIELD_DEFAULTS, **case)
+    return {name: '' if value is None else str(value) for name, value in data.items()}
+
+
+def error_codes(errors):
+    return {(field, error.code) for field, items in errors.as_data().items() for error in items}
+
+
+class ValidateTests(SimpleTestCase):
+    def test_matches_form(self):
+        for case in CASES:
+            data = as_post(case)
+            with self.subTest(case=case):
+                form = SolarSimulationForm(data)
+                params, errors = schema.validate(data)
+                if form.is_valid():
+                    self.assertIsNone(errors)
+                    self.assertEqual(params, form.get_calculation_params())
+                else:
+                    self.assertIsNone(params)
+                    self.assertEqual(errors.get_json_data(), form.errors.get_json_data())
+
+    def test_accepts_json_numbers(self):
+        params, errors = schema.validate(dict(FIELD_DEFAULTS))
+        self.assertIsNone(errors)
+        self.assertEqual(params, SolarSimulationForm(as_post({})).get_calculation_params())
+
+
+class ValidateColumnsTests(SimpleTestCase):
+    def test_rows_match_form(self):
+        rows = [as_post(case) for case in CASES]
+        checked = schema.validate_columns({name: [row[name] for row in rows]
+                                           for name in SolarSimulationForm.base_fields})
+        codes = [set() for _ in rows]
+        for field, by_code in checked.errors.items():
+            for code, indices in by_code.items():
+                for index in indices:
+                    codes[index].add((field, code))
+
+        for index, (case, row) in enumerate(zip(CASES, rows)):
+            with self.subTest(case=case):
+                form = SolarSimulationForm(row)
+                self.assertEqual(bool(checked.valid[index]), form.is_valid())
+                self.assertEqual(codes[index], set() if form.is_valid() else error_codes(form.errors))
@@ -0,0 +1,73 @@
+"""解析梯度与有限差分一致"""
+import numpy as np
+from django.test import SimpleTestCase
+
+from solar_app import sensitivity, tariffs
+from solar_app.solar_calculator import SolarCalculator
+
+
+# 远离分段线性模型折点的方案：电池在部分月份充满、部分月份受余电限制
+PARAMS = {
+    'pv_capacity_kwp': 6.3,
+    'battery_capacity_kwh': 4.7,
+    'annual_consumption_kwh': 4300.0,
+    'cons_fraction_night': 0.32,
+    'cons_fraction_morn_even': 0.41,
+    'cons_fraction_midday': 0.27,
+    'grid_price': 0.31,
+    'feed_in_price': 0.082,
+    'battery_cost': 6000,
+}
+STEP = 1e-5
+
+
+class SavingsGradientTests(SimpleTestCase):
+    def setUp(self):
+        self.calculator = SolarCalculator()
+
+    def savings(self, params, tariff_factory):
+        flows = self.calculator.energy_flows(params)
+        tariff = tariff_factory(params)
+        costs = self.calculator.price_flows(flows, params, tariff)
+        return {name: float(costs[name][0]) for name in ('savings_no_batt', 'savings_with_batt')}
+
+    def central_difference(self, tariff_factory, direction):
+        """沿 direction（{参数: 变化率}）的中心差分"""
+        def shifted(sign):
+            return dict(PARAMS, **{key: PARAMS[key] + sign * STEP * rate
+                                   for key, rate in direction.items()})
+        upper, lower = self.savings(shifted(1), tariff_factory), self.savings(shifted(-1), tariff_factory)
+        return {name: (upper[name] - lower[name]) / (2 * STEP) for name in upper}
+
+    def check(self, tariff_factory):
+        flows = self.calculator.energy_flows(PARAMS)
+        gradients = sensitivity.savings_gradients(self.calculator, PARAMS, flows,
+                                                  tariff_factory(PARAMS))
+        for key in ('pv_capacity_kwp', 'battery_capacity_kwh', 'annual_consumption_kwh',
+                    'grid_price', 'feed_in_price'):
+            expected = self.central_difference(tariff_factory, {key: 1.0})
+            for name, value in expected.items():
+                with self.subTest(key=key, output=name):
+                    self.assertAlmostEqual(gradients[name][key], value, delta=1e-4 * (1 + abs(value)))
+
+        # 用电比例：其余两个时段按现有比例同步减少，年用电量不变
+        fractions = sensitivity.FRACTION_KEYS
+        for key in fractions:
+            rest = 1 - PARAMS[key]
+            direction = {other: -PARAMS[other] / rest for other in fractions if other != key}
+            direction[key] = 1.0
+            expected = self.central_difference(tariff_factory, direction)
+            for name, value in expected.items():
+                with self.subTest(key=key, output=name):
+                    self.assertAlmostEqual(gradients[name][key], value, delta=1e-4 * (1 + abs(value)))
+        return gradients
+
+    def test_flat_tariff(self):
+        gradients = self.check(lambda params: None)
+        extra = self.savings(PARAMS, lambda params: None)
+        extra = extra['savings_with_batt'] - extra['savings_no_batt']
+        self.assertAlmostEqual(gradients['payback_years']['battery_cost'], 1 / extra)
+
+    def test_time_of_use_tariff(self):
+        self.check(lambda params: tariffs.TimeOfUseTariff.from_average(params['grid_price'],
+                                                                       params['feed_in_price']))
@@ -0,0 +1,50 @@
+"""紧凑会话载荷的编码与解码，以及签名 Cookie 中模拟状态的恢复"""
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from solar_app import session_state
+from solar_app.batch import FIELD_DEFAULTS
+from solar_app.forms import SolarSimulationForm
+from solar_app.tests import PLAIN_STATIC, RESULTS_MARKER
+
+
+class StateTokenTests(SimpleTestCase):
+    def setUp(self):
+        form = SolarSimulationForm(FIELD_DEFAULTS)
+        self.assertTrue(form.is_valid())
+        self.data = form.cleaned_data
+
+    def test_round_trip(self):
+        token = session_state.dump_state(self.data, 'result:abc')
+        data, result_key = session_state.load_state(token)
+        self.assertEqual(result_key, 'result:abc')
+        self.assertEqual(data, {name: self.data[name] for name in session_state.STATE_FIELDS})
+        self.assertTrue(SolarSimulationForm(data).is_valid())
+
+    def test_rejects_other_versions(self):
+        token = session_state.dump_state(self.data, 'result:abc')
+        _, _, packed = token.partition('.')
+        self.assertIsNone(session_state.load_state(f'v{session_state.STATE_VERSION - 1}.{packed}'))
+
+    def test_rejects_corrupt_tokens(self):
+        token = session_state.dump_state(self.data, 'result:abc')
+        for value in (None, '', 'garbage', token[:-4], token + '!!'):
+            with self.subTest(value=value):
+                self.assertIsNone(session_state.load_state(value))
+
+
+@PLAIN_STATIC
+class SessionCookieTests(SimpleTestCase):
+    def test_language_switch_restores_results(self):
+        self.assertContains(self.client.post('/simulate/', FIELD_DEFAULTS), RESULTS_MARKER)
+        self.assertContains(self.client.get('/simulate/'), RESULTS_MARKER)
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.post('/simulate/', FIELD_DEFAULTS)
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME]
+        value = cookie.value
+        tampered = value[:-2] + ('AA' if value[-2:] != 'AA' else 'BB')
+        cookie.set(cookie.key, tampered, tampered)
+        response = self.client.get('/simulate/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, RESULTS_MARKER)
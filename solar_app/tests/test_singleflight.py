@@ -0,0 +1,105 @@
+"""相同计算的合并执行：进程内与经锁文件目录的跨实例合并、超时与出错重试"""
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+
+from solar_app.singleflight import SingleFlight
+
+
+class Counter:
+    """记录调用次数的计算；可让调用阻塞到 release 被设置"""
+
+    def __init__(self, result='result', block=False):
+        self.result = result
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return self.result
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = os.path.join(directory.name, 'singleflight')
+
+    def group(self, timeout=5.0):
+        return SingleFlight(self.directory, timeout=timeout, result_ttl=30.0)
+
+    def test_concurrent_calls_compute_once(self):
+        group, compute = self.group(), Counter(block=True)
+        with ThreadPoolExecutor(50) as pool:
+            leader = pool.submit(group.do, 'key', compute)
+            compute.started.wait(5)
+            followers = [pool.submit(group.do, 'key', compute) for _ in range(49)]
+            compute.release.set()
+            results = [leader.result()] + [future.result() for future in followers]
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(results, ['result'] * 50)
+
+    def test_different_keys_do_not_coalesce(self):
+        group, compute = self.group(), Counter()
+        group.do('a', compute)
+        group.do('b', compute)
+        self.assertEqual(compute.calls, 2)
+
+    def test_instances_share_results_through_directory(self):
+        # 两个实例相当于两个工作进程：第二个读取第一个写出的结果文件
+        compute = Counter(result={'rows': [1, 2, 3]})
+        self.assertEqual(self.group().do('key', compute), {'rows': [1, 2, 3]})
+        self.assertEqual(self.group().do('key', compute), {'rows': [1, 2, 3]})
+        self.assertEqual(compute.calls, 1)
+
+    def test_stuck_leader_times_out(self):
+        group, stuck = self.group(timeout=0.1), Counter('stuck', block=True)
+        with ThreadPoolExecutor(2) as pool:
+            leader = pool.submit(group.do, 'key', stuck)
+            stuck.started.wait(5)
+            started = time.monotonic()
+            self.assertEqual(group.do('key', Counter('own')), 'own')
+            self.assertLess(time.monotonic() - started, 2)
+            stuck.release.set()
+            self.assertEqual(leader.result(), 'stuck')
+
+    def test_followers_retry_after_leader_error(self):
+        group, release = self.group(), threading.Event()
+
+        def failing():
+            release.wait(5)
+            raise RuntimeError('boom')
+
+        retry = Counter()
+        with ThreadPoolExecutor(2) as pool:
+            leader = pool.submit(group.do, 'key', failing)
+            while not group._calls:
+                time.sleep(0.001)
+            follower = pool.submit(group.do, 'key', retry)
+            time.sleep(0.05)
+            release.set()
+            with self.assertRaises(RuntimeError):
+                leader.result()
+            self.assertEqual(follower.result(), 'result')
+        self.assertEqual(retry.calls, 1)
+
+    def test_insecure_directory_is_not_used(self):
+        os.makedirs(self.directory)
+        os.chmod(self.directory, 0o755)
+        compute = Counter()
+        with self.assertLogs('solar_app.singleflight', 'WARNING'):
+            self.group().do('key', compute)
+            self.group().do('key', compute)
+        self.assertEqual(compute.calls, 2)
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,51 @@
+"""区域地图瓦片的分组与构建目录的发布和清理"""
+import os
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from solar_app.yield_map import TILE_FIELDS, TileWriter, YieldMapStore
+
+
+def locations(latitude, longitude):
+    matrix = np.zeros((len(latitude), len(TILE_FIELDS)))
+    matrix[:, 0], matrix[:, 1] = latitude, longitude
+    matrix[:, 2] = np.arange(len(latitude))
+    return [f'loc{index}' for index in range(len(latitude))], matrix
+
+
+class TileWriterTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_small_tiles_keep_locations_apart(self):
+        # 0.0001° 瓦片时列索引超过 100000：(525200, 134015) 与 (525201, 34015) 两个瓦片
+        # 不能合并，地点须写入各自的瓦片
+        writer = TileWriter(self.directory, degrees=1e-4)
+        ids, matrix = locations([52.52005, 52.52015, 48.13715], [13.40155, 3.40155, 11.57555])
+        writer.add(ids, matrix)
+        manifest = writer.publish({})
+        self.assertEqual(manifest['locations'], 3)
+        self.assertEqual(len(manifest['tiles']), 3)
+
+        store = YieldMapStore(self.directory)
+        for index, (latitude, longitude) in enumerate(matrix[:, :2]):
+            with self.subTest(location=ids[index]):
+                # 瓦片中的坐标为 float32，按包含该点的小矩形查询
+                found, _ = store.region(latitude - 4e-5, longitude - 4e-5,
+                                        latitude + 4e-5, longitude + 4e-5)
+                self.assertEqual(list(found), [ids[index]])
+
+    def test_publish_only_prunes_builds(self):
+        # 输出目录中的其他子目录不是构建，不能被当作上一个构建或被删除
+        for name in ('20240101000000-1', '20240102000000-1', 'solar_app', 'zz'):
+            os.makedirs(os.path.join(self.directory, name))
+        writer = TileWriter(self.directory)
+        writer.add(*locations([52.5], [13.4]))
+        build = writer.publish({})['build']
+        remaining = sorted(name for name in os.listdir(self.directory)
+                           if os.path.isdir(os.path.join(self.directory, name)))
+        self.assertEqual(remaining, sorted([build, '20240102000000-1', 'solar_app', 'zz']))
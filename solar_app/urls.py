@@ -1,7 +1,7 @@
 """
 URL configuration for solar_app
 """
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 app_name = 'solar_app'
@@ -10,6 +10,17 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('simulate/', views.simulate, name='simulate'),
     path('api/simulate/', views.api_simulate, name='api_simulate'),
+    path('api/sensitivity/', views.api_sensitivity, name='api_sensitivity'),
+    path('api/live/', views.api_live, name='api_live'),
+    path('api/compare/', views.api_compare, name='api_compare'),
+    path('api/montecarlo/', views.api_montecarlo, name='api_montecarlo'),
+    path('api/portfolio/', views.api_portfolio, name='api_portfolio'),
+    path('api/yield-map/', views.api_yield_map, name='api_yield_map'),
+    re_path(r'^export/monthly\.(?P<fmt>csv|npz|bin)$', views.export_monthly, name='export_monthly'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:name>', views.profile_download, name='profile_download'),
+    path('healthz/ready', views.healthz_ready, name='healthz_ready'),
+    re_path(r'^export/batch\.(?P<fmt>csv|npz|bin)$', views.export_batch, name='export_batch'),
 ]
 
 
@@ -3,22 +3,48 @@ Django Views for Solar Simulation App
 处理用户请求和页面渲染的视图函数
 """
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse,
+)
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext
+import hashlib
+import io
 import json
 
-from .forms import SolarSimulationForm
+import numpy as np
+
+from . import (
+    batch, comparison, exports, load_profiles, montecarlo, pipeline, profiling, schema, sensitivity,
+    warmup, yield_map,
+)
+from .caching import (
+    API_CACHE_MAX_AGE, PAGE_CACHE_TIMEOUT, cached_calculation, render_cached_page, result_digest,
+    result_etag, template_version,
+)
+from .forms import DISPATCH_CHOICES, TARIFF_CHOICES, SolarSimulationForm
+from .labels import MONTH_NAMES
+from .portfolio import (
+    PortfolioAggregate, PortfolioError, iter_results_csv, read_chunks, run_portfolio,
+)
+from .session_state import load_simulation, save_simulation
 from .solar_calculator import SolarCalculator
 
 
 def index(request):
-    """主页视图 - 显示太阳能模拟表单"""
+    """主页视图 - 显示太阳能模拟表单（按语言缓存整页）"""
     form = SolarSimulationForm()
     context = {
         'form': form,
+        'live_defaults': live_defaults(),
         'title': '🏠 德国家庭太阳能光伏模拟'
     }
-    return render(request, 'solar_app/index.html', context)
+    return render_cached_page(request, 'index', 'solar_app/index.html', context)
 
 
 def simulate(request):
@@ -27,101 +53,98 @@ def simulate(request):
         form = SolarSimulationForm(request.POST)
         
         if form.is_valid():
-            # 获取计算参数
-            params = form.get_calculation_params()
-            # 将表单原始数据存入 session，便于语言切换后恢复
-            request.session['last_form_data'] = request.POST.dict()
-            
-            # 执行计算
-            calculator = SolarCalculator()
-            results = calculator.calculate(params)
-            
-            # 准备图表数据
-            chart_data = prepare_chart_data(results)
-            
-            # 计算储能投资分析
-            extra_savings = results['savings_with_batt'] - results['savings_no_batt']
-            payback_years = None
-            if extra_savings > 0:
-                payback_years = params['battery_cost'] / extra_savings
-            
-            context = {
-                'form': form,
-                'results': results,
-                'chart_data': chart_data,
-                'params': params,
-                'extra_savings': extra_savings,
-                'payback_years': payback_years,
-                'title': '🏠 德国家庭太阳能光伏模拟 - 计算结果'
-            }
-            # 也缓存结果页所需的上下文（轻量字段）
-            request.session['last_results'] = {
-                'results': {
-                    'monthly_data': results['monthly_data'],
-                    'baseline_cost': results['baseline_cost'],
-                    'cost_no_batt': results['cost_no_batt'],
-                    'cost_with_batt': results['cost_with_batt'],
-                    'savings_no_batt': results['savings_no_batt'],
-                    'savings_with_batt': results['savings_with_batt'],
-                },
-                'params': params,
-            }
-
-            return render(request, 'solar_app/results.html', context)
+            return render_results(request, form, save_state=True)
         else:
             # 表单验证失败，返回带错误信息的表单
             context = {
                 'form': form,
+                'live_defaults': live_defaults(),
                 'title': '🏠 德国家庭太阳能光伏模拟'
             }
             return render(request, 'solar_app/index.html', context)
     
-    # GET: 如果存在上一次的session数据，使用其重算/恢复结果页，实现语言切换保留状态
-    last_form_data = request.session.get('last_form_data')
-    if last_form_data:
-        form = SolarSimulationForm(last_form_data)
+    # GET: 如果存在上一次的session数据，使用其恢复结果页，实现语言切换保留状态
+    state = load_simulation(request)
+    if state:
+        form_data, _result_key = state
+        form = SolarSimulationForm(form_data)
         if form.is_valid():
-            params = form.get_calculation_params()
-            calculator = SolarCalculator()
-            results = calculator.calculate(params)
-            chart_data = prepare_chart_data(results)
-            extra_savings = results['savings_with_batt'] - results['savings_no_batt']
-            payback_years = None
-            if extra_savings > 0:
-                payback_years = params['battery_cost'] / extra_savings
-            context = {
-                'form': form,
-                'results': results,
-                'chart_data': chart_data,
-                'params': params,
-                'extra_savings': extra_savings,
-                'payback_years': payback_years,
-                'title': '🏠 德国家庭太阳能光伏模拟 - 计算结果'
-            }
-            return render(request, 'solar_app/results.html', context)
+            return render_results(request, form)
 
     # 否则返回首页
     return index(request)
 
 
+def render_results(request, form, save_state=False):
+    """根据已验证的表单渲染结果页"""
+    # 获取计算参数并执行计算（相同参数直接命中结果缓存）
+    params = form.get_calculation_params()
+    result_key, results = cached_calculation(params)
+
+    if save_state:
+        # session 中只保存输入和结果缓存键，便于语言切换后恢复
+        save_simulation(request, form, result_key)
+
+    # 准备图表与表格数据（延迟计算，片段缓存命中时无需生成）
+    chart_data = SimpleLazyObject(lambda: prepare_chart_data(results))
+    monthly_rows = SimpleLazyObject(lambda: results.rows(month_labels()))
+
+    # 计算储能投资分析
+    extra_savings = results.savings_with_batt - results.savings_no_batt
+    payback_years = None
+    if extra_savings > 0:
+        payback_years = params['battery_cost'] / extra_savings
+
+    context = {
+        'form': form,
+        'results': results,
+        'chart_data': chart_data,
+        'monthly_rows': monthly_rows,
+        'params': params,
+        'extra_savings': extra_savings,
+        'payback_years': payback_years,
+        'tariff_label': dict(TARIFF_CHOICES).get(params['tariff']),
+        'dispatch_label': dict(DISPATCH_CHOICES).get(params['battery_dispatch']),
+        # 热泵、电动汽车与居家办公的年用电量合计（已计入用电量）
+        'addon_kwh': float(load_profiles.annual_kwh(params)[0]),
+        'params_key': result_digest(params),
+        'cache_version': template_version(),
+        'fragment_cache_timeout': PAGE_CACHE_TIMEOUT,
+        # 方案对比与蒙特卡洛分析以当前输入为基础（页面中以 JSON 提供）
+        'simulation_inputs': form.cleaned_data,
+        'compare_rows': range(comparison.MAX_CONFIGS),
+        'dispatch_choices': DISPATCH_CHOICES,
+        'title': '🏠 德国家庭太阳能光伏模拟 - 计算结果'
+    }
+    return render(request, 'solar_app/results.html', context)
+
+
+def month_labels():
+    """当前语言的月份标签"""
+    return [gettext(name) for name in MONTH_NAMES]
+
+
 def prepare_chart_data(results):
-    """准备图表所需的数据格式"""
-    monthly_data = results['monthly_data']
-    
+    """准备图表所需的数据格式（results 为 SimulationResult）"""
+    labels = month_labels()
+
+    def series(field):
+        return results.flow(field).tolist()
+
     # 准备无储能方案的图表数据
     no_battery_data = {
-        'labels': [item['月份'] for item in monthly_data],
+        'labels': labels,
         'datasets': [
             {
-                'label': '自用电量',
-                'data': [item['自用电量_无储能'] for item in monthly_data],
+                'label': gettext('自用电量'),
+                'data': series('self_use_no_batt'),
                 'backgroundColor': 'rgba(54, 162, 235, 0.8)',
                 'borderColor': 'rgba(54, 162, 235, 1)',
                 'borderWidth': 1
             },
             {
-                'label': '上网电量',
-                'data': [item['上网电量_无储能'] for item in monthly_data],
+                'label': gettext('上网电量'),
+                'data': series('export_no_batt'),
                 'backgroundColor': 'rgba(255, 206, 86, 0.8)',
                 'borderColor': 'rgba(255, 206, 86, 1)',
                 'borderWidth': 1
@@ -131,18 +154,18 @@ def prepare_chart_data(results):
     
     # 准备有储能方案的图表数据
     with_battery_data = {
-        'labels': [item['月份'] for item in monthly_data],
+        'labels': labels,
         'datasets': [
             {
-                'label': '自用电量',
-                'data': [item['自用电量_有储能'] for item in monthly_data],
+                'label': gettext('自用电量'),
+                'data': series('self_use_with_batt'),
                 'backgroundColor': 'rgba(75, 192, 192, 0.8)',
                 'borderColor': 'rgba(75, 192, 192, 1)',
                 'borderWidth': 1
             },
             {
-                'label': '上网电量',
-                'data': [item['上网电量_有储能'] for item in monthly_data],
+                'label': gettext('上网电量'),
+                'data': series('export_with_batt'),
                 'backgroundColor': 'rgba(255, 159, 64, 0.8)',
                 'borderColor': 'rgba(255, 159, 64, 1)',
                 'borderWidth': 1
@@ -152,19 +175,19 @@ def prepare_chart_data(results):
     
     # 月度发电量和用电量对比
     generation_consumption_data = {
-        'labels': [item['月份'] for item in monthly_data],
+        'labels': labels,
         'datasets': [
             {
-                'label': '发电量',
-                'data': [item['发电量'] for item in monthly_data],
+                'label': gettext('发电量'),
+                'data': series('generation'),
                 'backgroundColor': 'rgba(255, 99, 132, 0.6)',
                 'borderColor': 'rgba(255, 99, 132, 1)',
                 'borderWidth': 2,
                 'type': 'line'
             },
             {
-                'label': '用电量',
-                'data': [item['用电量'] for item in monthly_data],
+                'label': gettext('用电量'),
+                'data': series('consumption'),
                 'backgroundColor': 'rgba(54, 162, 235, 0.6)',
                 'borderColor': 'rgba(54, 162, 235, 1)',
                 'borderWidth': 2,
@@ -182,30 +205,33 @@ def prepare_chart_data(results):
 
 @csrf_exempt
 def api_simulate(request):
-    """API接口 - 返回JSON格式的计算结果"""
+    """
+    API接口 - 返回JSON格式的计算结果
+
+    GET: 参数放在查询字符串中（字段同表单），响应带强 ETag 与 Cache-Control，
+         重复查询可由浏览器或 Apache mod_cache 以 304 应答；
+    POST: 参数为JSON请求体，适合较大的请求，不缓存。
+    """
+    if request.method == 'GET':
+        return _api_simulate_get(request)
     if request.method == 'POST':
         try:
             # 解析JSON请求
             data = json.loads(request.body)
-            form = SolarSimulationForm(data)
+            # 机器客户端不需要表单控件与渲染，使用与表单规则一致的快速校验
+            params, errors = schema.validate(data)
             
-            if form.is_valid():
-                params = form.get_calculation_params()
-                calculator = SolarCalculator()
-                results = calculator.calculate(params)
-                
-                # 转换DataFrame为可序列化的格式
-                results['monthly_data'] = results['monthly_data']
-                results.pop('df', None)  # 移除DataFrame对象
+            if errors is None:
+                results = pipeline.calculate(params)
                 
                 return JsonResponse({
                     'success': True,
-                    'results': results
+                    'results': results.as_json()
                 })
             else:
                 return JsonResponse({
                     'success': False,
-                    'errors': form.errors
+                    'errors': errors
                 })
         except json.JSONDecodeError:
             return JsonResponse({
@@ -220,5 +246,404 @@ def api_simulate(request):
     
     return JsonResponse({
         'success': False,
-        'error': '仅支持POST请求'
+        'error': '仅支持GET或POST请求'
+    })
+
+
+def _api_simulate_get(request):
+    """可缓存的 GET 模拟API；If-None-Match 命中时不做任何计算"""
+    params, errors = schema.validate(request.GET)
+    if errors is not None:
+        return JsonResponse({'success': False, 'errors': errors}, status=400)
+
+    etag = result_etag(params)
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        results = pipeline.calculate(params)
+        response = JsonResponse({'success': True, 'results': results.as_json()})
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=API_CACHE_MAX_AGE)
+    return response
+
+
+# 实时预览返回的月度序列；数值取整，整个响应只有几百字节
+LIVE_SERIES = ('generation', 'consumption', 'self_use_no_batt', 'self_use_with_batt')
+LIVE_DIGITS = 0
+
+
+def live_defaults():
+    """表单各字段的初始值；实时预览只发送与之不同的字段"""
+    return {name: field.initial for name, field in SolarSimulationForm.base_fields.items()}
+
+
+def _rounded(value, digits=LIVE_DIGITS):
+    return round(value, digits) if value is not None else None
+
+
+def api_live(request):
+    """
+    实时预览API：GET 查询字符串中只包含与表单初始值不同的字段
+
+    缺少的字段取表单初始值；经结果缓存计算，只返回主要经济指标与图表序列，
+    供首页在用户输入时（防抖后）即时刷新。
+    预览总是按贪心调度计算：逐时最优调度单户约 0.1 秒且按 20 倍成本限流，
+    不适合每次输入都请求，提交表单后的结果页才使用所选的调度策略。
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': '仅支持GET请求'}, status=405)
+    data = live_defaults()
+    data.update(request.GET.items())
+    params, errors = schema.validate(data)
+    if errors is not None:
+        return JsonResponse({'success': False, 'errors': errors}, status=400)
+    params['battery_dispatch'] = SolarCalculator.DISPATCH_GREEDY
+
+    _, results = cached_calculation(params)
+    return JsonResponse({
+        'success': True,
+        'baseline_cost': _rounded(results.baseline_cost),
+        'savings_no_batt': _rounded(results.savings_no_batt),
+        'savings_with_batt': _rounded(results.savings_with_batt),
+        'payback_years': _rounded(comparison.payback_years(params, results), 1),
+        'series': {field: results.flow(field).round(LIVE_DIGITS).tolist() for field in LIVE_SERIES},
+    }, json_dumps_params={'separators': (',', ':')})
+
+
+@csrf_exempt
+def api_sensitivity(request):
+    """
+    敏感性API：POST JSON 参数（同 api_simulate），可选
+    "relative"（龙卷风图的相对范围，默认0.2）和 "ranges"（{参数: [低值, 高值]}）
+
+    返回节省金额与回收期的精确梯度，以及一次批量计算得到的龙卷风图数据。
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': '仅支持POST请求'}, status=405)
+    try:
+        data = json.loads(request.body)
+        relative = float(data.get('relative', sensitivity.DEFAULT_RELATIVE_RANGE))
+        ranges = {key: (float(low), float(high))
+                  for key, (low, high) in (data.get('ranges') or {}).items()}
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': '无效的JSON数据'}, status=400)
+    unknown = set(ranges) - set(SolarCalculator.PARAM_KEYS)
+    if unknown:
+        return JsonResponse({'success': False, 'error': f'未知参数: {", ".join(sorted(unknown))}'},
+                            status=400)
+
+    params, errors = schema.validate(data)
+    if errors is not None:
+        return JsonResponse({'success': False, 'errors': errors}, status=400)
+    calculator = pipeline.default_pipeline.calculator
+    return JsonResponse({
+        'success': True,
+        'sensitivities': pipeline.default_pipeline.run(params)['sensitivities'],
+        'tornado': sensitivity.tornado(calculator, params, ranges, relative,
+                                       calculator.resolve_tariff(params)[1]),
+    })
+
+
+def prepare_comparison_chart(payload):
+    """对比图：各方案的无储能 / 有储能年度节省金额（分组柱状图）"""
+    costs = payload['costs']
+    return {
+        'labels': payload['labels'],
+        'datasets': [
+            {
+                'label': gettext('无储能方案'),
+                'data': costs['savings_no_batt'],
+                'backgroundColor': 'rgba(255, 206, 86, 0.8)',
+                'borderColor': 'rgba(255, 206, 86, 1)',
+                'borderWidth': 1
+            },
+            {
+                'label': gettext('有储能方案'),
+                'data': costs['savings_with_batt'],
+                'backgroundColor': 'rgba(75, 192, 192, 0.8)',
+                'borderColor': 'rgba(75, 192, 192, 1)',
+                'borderWidth': 1
+            }
+        ]
+    }
+
+
+@csrf_exempt
+def api_compare(request):
+    """
+    多方案对比API：POST JSON {"base": 参数字典, "configs": [参数字典, ...]}
+
+    每个方案为 base 与该方案字段合并后的完整参数（字段同 api_simulate），可另带 "label"。
+    全部方案的能量流一次批量计算；返回按字段列出各方案取值的对比数据与图表数据。
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': '仅支持POST请求'}, status=405)
+    try:
+        data = json.loads(request.body)
+        base = data.get('base') or {}
+        merged = [dict(base, **config) for config in data['configs']]
+    except (json.JSONDecodeError, KeyError, TypeError, AttributeError, ValueError):
+        return JsonResponse({'success': False, 'error': '无效的JSON数据'}, status=400)
+    if not 1 <= len(merged) <= comparison.MAX_CONFIGS:
+        return JsonResponse({'success': False,
+                             'error': f'方案数量必须在1到{comparison.MAX_CONFIGS}之间'}, status=400)
+
+    configs = []
+    for index, config in enumerate(merged):
+        params, errors = schema.validate(config)
+        if errors is not None:
+            return JsonResponse({'success': False, 'index': index, 'errors': errors}, status=400)
+        configs.append(params)
+
+    labels = [str(config.get('label') or gettext('方案 %(number)d') % {'number': index + 1})
+              for index, config in enumerate(merged)]
+    results = comparison.compare(configs)
+    payload = comparison.comparison_payload(configs, results, labels)
+    return JsonResponse({
+        'success': True,
+        'comparison': payload,
+        'chart': prepare_comparison_chart(payload),
+    })
+
+
+def _sse(event, data):
+    """一条 Server-Sent Events 消息"""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def api_montecarlo(request):
+    """
+    蒙特卡洛分析的进度流（Server-Sent Events）
+
+    GET 查询参数同表单字段，可另加 samples（样本数）和 seed（随机种子）。
+    每块样本计算完成后推送 progress 事件（进度百分比与当前的 P10/P50/P90），
+    结束时推送 result 事件。客户端关闭连接后，下一次写入失败时服务器关闭生成器，
+    剩余的块不再计算。
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': '仅支持GET请求'}, status=405)
+    params, errors = schema.validate(request.GET)
+    if errors is not None:
+        return JsonResponse({'success': False, 'errors': errors}, status=400)
+    try:
+        samples = int(request.GET.get('samples', montecarlo.DEFAULT_SAMPLES))
+        seed = int(request.GET['seed']) if request.GET.get('seed') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': '无效的样本数或随机种子'}, status=400)
+
+    def events():
+        partial = None
+        for partial in montecarlo.run(params, samples, seed):
+            yield _sse('progress', partial)
+        yield _sse('result', partial)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # 前置 nginx 时让其逐条转发事件；Apache 下该路径的压缩在 solar-vhost.conf 中关闭
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# 批量导出每个方案的年度汇总字段
+BATCH_EXPORT_FIELDS = SolarCalculator.COST_FIELDS + SolarCalculator.FLOW_FIELDS
+BATCH_CHUNK_SIZE = 10000
+
+
+def _export_response(fmt, body, filename):
+    """构造导出下载响应；body 为字节串或按块产生内容的生成器"""
+    if isinstance(body, bytes):
+        response = HttpResponse(body, content_type=exports.CONTENT_TYPES[fmt])
+    else:
+        response = StreamingHttpResponse(body, content_type=exports.CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+def export_monthly(request, fmt):
+    """
+    导出月度结果（CSV / npz / 二进制）
+
+    参数取自查询字符串；未提供时使用最近一次模拟的输入。
+    """
+    if any(name in request.GET for name in SolarSimulationForm.base_fields):
+        data = request.GET
+    else:
+        state = load_simulation(request)
+        if not state:
+            return JsonResponse({'success': False, 'error': '缺少模拟参数'}, status=400)
+        data = state[0]
+
+    params, errors = schema.validate(data)
+    if errors is not None:
+        return JsonResponse({'success': False, 'errors': errors}, status=400)
+
+    flows, costs = pipeline.default_pipeline.run(params)['priced']
+    fields = SolarCalculator.FLOW_FIELDS
+    matrix = np.stack([flows[field][0] for field in fields], axis=1)  # (12, 字段数)
+    months = list(range(1, 13))
+
+    if fmt == 'csv':
+        body = exports.iter_csv(('month',) + fields, matrix, labels=months)
+    elif fmt == 'npz':
+        arrays = {field: flows[field][0] for field in fields}
+        arrays.update({field: costs[field] for field in SolarCalculator.COST_FIELDS})
+        body = exports.to_npz(dict(arrays, month=np.array(months)))
+    else:
+        body = b''.join(exports.iter_binary(fields, matrix))
+    return _export_response(fmt, body, 'solar_monthly')
+
+
+@csrf_exempt
+def export_batch(request, fmt):
+    """
+    批量方案导出：POST JSON {"scenarios": [参数字典, ...]}
+
+    每个方案输出一行年度汇总（经济指标 + 各能量流的年度合计）。
+    CSV 与二进制格式按块计算并流式输出，内存占用与方案数量无关；
+    与 simulate_batch 相同，按电价类型分组计价，选择最优调度且有电池的方案逐个求解。
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': '仅支持POST请求'}, status=405)
+    try:
+        scenarios = json.loads(request.body)['scenarios']
+        raw = {name: [data.get(name) for data in scenarios]
+               for name in SolarSimulationForm.base_fields}
+    except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': '无效的JSON数据'}, status=400)
+
+    # 整批一次向量化校验；出错时只对第一个无效方案生成与表单相同的错误信息
+    checked = schema.validate_columns(raw)
+    if not checked.valid.all():
+        index = int(np.argmin(checked.valid))
+        return JsonResponse({'success': False, 'index': index,
+                             'errors': schema.validate(scenarios[index])[1]}, status=400)
+    count = len(scenarios)
+
+    def blocks():
+        for start in range(0, count, BATCH_CHUNK_SIZE):
+            yield batch.simulate_records(scenarios[start:start + BATCH_CHUNK_SIZE]).values
+
+    if fmt == 'csv':
+        body = exports.iter_csv(BATCH_EXPORT_FIELDS, blocks())
+    elif fmt == 'npz':
+        matrix = np.concatenate(list(blocks())) if count else np.empty((0, len(BATCH_EXPORT_FIELDS)))
+        body = exports.to_npz(dict(zip(BATCH_EXPORT_FIELDS, matrix.T)))
+    else:
+        body = exports.iter_binary(BATCH_EXPORT_FIELDS, blocks())
+    return _export_response(fmt, body, 'solar_batch')
+
+
+@csrf_exempt
+def api_portfolio(request):
+    """
+    组合模式API：上传 CSV/NDJSON 家庭清单（multipart 字段 file）
+
+    默认返回组合汇总JSON；?output=csv 时流式返回每户结果。
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': '仅支持POST请求'}, status=405)
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'success': False, 'error': '缺少上传文件'}, status=400)
+
+    fmt = request.GET.get('format') or ('csv' if upload.name.lower().endswith('.csv') else 'ndjson')
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+    aggregate = PortfolioAggregate()
+    results = run_portfolio(read_chunks(stream, fmt), aggregate=aggregate)
+
+    if request.GET.get('output') == 'csv':
+        return _export_response('csv', iter_results_csv(results), 'solar_portfolio')
+
+    try:
+        for _ in results:
+            pass
+    except PortfolioError as exc:
+        return JsonResponse({'success': False, 'error': str(exc)}, status=400)
+    return JsonResponse({'success': True, 'summary': aggregate.as_dict()})
+
+
+# 地图查询结果的小数位数：坐标与各指标
+YIELD_MAP_DIGITS = {'latitude': 4, 'longitude': 4, 'payback_years': 1}
+
+
+def _map_column(values, digits):
+    # float32 转为取整后的 float64，NaN（无法回收）输出为 null
+    return [None if value != value else value
+            for value in np.round(values.astype(float), digits).tolist()]
+
+
+def api_yield_map(request):
+    """
+    区域地图API（预计算）：GET ?bbox=南,西,北,东 返回区域内的全部地点，?lat=&lon= 返回最近的地点
+
+    数据来自 manage.py precompute_yield_map 写出的瓦片，查询时不做任何计算；
+    响应按字段列出各地点的取值，带由构建号与查询得出的强 ETag，同一构建内可被浏览器与反向代理缓存。
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': '仅支持GET请求'}, status=405)
+    manifest = yield_map.store.manifest()
+    if manifest is None:
+        return JsonResponse({'success': False, 'error': '地图数据尚未生成'}, status=404)
+
+    query = sorted((key, request.GET[key]) for key in ('bbox', 'lat', 'lon') if key in request.GET)
+    etag = '"{}"'.format(hashlib.sha1(f'{manifest["build"]}:{query}'.encode()).hexdigest())
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    try:
+        if 'bbox' in request.GET:
+            south, west, north, east = (float(value) for value in request.GET['bbox'].split(','))
+            ids, values = yield_map.store.region(south, west, north, east)
+        else:
+            ids, values = yield_map.store.nearest(float(request.GET['lat']),
+                                                  float(request.GET['lon']))
+    except (KeyError, ValueError) as exc:
+        message = str(exc) if isinstance(exc, yield_map.YieldMapError) else \
+            '需要 bbox=南,西,北,东 或 lat 与 lon 参数'
+        return JsonResponse({'success': False, 'error': message}, status=400)
+
+    locations = {'id': [] if ids is None else ids.tolist()}
+    for index, field in enumerate(yield_map.TILE_FIELDS):
+        locations[field] = [] if values is None else \
+            _map_column(values[:, index], YIELD_MAP_DIGITS.get(field, 2))
+    response = JsonResponse({
+        'success': True,
+        'build': manifest['build'],
+        'reference': manifest['reference'],
+        'count': len(locations['id']),
+        'locations': locations,
     })
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=API_CACHE_MAX_AGE)
+    return response
+
+
+@never_cache
+def healthz_ready(request):
+    """
+    就绪检查：本进程预热完成（或未启用预热）时返回 200，否则返回 503
+
+    响应中包含预热状态、总耗时与各步骤耗时，负载均衡器只把请求路由到已预热的进程。
+    """
+    ready = warmup.is_ready()
+    response = JsonResponse(dict(warmup.state(), ready=ready), status=200 if ready else 503)
+    if not ready:
+        response['Retry-After'] = '1'
+    return response
+
+
+@staff_member_required
+def profile_list(request):
+    """剖析结果列表（仅管理员）：环形缓冲中的文件，最新的在前"""
+    return JsonResponse({'success': True, 'profiles': profiling.store.entries()})
+
+
+@staff_member_required
+def profile_download(request, name):
+    """下载单个剖析文件（仅管理员）：.prof 为 pstats 格式，.folded 为折叠栈，.txt 为内存分配差异"""
+    path = profiling.store.path(name)
+    if path is None:
+        raise Http404(name)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
@@ -0,0 +1,145 @@
+"""
+工作进程预热
+进程启动时在后台线程中预先完成首个请求原本要承担的工作：导入数值计算模块、
+加载各语言的翻译目录、编译模板、构建计算器，并按每种语言渲染一次首页与结果页。
+/healthz/ready 根据这里记录的状态决定负载均衡器是否把请求路由到本进程。
+"""
+import io
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.template.loader import get_template
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+# 环境变量 SOLAR_WARMUP=1 时在 AppConfig.ready() 中启动预热（由 wsgi.py 设置，
+# manage.py 命令和开发服务器不预热）
+ENV_FLAG = 'SOLAR_WARMUP'
+
+DISABLED = 'disabled'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+_TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates'
+
+_lock = threading.Lock()
+_state = {'status': DISABLED, 'pid': os.getpid()}
+
+
+def enabled():
+    return os.environ.get(ENV_FLAG) == '1'
+
+
+def state():
+    """当前预热状态的副本（JSON 可序列化）"""
+    with _lock:
+        return dict(_state, steps=dict(_state.get('steps', {})))
+
+
+def is_ready():
+    """未启用预热的进程视为就绪"""
+    with _lock:
+        return _state['status'] in (READY, DISABLED)
+
+
+def _record(step, started):
+    with _lock:
+        _state['steps'][step] = round(time.perf_counter() - started, 4)
+
+
+def _import_modules():
+    # views 依次导入 numpy、计算引擎、电价、调度、敏感性等全部请求路径上的模块
+    from . import views  # noqa: F401
+
+
+def _load_translations():
+    for code, _ in settings.LANGUAGES:
+        with translation.override(code):
+            translation.gettext('经济效益评估')
+
+
+def _compile_templates():
+    for path in sorted(_TEMPLATE_DIR.rglob('*.html')):
+        get_template(path.relative_to(_TEMPLATE_DIR).as_posix())
+
+
+def _request(method, path):
+    """预热用的最小 WSGI 请求，直接交给视图函数（不经过中间件）"""
+    return WSGIRequest({
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(b''),
+        'wsgi.errors': io.StringIO(),
+    })
+
+
+def _simulate_per_language():
+    """每种语言渲染一次首页与默认参数的结果页（同时填充结果缓存与片段缓存）"""
+    from .forms import SolarSimulationForm
+    from .views import index, render_results
+
+    data = {name: field.initial for name, field in SolarSimulationForm.base_fields.items()}
+    for code, _ in settings.LANGUAGES:
+        with translation.override(code):
+            request = _request('GET', '/')
+            request.LANGUAGE_CODE = code
+            index(request)
+            form = SolarSimulationForm(data)
+            if not form.is_valid():
+                raise RuntimeError(f'预热参数无效: {form.errors.as_json()}')
+            render_results(_request('POST', '/simulate/'), form)
+
+
+STEPS = (
+    ('imports', _import_modules),
+    ('translations', _load_translations),
+    ('templates', _compile_templates),
+    ('simulations', _simulate_per_language),
+)
+
+
+def run():
+    """依次执行全部预热步骤并记录每步耗时；失败时状态为 failed，/healthz/ready 返回 503"""
+    started = time.perf_counter()
+    with _lock:
+        _state.update(status=WARMING, steps={}, error=None, seconds=None)
+    try:
+        for name, step in STEPS:
+            step_started = time.perf_counter()
+            step()
+            _record(name, step_started)
+    except Exception as exc:
+        logger.exception('工作进程预热失败')
+        with _lock:
+            _state.update(status=FAILED, error=f'{type(exc).__name__}: {exc}')
+    else:
+        with _lock:
+            _state['status'] = READY
+    finally:
+        with _lock:
+            _state['seconds'] = round(time.perf_counter() - started, 4)
+
+
+def start():
+    """在后台线程中启动预热（每个进程只启动一次）"""
+    with _lock:
+        if _state['status'] != DISABLED:
+            return
+        _state['status'] = WARMING
+        _state['steps'] = {}
+    threading.Thread(target=run, name='solar-warmup', daemon=True).start()
@@ -0,0 +1,279 @@
+"""
+区域发电量与节省金额地图（预计算）
+从本地辐照度数据集（每个网格单元或邮编中心点一行：编号、经纬度与12个月的平均日辐照度）分块读取地点，
+对同一个参考系统按块向量化计算全部地点，块分发到进程池（portfolio.ordered_map）。
+结果按经纬度切分为瓦片，每个瓦片一个 .npz（地点编号与 float32 指标矩阵），
+查询接口只读取覆盖所查区域的瓦片并在进程内缓存，不做任何计算。
+"""
+import json
+import math
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .portfolio import iter_records
+from .solar_calculator import ENGINE_VERSION, SolarCalculator
+from .lru import LRUCache
+
+
+STORE_DIR = getattr(settings, 'SOLAR_YIELD_MAP_DIR', None) or \
+    os.path.join(settings.BASE_DIR, 'yield_map')
+# 瓦片边长（度）
+DEFAULT_TILE_DEGREES = 0.5
+DEFAULT_CHUNK_SIZE = 5000
+# 一次查询最多覆盖的瓦片数（0.5° 瓦片时整个德国约 450 个）
+MAX_TILES = getattr(settings, 'SOLAR_YIELD_MAP_MAX_TILES', 1000)
+# 进程内缓存的瓦片数
+TILE_CACHE_SIZE = 512
+
+# 数据集中12个月平均日水平辐照度 (kWh/m²/day) 的列名，与 SolarCalculator.MONTHLY_IRRADIANCE 同单位
+IRRADIANCE_COLUMNS = tuple(f'm{month:02d}' for month in range(1, 13))
+
+# 瓦片中每个地点的指标：每 kWp 年发电量 (kWh/kWp)、参考系统的年发电量与自用电量 (kWh)、
+# 年度节省金额 (€) 与电池投资回收期（年，无法回收时为 NaN）
+MAP_FIELDS = (
+    'specific_yield', 'generation', 'self_use_with_batt',
+    'savings_no_batt', 'savings_with_batt', 'payback_years',
+)
+TILE_FIELDS = ('latitude', 'longitude') + MAP_FIELDS
+
+MANIFEST = 'manifest.json'
+# 构建目录名：时间戳-进程号；只有这样命名的子目录会被当作构建清理
+BUILD_NAME = re.compile(r'\d{14}-\d+')
+
+
+class YieldMapError(ValueError):
+    """数据集或查询无效"""
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def read_locations(stream, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    分块读取辐照度数据集
+
+    每块产生 (编号列表, 形状 (n, 2 + 12) 的数组：纬度、经度与12个月的辐照度)；
+    无法解析的数值为 NaN，由 evaluate_locations 判为无效行。
+    """
+    ids, rows = [], []
+    for index, record in enumerate(iter_records(stream, fmt)):
+        ids.append(str(record.get('id') or record.get('postcode') or index))
+        rows.append([_to_float(record.get(name))
+                     for name in ('latitude', 'longitude') + IRRADIANCE_COLUMNS])
+        if len(rows) >= chunk_size:
+            yield ids, np.array(rows, dtype=float)
+            ids, rows = [], []
+    if rows:
+        yield ids, np.array(rows, dtype=float)
+
+
+def specific_yield_curves(irradiance, calculator):
+    """
+    各地点每 kWp 的月发电量 (kWh)，形状 (n, 12)
+
+    按月与德国平均辐照度的比值缩放计算器的月发电量；辐照度等于平均值的地点与表单计算完全一致。
+    """
+    return calculator.monthly_kwh_per_kwp * irradiance / calculator.MONTHLY_IRRADIANCE
+
+
+def evaluate_locations(params, block, calculator=None):
+    """
+    计算一块地点（可在工作进程中执行）
+
+    params: 参考系统的计算参数（schema.validate 的结果）；block: read_locations 产生的数组
+    返回 (有效行掩码, 形状 (有效行数, len(TILE_FIELDS)) 的结果矩阵)。
+    使用按月贪心的电池策略，逐地点的最优调度代价过高。
+    """
+    calculator = calculator or SolarCalculator()
+    latitude, longitude, irradiance = block[:, 0], block[:, 1], block[:, 2:]
+    valid = np.isfinite(block).all(axis=1) & (np.abs(latitude) <= 90) & \
+        (np.abs(longitude) <= 180) & (irradiance >= 0).all(axis=1)
+    n = int(valid.sum())
+
+    curves = specific_yield_curves(irradiance[valid], calculator)
+    columns = dict(params, **{key: np.full(n, float(params[key]))
+                              for key in calculator.ENERGY_KEYS})
+    flows = calculator.energy_flows(columns, kwh_per_kwp=curves)
+    costs = calculator.price_flows(flows, params, calculator.resolve_tariff(params)[1])
+
+    extra = costs['savings_with_batt'] - costs['savings_no_batt']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payback = np.where(extra > 0, params['battery_cost'] / extra, np.nan)
+    matrix = np.column_stack([
+        latitude[valid], longitude[valid],
+        curves.sum(axis=1),
+        flows['generation'].sum(axis=1),
+        flows['self_use_with_batt'].sum(axis=1),
+        costs['savings_no_batt'],
+        costs['savings_with_batt'],
+        payback,
+    ])
+    return valid, matrix
+
+
+def tile_indices(latitude, longitude, degrees):
+    """地点所在瓦片的 (行, 列) 索引"""
+    return (np.floor(np.asarray(latitude) / degrees).astype(int),
+            np.floor(np.asarray(longitude) / degrees).astype(int))
+
+
+def tile_name(row, col):
+    return f'{row}_{col}'
+
+
+class TileWriter:
+    """
+    按瓦片收集计算结果，最后写出到新的构建目录并原子地替换清单
+
+    每次预计算写入 <目录>/<构建号>/ 下的瓦片，写完后替换 manifest.json 指向新构建；
+    查询方总是读到完整的旧构建或新构建。保留上一个构建，供正在进行的查询读完。
+    """
+
+    def __init__(self, directory=STORE_DIR, degrees=DEFAULT_TILE_DEGREES):
+        self.directory = directory
+        self.degrees = degrees
+        self._parts = {}
+
+    def add(self, ids, matrix):
+        rows, cols = tile_indices(matrix[:, 0], matrix[:, 1], self.degrees)
+        ids = np.asarray(ids, dtype=str)
+        tiles, groups = np.unique(np.column_stack([rows, cols]), axis=0, return_inverse=True)
+        groups = groups.reshape(-1)
+        for group, (row, col) in enumerate(tiles):
+            selected = groups == group
+            self._parts.setdefault(tile_name(row, col), []).append((ids[selected], matrix[selected]))
+
+    def publish(self, reference, source=None):
+        """写出全部瓦片与清单，返回清单"""
+        build = f'{time.strftime("%Y%m%d%H%M%S")}-{os.getpid()}'
+        target = os.path.join(self.directory, build)
+        os.makedirs(target)
+        tiles = {}
+        bounds = None
+        for name, parts in sorted(self._parts.items()):
+            ids = np.concatenate([part[0] for part in parts])
+            values = np.concatenate([part[1] for part in parts]).astype('<f4')
+            np.savez_compressed(os.path.join(target, f'{name}.npz'), ids=ids, values=values)
+            tiles[name] = len(ids)
+            low, high = values[:, :2].min(axis=0), values[:, :2].max(axis=0)
+            bounds = (np.minimum(bounds[0], low), np.maximum(bounds[1], high)) if bounds else \
+                (low, high)
+
+        manifest = {
+            'build': build,
+            'created': time.time(),
+            'engine_version': ENGINE_VERSION,
+            'tile_degrees': self.degrees,
+            'fields': list(TILE_FIELDS),
+            'reference': reference,
+            'source': source,
+            'locations': sum(tiles.values()),
+            'bounds': [round(float(value), 6) for value in np.concatenate(bounds)]
+            if bounds else None,
+            'tiles': tiles,
+        }
+        temporary = os.path.join(self.directory, f'.{MANIFEST}.tmp')
+        with open(temporary, 'w', encoding='utf-8') as stream:
+            json.dump(manifest, stream, default=str)
+        os.replace(temporary, os.path.join(self.directory, MANIFEST))
+        self._prune(keep={build, self._previous_build(build)})
+        return manifest
+
+    def _builds(self):
+        """目录中已有的构建（按构建号排序）；名称不符合构建号格式的子目录不属于地图，不会被删除"""
+        return sorted(name for name in os.listdir(self.directory)
+                      if BUILD_NAME.fullmatch(name) and
+                      os.path.isdir(os.path.join(self.directory, name)))
+
+    def _previous_build(self, current):
+        builds = [name for name in self._builds() if name != current]
+        return builds[-1] if builds else None
+
+    def _prune(self, keep):
+        for name in self._builds():
+            if name not in keep:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+
+class YieldMapStore:
+    """
+    预计算结果的只读查询
+
+    清单按文件修改时间重新加载（预计算完成后无需重启）；瓦片按 (构建号, 瓦片名) 在进程内缓存。
+    """
+
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+        self._manifest = None
+        self._stamp = None
+        self._tiles = LRUCache(TILE_CACHE_SIZE)
+
+    def manifest(self):
+        """当前清单；尚未预计算时为 None"""
+        try:
+            stamp = os.stat(os.path.join(self.directory, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if stamp != self._stamp:
+            with open(os.path.join(self.directory, MANIFEST), encoding='utf-8') as stream:
+                self._manifest = json.load(stream)
+            self._stamp = stamp
+        return self._manifest
+
+    def _tile(self, manifest, name):
+        if name not in manifest['tiles']:
+            return None
+        key = (manifest['build'], name)
+        tile = self._tiles.get(key)
+        if tile is None:
+            with np.load(os.path.join(self.directory, manifest['build'], f'{name}.npz')) as data:
+                tile = (data['ids'], data['values'])
+            self._tiles.put(key, tile)
+        return tile
+
+    def _gather(self, manifest, rows, cols):
+        tiles = [self._tile(manifest, tile_name(row, col)) for row in rows for col in cols]
+        tiles = [tile for tile in tiles if tile is not None]
+        if not tiles:
+            return np.empty(0, dtype=str), np.empty((0, len(TILE_FIELDS)), dtype='<f4')
+        return (np.concatenate([tile[0] for tile in tiles]),
+                np.concatenate([tile[1] for tile in tiles]))
+
+    def region(self, south, west, north, east):
+        """矩形区域内的全部地点，返回 (编号数组, 形状 (n, len(TILE_FIELDS)) 的 float32 矩阵)"""
+        manifest = self.manifest()
+        if south > north or west > east:
+            raise YieldMapError('区域范围无效')
+        (row_low, row_high), (col_low, col_high) = (
+            tile_indices([south, north], [west, east], manifest['tile_degrees']))
+        if (row_high - row_low + 1) * (col_high - col_low + 1) > MAX_TILES:
+            raise YieldMapError(f'查询区域过大（最多 {MAX_TILES} 个瓦片）')
+        ids, values = self._gather(manifest, range(row_low, row_high + 1),
+                                   range(col_low, col_high + 1))
+        inside = (values[:, 0] >= south) & (values[:, 0] <= north) & \
+            (values[:, 1] >= west) & (values[:, 1] <= east)
+        return ids[inside], values[inside]
+
+    def nearest(self, latitude, longitude):
+        """距离给定位置最近的地点（在所在瓦片及相邻瓦片中查找），没有时返回 (None, None)"""
+        manifest = self.manifest()
+        (row,), (col,) = tile_indices([latitude], [longitude], manifest['tile_degrees'])
+        ids, values = self._gather(manifest, range(row - 1, row + 2), range(col - 1, col + 2))
+        if not len(ids):
+            return None, None
+        scale = math.cos(math.radians(latitude))
+        distance = (values[:, 0] - latitude) ** 2 + ((values[:, 1] - longitude) * scale) ** 2
+        index = int(np.argmin(distance))
+        return ids[index:index + 1], values[index:index + 1]
+
+
+store = YieldMapStore()
@@ -16,7 +16,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'django-insecure-your-secret-key-here')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 ALLOWED_HOSTS = ["3.75.185.85", "localhost", "127.0.0.1"]
 
 STATIC_URL = "/static/"
@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'solar_app.admission.AdmissionControlMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,6 +47,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # 包住视图函数本身，需放在最后；未配置剖析时不加载
+    'solar_app.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'solar_project.urls'
@@ -65,6 +69,16 @@ TEMPLATES = [
     },
 ]
 
+# 生产环境启用缓存模板加载器，模板只编译一次
+if not DEBUG:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'solar_project.wsgi.application'
 
 
@@ -79,6 +93,57 @@ DATABASES = {
 }
 
 
+# Cache
+# 首页整页缓存与结果页片段缓存使用；缓存键已包含模板/翻译指纹
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'solar-cache',
+        'TIMEOUT': 60 * 60,
+    }
+}
+
+SOLAR_PAGE_CACHE_TIMEOUT = 60 * 60
+SOLAR_RESULT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# 重负载接口的准入控制（solar_app/admission.py）：每个客户端每秒补充的成本单位与桶容量；
+# 令牌桶表存放在同一主机所有工作进程共享的 mmap 文件中
+SOLAR_RATE_LIMIT_RATE = float(os.environ.get('SOLAR_RATE_LIMIT_RATE', 5))
+SOLAR_RATE_LIMIT_BURST = float(os.environ.get('SOLAR_RATE_LIMIT_BURST', 100))
+SOLAR_RATE_LIMIT_FILE = os.environ.get('SOLAR_RATE_LIMIT_FILE')
+# 已登记的 API 密钥（逗号分隔）：请求头 X-Api-Key 为其中之一时按密钥限流，否则按来源 IP
+SOLAR_API_KEYS = [key.strip() for key in os.environ.get('SOLAR_API_KEYS', '').split(',') if key.strip()]
+
+# 按需性能剖析（solar_app/profiling.py）：模拟接口按比例抽样剖析（cprofile / sampler / tracemalloc），
+# 超过延迟阈值（毫秒）的请求保存调用栈采样；结果保存在有界的磁盘环形缓冲中，管理员从 /profiles/ 下载
+SOLAR_PROFILE_MODE = os.environ.get('SOLAR_PROFILE_MODE', 'cprofile')
+SOLAR_PROFILE_SAMPLE_RATE = float(os.environ.get('SOLAR_PROFILE_SAMPLE_RATE', 0))
+SOLAR_PROFILE_SLOW_MS = float(os.environ['SOLAR_PROFILE_SLOW_MS']) \
+    if os.environ.get('SOLAR_PROFILE_SLOW_MS') else None
+SOLAR_PROFILE_DIR = os.environ.get('SOLAR_PROFILE_DIR')
+
+# 动态电价使用的逐时价格文件（8760 行，€/kWh 或 €/MWh）；未配置时表单不提供动态电价
+SOLAR_DYNAMIC_TARIFF_FILE = os.environ.get('SOLAR_DYNAMIC_TARIFF_FILE')
+
+# 区域地图（solar_app/yield_map.py）：manage.py precompute_yield_map 写出的瓦片目录，/api/yield-map/ 从中查询
+SOLAR_YIELD_MAP_DIR = os.environ.get('SOLAR_YIELD_MAP_DIR')
+
+# 相同计算的合并执行（solar_app/singleflight.py）：等待其他请求计算同一参数的最长秒数，
+# 超时后自行计算；跨进程的锁文件与结果文件目录
+SOLAR_SINGLEFLIGHT_TIMEOUT = float(os.environ.get('SOLAR_SINGLEFLIGHT_TIMEOUT', 10))
+SOLAR_SINGLEFLIGHT_DIR = os.environ.get('SOLAR_SINGLEFLIGHT_DIR')
+
+# Sessions
+# 模拟状态只在 session 中保存紧凑的输入载荷，默认使用签名 Cookie，
+# 模拟请求不再写入 SQLite；也可通过环境变量切换为缓存后端
+# （django.contrib.sessions.backends.cache）
+
+SESSION_ENGINE = os.environ.get(
+    'DJANGO_SESSION_ENGINE', 'django.contrib.sessions.backends.signed_cookies'
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -128,6 +193,20 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# 由 whitenoise 提供静态文件：collectstatic 生成带哈希的文件名及 gzip/brotli 预压缩版本，
+# 带哈希的文件自动使用一年的缓存有效期
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# 未带哈希的文件（如直接引用的路径）的缓存时间
+WHITENOISE_MAX_AGE = 60 * 60 * 24
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
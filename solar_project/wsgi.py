@@ -12,5 +12,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'solar_project.settings')
+# 工作进程启动后在后台预热（见 solar_app/warmup.py），就绪状态见 /healthz/ready
+os.environ.setdefault('SOLAR_WARMUP', '1')
 
 application = get_wsgi_application()
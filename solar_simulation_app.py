@@ -1,6 +1,9 @@
-import streamlit as st
+import altair as alt
 import pandas as pd
-import numpy as np
+import streamlit as st
+
+from solar_app import pipeline
+from solar_app.labels import FLOW_LABELS, MONTH_NAMES
 
 # 必须在所有其他 Streamlit 命令之前调用 set_page_config
 st.set_page_config(page_title="德国家庭太阳能储能模拟", layout="wide")
@@ -21,45 +24,54 @@ st.set_page_config(page_title="德国家庭太阳能储能模拟", layout="wide"
 # 6. 可视化 - 堆叠柱状图显示光伏发电的自用与上网比例
 #
 # 模型刻意保持简单但透明，所有计算都有详细注释供教学使用。
+# 计算逻辑位于 solar_app/solar_calculator.py，与 Django 版本共用；
+# 结果与图表规格按输入元组通过 st.cache_data 缓存，调整侧边栏时无需重复计算；
+# 新的输入组合经 pipeline 分阶段计算，只改电价时复用已缓存的能量流。
 # =============================================================================
 
 st.title("🏠 德国家庭太阳能光伏模拟")
 
 # ---------------------------------------------------------------------
-# 1. 默认常量和辅助数据
+# 1. 共享计算引擎
 # ---------------------------------------------------------------------
+# 常量、月度模拟与经济评估全部来自 Django 应用使用的同一个计算模块，
+# 两个前端不会再出现计算结果不一致的情况。
 
-# 德国月平均水平辐照度 (kWh/m²/day) - 基于PVGIS等数据集
-# 这些数值是合理的近似值
-MONTHLY_IRRADIANCE = np.array([
-    0.83, 1.54, 2.56, 3.75, 4.81, 5.16,
-    5.33, 4.98, 3.42, 2.07, 1.02, 0.70
-])
+# 参与计算的参数，顺序即缓存键元组的顺序
+PARAM_KEYS = (
+    "pv_capacity_kwp", "battery_capacity_kwh", "annual_consumption_kwh",
+    "cons_fraction_night", "cons_fraction_morn_even", "cons_fraction_midday",
+    "grid_price", "feed_in_price",
+)
 
-# 每月天数（非闰年）
-DAYS_IN_MONTH = np.array([
-    31, 28, 31, 30, 31, 30,
-    31, 31, 30, 31, 30, 31
-])
-MONTH_NAMES = [
-    "1月", "2月", "3月", "4月", "5月", "6月",
-    "7月", "8月", "9月", "10月", "11月", "12月"
-]
 
-# 季节性用电系数 - 总和为1.0
-# 冬季月份（12-2月）→ 用电量较高（供暖、照明）
-# 夏季月份（6-8月）→ 用电量略低
-CONSUMPTION_SEASONAL_FACTORS = np.array([
-    0.095, 0.085, 0.09, 0.08, 0.08, 0.075,
-    0.075, 0.075, 0.08, 0.085, 0.095, 0.105
-])
-# 完整性检查 - 如果上述系数总和不等于1则归一化
-CONSUMPTION_SEASONAL_FACTORS = CONSUMPTION_SEASONAL_FACTORS / \
-    CONSUMPTION_SEASONAL_FACTORS.sum()
+@st.cache_data(max_entries=256)
+def run_simulation(inputs: tuple):
+    """以输入元组为键缓存完整的模拟结果（紧凑的 SimulationResult）"""
+    return pipeline.calculate(dict(zip(PARAM_KEYS, inputs)))
+
+
+def monthly_frame(results):
+    """月度结果表格，列名使用中文显示名称"""
+    return results.to_dataframe(MONTH_NAMES, FLOW_LABELS, label_column="月份")
+
+
+@st.cache_data(max_entries=256)
+def stack_chart_spec(inputs: tuple, cols: tuple, title: str):
+    """返回堆叠柱状图的 Vega-Lite 规格，同样按输入元组缓存"""
+    df = monthly_frame(run_simulation(inputs))
+    base = pd.melt(
+        df, id_vars=["月份"], value_vars=list(cols),
+        var_name="类别", value_name="kWh"
+    )
+    chart = alt.Chart(base).mark_bar().encode(
+        x=alt.X('月份:N', sort=MONTH_NAMES),
+        y=alt.Y('kWh:Q', title='电量 (kWh)'),
+        color=alt.Color('类别:N'),
+        tooltip=['类别', 'kWh']
+    ).properties(title=title, height=400)
+    return chart.to_dict()
 
-# 预计算每装机kWp的月度kWh产量
-annual_irradiance_sum = MONTHLY_IRRADIANCE.sum()
-MONTHLY_KWH_PER_KWP = 1000 * MONTHLY_IRRADIANCE / annual_irradiance_sum
 
 # ---------------------------------------------------------------------
 # 2. 侧边栏 - 用户输入
@@ -111,122 +123,26 @@ with st.sidebar:
     if pct_night + pct_morning_evening + pct_midday != 100:
         st.error("日间用电百分比必须总和为100%！")
 
-# 将百分比转换为分数
-cons_fraction_night = pct_night / 100
-cons_fraction_morn_even = pct_morning_evening / 100
-cons_fraction_midday = pct_midday / 100
+# 将百分比转换为分数，组成缓存键
+inputs = (
+    float(pv_capacity_kwp), float(battery_capacity_kwh), float(annual_consumption_kwh),
+    pct_night / 100, pct_morning_evening / 100, pct_midday / 100,
+    float(grid_price), float(feed_in_price),
+)
 
 # ---------------------------------------------------------------------
-# 3. 构建月度用电和发电曲线
+# 3. 运行模拟（相同输入直接命中缓存）
 # ---------------------------------------------------------------------
-monthly_consumption = annual_consumption_kwh * CONSUMPTION_SEASONAL_FACTORS
-monthly_generation = pv_capacity_kwp * MONTHLY_KWH_PER_KWP  # kWh
-
-# 将月度用电量分配到三个时间窗口
-cons_night = monthly_consumption * cons_fraction_night
-cons_morn_even = monthly_consumption * cons_fraction_morn_even
-cons_midday = monthly_consumption * cons_fraction_midday
+results = run_simulation(inputs)
+df = monthly_frame(results)
+baseline_cost = results.baseline_cost
+cost_no_batt = results.cost_no_batt
+cost_with_batt = results.cost_with_batt
+savings_no_batt = results.savings_no_batt
+savings_with_batt = results.savings_with_batt
 
 # ---------------------------------------------------------------------
-# 4. 模拟单个月份两种方案的函数
-# ---------------------------------------------------------------------
-
-def simulate_month(gen_kwh: float,
-                   c_mid: float, c_me: float, c_night: float,
-                   batt_capacity: float, days: int):
-    """返回 (无储能结果, 有储能结果) 的元组。
-
-    每个结果都是包含以下键的字典：
-        - self_use (kWh) 自用电量
-        - export (kWh) 上网电量
-        - grid_purchase (kWh) 从电网购电量
-    """
-    # --------------------- 方案1 - 无储能 -------------------
-    self_use_no_batt = min(gen_kwh, c_mid)           # 仅中午时段重叠
-    export_no_batt = max(0, gen_kwh - c_mid)         # 剩余送入电网
-    grid_no_batt = c_mid + c_me + c_night - self_use_no_batt
-
-    no_batt = dict(self_use=self_use_no_batt,
-                   export=export_no_batt,
-                   grid_purchase=grid_no_batt)
-
-    # --------------------- 方案2 - 有储能 -----------------
-    if batt_capacity <= 0:
-        # 退化情况 - 与无储能相同
-        return no_batt, no_batt
-
-    # 1) 中午时段优先自用
-    self_use_mid = min(gen_kwh, c_mid)
-    surplus = max(0, gen_kwh - c_mid)
-
-    # 2) 电池每天可充电至其容量。近似计算
-    #    月度可储存能量为容量 * 天数
-    monthly_batt_limit = batt_capacity * days
-
-    batt_charge = min(surplus, monthly_batt_limit, c_me + c_night)  # 储存不超过后续需求
-    export_with_batt = surplus - batt_charge
-
-    # 3) 电池放电覆盖早晚+夜间负荷
-    energy_from_batt = batt_charge  # 为简化假设往返效率 = 100%
-
-    remaining_load = c_me + c_night - energy_from_batt
-    grid_with_batt = max(0, remaining_load)
-
-    self_use_with_batt = self_use_mid + energy_from_batt
-
-    with_batt = dict(self_use=self_use_with_batt,
-                     export=export_with_batt,
-                     grid_purchase=grid_with_batt)
-
-    return no_batt, with_batt
-
-# ---------------------------------------------------------------------
-# 5. 运行12个月的模拟
-# ---------------------------------------------------------------------
-results = []
-for i in range(12):
-    no_batt, with_batt = simulate_month(
-        gen_kwh=monthly_generation[i],
-        c_mid=cons_midday[i],
-        c_me=cons_morn_even[i],
-        c_night=cons_night[i],
-        batt_capacity=battery_capacity_kwh,
-        days=DAYS_IN_MONTH[i]
-    )
-    results.append({
-        "月份": MONTH_NAMES[i],
-        "发电量": monthly_generation[i],
-        "用电量": monthly_consumption[i],
-        # 无储能
-        "自用电量(无储能)": no_batt["self_use"],
-        "上网电量(无储能)": no_batt["export"],
-        "购电量(无储能)": no_batt["grid_purchase"],
-        # 有储能
-        "自用电量(有储能)": with_batt["self_use"],
-        "上网电量(有储能)": with_batt["export"],
-        "购电量(有储能)": with_batt["grid_purchase"],
-    })
-
-df = pd.DataFrame(results)
-
-# ---------------------------------------------------------------------
-# 6. 经济效益评估
-# ---------------------------------------------------------------------
-
-# 基准成本 - 无光伏，全部从电网购电
-baseline_cost = annual_consumption_kwh * grid_price
-
-cost_no_batt = df["购电量(无储能)"].sum() * grid_price - \
-    df["上网电量(无储能)"].sum() * feed_in_price
-
-cost_with_batt = df["购电量(有储能)"].sum() * grid_price - \
-    df["上网电量(有储能)"].sum() * feed_in_price
-
-savings_no_batt = baseline_cost - cost_no_batt
-savings_with_batt = baseline_cost - cost_with_batt
-
-# ---------------------------------------------------------------------
-# 7. 显示关键指标
+# 4. 显示关键指标
 # ---------------------------------------------------------------------
 col_a, col_b, col_c = st.columns(3)
 col_a.metric("基准年度电费", f"€ {baseline_cost:,.0f}")
@@ -238,34 +154,18 @@ col_c.metric("有储能方案电费", f"€ {cost_with_batt:,.0f}",
 st.markdown("---")
 
 # ---------------------------------------------------------------------
-# 8. 可视化 - 堆叠柱状图
+# 5. 可视化 - 堆叠柱状图
 # ---------------------------------------------------------------------
-import altair as alt
-
-def make_stack(df: pd.DataFrame, cols: list, title: str):
-    """返回Altair堆叠柱状图"""
-    base = pd.melt(
-        df, id_vars=["月份"], value_vars=cols,
-        var_name="类别", value_name="kWh"
-    )
-    chart = alt.Chart(base).mark_bar().encode(
-        x=alt.X('月份:N', sort=MONTH_NAMES),
-        y=alt.Y('kWh:Q', title='电量 (kWh)'),
-        color=alt.Color('类别:N'),
-        tooltip=['类别', 'kWh']
-    ).properties(title=title, height=400)
-    return chart
-
-st.altair_chart(make_stack(df, ["自用电量(无储能)", "上网电量(无储能)"],
-                          "光伏利用情况 - 无储能方案"), use_container_width=True)
+st.vega_lite_chart(stack_chart_spec(inputs, ("自用电量(无储能)", "上网电量(无储能)"),
+                                    "光伏利用情况 - 无储能方案"), use_container_width=True)
 
 if battery_capacity_kwh > 0:
-    st.altair_chart(make_stack(df, ["自用电量(有储能)", "上网电量(有储能)"],
-                              "光伏利用情况 - 有储能方案"),
-                    use_container_width=True)
+    st.vega_lite_chart(stack_chart_spec(inputs, ("自用电量(有储能)", "上网电量(有储能)"),
+                                        "光伏利用情况 - 有储能方案"),
+                       use_container_width=True)
 
 # ---------------------------------------------------------------------
-# 9. 详细结果表格（可选）
+# 6. 详细结果表格（可选）
 # ---------------------------------------------------------------------
 with st.expander("显示详细月度数据"):
     st.dataframe(df.style.format({col: "{:.1f}" for col in df.columns if col != "月份"}))